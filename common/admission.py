@@ -0,0 +1,114 @@
+"""Admission control for the compiler, gcov and a.out processes of a run.
+
+A process is started only when a CPU slot is free, the machine does not have
+more runnable tasks than max_running (fourth field of /proc/loadavg, which,
+unlike the load averages, reacts immediately) and MemAvailable leaves room
+for mem_per_job more bytes. When the machine is busy the caller backs off
+with a growing delay instead of adding to the contention. A process is always
+admitted while none of ours is running, so a run can never stall on load it
+does not cause itself.
+
+Without /proc (other systems) only the slot budget applies.
+"""
+import contextlib
+import threading
+import time
+
+
+def runnable_tasks():
+    try:
+        with open('/proc/loadavg', 'r') as f:
+            return int(f.read().split()[3].split('/')[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def mem_available():
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class Admission(object):
+
+    def __init__(self, slots, max_running=None, mem_per_job=0, backoff=0.1, max_backoff=2.0):
+        self.slots = max(1, slots)
+        self.max_running = max_running
+        self.mem_per_job = mem_per_job
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cond = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.backoffs = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def machine_busy(self):
+        if self.max_running is not None:
+            runnable = runnable_tasks()
+            if runnable is not None and runnable > self.max_running:
+                return True
+        if self.mem_per_job:
+            available = mem_available()
+            if available is not None and available < self.mem_per_job:
+                return True
+        return False
+
+    def acquire(self):
+        start = time.time()
+        delay = self.backoff
+        with self.cond:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                while True:
+                    if self.running >= self.slots:
+                        self.cond.wait()
+                    elif self.running > 0 and self.machine_busy():
+                        self.backoffs += 1
+                        self.cond.wait(delay)
+                        delay = min(delay * 2, self.max_backoff)
+                    else:
+                        break
+                self.running += 1
+            finally:
+                self.waiting -= 1
+            waited = time.time() - start
+            self.admitted += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def release(self):
+        with self.cond:
+            self.running -= 1
+            self.cond.notify()
+
+    @contextlib.contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'slots': self.slots,
+                'running': self.running,
+                'queued': self.waiting,
+                'max_queued': self.max_waiting,
+                'admitted': self.admitted,
+                'backoffs': self.backoffs,
+                'wait_total': round(self.wait_total, 3),
+                'wait_avg': round(self.wait_total / self.admitted, 3) if self.admitted else 0.0,
+                'wait_max': round(self.wait_max, 3),
+            }
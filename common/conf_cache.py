@@ -0,0 +1,148 @@
+import os
+import hashlib
+import tempfile
+import fcntl
+
+# outcomes that depend on machine load rather than on the configuration; they are never stored
+volatile_results = ('CPLTimeoutExpired', 'EXETimeoutExpired')
+# part of every key. 2: timeouts are reported as *TimeoutExpired instead of the
+# 137 exit status the shell timeout gave, so version 1 entries may hold timeouts
+CACHE_VERSION = 2
+
+_source_hashes = {}
+
+
+def normalize_conf(conf):
+    # -f switches are order independent once duplicates are resolved (last one wins),
+    # everything else keeps its position, e.g. -O2 -c or -mllvm -opt-bisect-limit=N
+    head = []
+    fflags = {}
+    tokens = conf.split()
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok in ('-mllvm', '-Xclang') and i + 1 < len(tokens):
+            head.extend(tokens[i:i + 2])
+            i += 2
+            continue
+        if tok.startswith('-f') and '=' not in tok:
+            name = tok[len('-fno-'):] if tok.startswith('-fno-') else tok[len('-f'):]
+            fflags.pop(name, None)
+            fflags[name] = tok
+        else:
+            head.append(tok)
+        i += 1
+    return ' '.join(head + sorted(fflags.values()))
+
+
+def source_hash(path):
+    st = os.stat(path)
+    memo = (path, st.st_mtime_ns, st.st_size)
+    if memo not in _source_hashes:
+        with open(path, 'rb') as f:
+            _source_hashes[memo] = hashlib.sha256(f.read()).hexdigest()
+    return _source_hashes[memo]
+
+
+def file_hash(path):
+    # hash of a built binary; identical binaries behave identically when run
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OutcomeCache(object):
+    """Content-addressed store of getConfResult outcomes.
+
+    Every entry is a small file named after the hash of (CACHE_VERSION, compiler,
+    revision, normalized configuration, hash of fail.c, mode); entries of older
+    versions are never read again and age out through eviction. Entries are published with
+    an atomic rename, so readers in other processes never see partial writes.
+    The access time of an entry is its mtime, which is refreshed on every hit;
+    once the store grows beyond max_bytes the least recently used entries are
+    evicted under an exclusive lock.
+    """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024, evict_interval=64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.puts = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, compiler, rev, conf, src_hash, mode):
+        material = '\0'.join([str(CACHE_VERSION), compiler, rev, normalize_conf(conf), src_hash, mode])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                value = f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted concurrently, the value we read is still valid
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if value in volatile_results:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape') as f:
+                f.write(value)
+            os.replace(tmppath, path)
+        except BaseException:
+            if os.path.exists(tmppath):
+                os.unlink(tmppath)
+            raise
+        self.puts += 1
+        if self.puts % self.evict_interval == 0:
+            self.evict()
+
+    def evict(self):
+        with open(os.path.join(self.root, '.lock'), 'w') as lockfile:
+            try:
+                fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another process is already evicting
+            entries = []
+            total = 0
+            for bucket in os.scandir(self.root):
+                if not bucket.is_dir():
+                    continue
+                for entry in os.scandir(bucket.path):
+                    if entry.name.startswith('.tmp'):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+            if total <= self.max_bytes:
+                return
+            # trim to 90% so that eviction is not triggered again right away
+            target = self.max_bytes * 9 // 10
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,98 @@
+"""Index of the instrumented objects of a compiler build tree.
+
+Which objects of compilers/<rev>/build count for the ranking, where their
+.gcno files are and which source name they are reported under does not
+change once a revision is built. The index records it once per revision
+(written by the install scripts, or on first use) in
+compilers/<rev>/covindex.json:
+
+    {"version": 1, "compiler": "gcc", "objects": {"gcc/tree.gcda": null, ...}}
+
+Keys are .gcda paths relative to the build tree; the .gcno file sits next to
+the object in the build tree. Values are the source names for LLVM and null
+for GCC, whose names come from the notes files themselves. Collecting
+coverage then looks up the .gcda files a compile wrote instead of
+filtering and mapping them again.
+
+    python covindex.py {gcc|llvm} compilers/<rev>/build
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+
+INDEX_VERSION = 1
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def llvm_name(relgcda):
+    # lib/Transforms/Scalar/CMakeFiles/LLVMScalarOpts.dir/GVN.cpp.gcda -> lib/Transforms/Scalar/GVN.cpp
+    tmpfilename = relgcda.replace('.cpp.gcda', '.cpp')
+    return tmpfilename.split('/CMakeFiles/')[0] + tmpfilename.split('.dir')[1]
+
+
+def build_index(build_dir, compiler):
+    objects = {}
+    for root, _, files in os.walk(build_dir):
+        for name in files:
+            if not name.endswith('.gcno'):
+                continue
+            relgcda = os.path.relpath(os.path.join(root, name), build_dir)[:-len('.gcno')] + '.gcda'
+            path = os.path.join(build_dir, relgcda)
+            if compiler == 'gcc':
+                if '/gcc/testsuite/' not in path:
+                    objects[relgcda] = None
+            elif '/build/lib/' in path:
+                objects[relgcda] = llvm_name(relgcda)
+    return objects
+
+
+def index_path(build_dir):
+    return os.path.join(os.path.dirname(os.path.normpath(build_dir)), 'covindex.json')
+
+
+def write_index(build_dir, compiler):
+    objects = build_index(build_dir, compiler)
+    path = index_path(build_dir)
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'compiler': compiler, 'objects': objects}, f, sort_keys=True)
+        os.chmod(tmppath, 0o644)  # mkstemp creates the file private
+        os.replace(tmppath, path)
+    except BaseException:
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+        raise
+    return objects
+
+
+def read_index(build_dir, compiler):
+    try:
+        with open(index_path(build_dir), 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != INDEX_VERSION or data.get('compiler') != compiler:
+        return None
+    return data['objects']
+
+
+def cached_index(build_dir, compiler):
+    """{relative .gcda path: source name or None}, read once per process, built if missing."""
+    key = (build_dir, compiler)
+    with _lock:
+        if key not in _indexes:
+            objects = read_index(build_dir, compiler)
+            if objects is None:
+                objects = write_index(build_dir, compiler)
+            _indexes[key] = objects
+        return _indexes[key]
+
+
+if __name__ == '__main__':
+    objects = write_index(sys.argv[2], sys.argv[1])
+    print('%d objects indexed in %s' % (len(objects), index_path(sys.argv[2])))
@@ -0,0 +1,220 @@
+"""Process execution for probes, coverage compiles and gcov.
+
+run() spawns an argv list directly (no shell, no timeout(1) wrapper) in a new
+session, so that a timeout kills the whole process group -- the compiler
+driver together with cc1/as/ld -- and nothing keeps running behind our back.
+Resource limits are applied to the child with prlimit right after the spawn
+(preexec_fn is unsafe in threaded programs). The child is reaped with wait4,
+which also gives its CPU time and peak RSS; run() returns them together with
+the wall time, and Stats aggregates them per kind of call. Stream does the
+same for a process whose output is parsed while it runs (gcov --stdout).
+"""
+import os
+import signal
+import subprocess
+import threading
+import time
+import selectors
+
+try:
+    import resource
+except ImportError:  # not a Unix system
+    resource = None
+
+
+class Result(object):
+    __slots__ = ('returncode', 'stdout', 'stderr', 'timedout', 'wall', 'cpu', 'maxrss')
+
+    def __init__(self, returncode, stdout, stderr, timedout, wall, cpu, maxrss):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timedout = timedout
+        self.wall = wall
+        self.cpu = cpu
+        self.maxrss = maxrss  # bytes
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.kinds = {}
+
+    def add(self, kind, result):
+        with self.lock:
+            entry = self.kinds.setdefault(kind, {'calls': 0, 'timeouts': 0, 'wall': 0.0, 'cpu': 0.0, 'maxrss': 0})
+            entry['calls'] += 1
+            entry['timeouts'] += result.timedout
+            entry['wall'] += result.wall
+            entry['cpu'] += result.cpu
+            entry['maxrss'] = max(entry['maxrss'], result.maxrss)
+
+    def summary(self):
+        with self.lock:
+            return dict((kind, dict(entry)) for kind, entry in self.kinds.items())
+
+
+stats = Stats()
+
+
+def _exitcode(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class _Deadline(object):
+    """Kills the process group of proc at most once, and never after proc exited.
+
+    The timer thread and the waiting thread meet under lock: wait() marks the
+    process as exited while it is still a zombie, so its pid cannot have been
+    reused when kill() runs, and a kill that comes too late is not counted.
+    """
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.lock = threading.Lock()
+        self.exited = False
+        self.killed = False
+
+    def kill(self):
+        with self.lock:
+            if self.exited or self.killed:
+                return
+            self.killed = True
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass  # already gone
+
+    def wait(self):
+        if hasattr(os, 'waitid'):
+            # wait for the exit without reaping
+            os.waitid(os.P_PID, self.proc.pid, os.WEXITED | os.WNOWAIT)
+            with self.lock:
+                self.exited = True
+            _, status, usage = os.wait4(self.proc.pid, 0)
+        else:
+            _, status, usage = os.wait4(self.proc.pid, 0)
+            with self.lock:
+                self.exited = True
+        return status, usage
+
+
+def _read(proc):
+    # drain stdout and stderr together, a full pipe would block the child
+    chunks = {}
+    with selectors.DefaultSelector() as selector:
+        for stream in (proc.stdout, proc.stderr):
+            if stream is not None:
+                chunks[stream] = []
+                selector.register(stream, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select():
+                data = os.read(key.fd, 65536)
+                if data:
+                    chunks[key.fileobj].append(data)
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+    return [b''.join(chunks[stream]) if stream in chunks else None for stream in (proc.stdout, proc.stderr)]
+
+
+def _start(argv, cwd, env, stdout, stderr, limits, timeout):
+    proc = subprocess.Popen(argv, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr,
+                            start_new_session=True)
+    deadline = _Deadline(proc)
+    timer = None
+    try:
+        if resource is not None:
+            for limit, value in limits:
+                try:
+                    resource.prlimit(proc.pid, limit, value)
+                except OSError:
+                    pass  # exited already
+        if timeout is not None:
+            timer = threading.Timer(timeout, deadline.kill)
+            timer.daemon = True
+            timer.start()
+    except BaseException:
+        deadline.kill()
+        proc.wait()
+        raise
+    return proc, deadline, timer
+
+
+def _finish(proc, deadline, status, usage, start, out, err, kind):
+    proc.returncode = _exitcode(status)
+    result = Result(proc.returncode, out, err, deadline.killed, time.time() - start,
+                    usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024)
+    if kind is not None:
+        stats.add(kind, result)
+    return result
+
+
+def run(argv, cwd=None, env=None, timeout=None, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        limits=(), kind=None):
+    """Run argv and wait for it; stdout/stderr are bytes when piped, else None.
+
+    limits is a sequence of (resource.RLIMIT_*, (soft, hard)). On timeout the
+    process group is killed and Result.timedout is set.
+    """
+    start = time.time()
+    proc, deadline, timer = _start(argv, cwd, env, stdout, stderr, limits, timeout)
+    try:
+        out, err = _read(proc)
+        status, usage = deadline.wait()
+    except BaseException:
+        deadline.kill()
+        proc.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    return _finish(proc, deadline, status, usage, start, out, err, kind)
+
+
+class Stream(object):
+    """run() for a process whose stdout is read while it runs.
+
+        with Stream(argv, ...) as proc:
+            for line in proc.stdout:
+                ...
+
+    The process gets the same session, limits, timeout and stats as with
+    run(). Leaving the block waits for it; leaving it by an exception (or by
+    closing a generator that reads it) kills its process group first.
+    stderr must not be a pipe, nothing drains it. proc.result is the Result
+    (without stdout) once the block is left.
+    """
+
+    def __init__(self, argv, cwd=None, env=None, timeout=None, stderr=subprocess.DEVNULL, limits=(), kind=None):
+        self.argv = argv
+        self.cwd = cwd
+        self.env = env
+        self.timeout = timeout
+        self.stderr = stderr
+        self.limits = limits
+        self.kind = kind
+        self.stdout = None
+        self.result = None
+
+    def __enter__(self):
+        self.start = time.time()
+        self.proc, self.deadline, self.timer = _start(self.argv, self.cwd, self.env, subprocess.PIPE, self.stderr,
+                                                      self.limits, self.timeout)
+        self.stdout = self.proc.stdout
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is not None:
+                self.deadline.kill()
+            self.stdout.close()
+            status, usage = self.deadline.wait()
+        finally:
+            if self.timer is not None:
+                self.timer.cancel()
+        self.result = _finish(self.proc, self.deadline, status, usage, self.start, None, None, self.kind)
+        return False
@@ -0,0 +1,384 @@
+"""Read executed source lines straight from .gcno/.gcda files.
+
+This replaces the gcov round trip (spawn gcov, write .gcov text, parse it back)
+for the formats produced by the compilers this project works with: GCC 4.8 up
+to 11 (record lengths in 4-byte words) and GCC 12+ (record lengths in bytes).
+Fields whose presence changed between releases (the working directory in the
+notes header, the block record layout) are recognized from the data itself,
+so development snapshots between releases are handled as well.
+
+Line coverage is derived the same way gcov does it: arc counters from the
+.gcda file are propagated over the flow graph from the .gcno file until every
+block count is known, and a line is executed when one of its blocks ran.
+
+When gcov itself is used, gcov_json_lines reads its JSON intermediate format
+(gcov 9 and later); gcov_text_lines reads the .gcov files of older gcov.
+"""
+import os
+import gzip
+import json
+import struct
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import execute
+
+GCNO_MAGIC = 0x67636e6f
+GCDA_MAGIC = 0x67636461
+
+TAG_FUNCTION = 0x01000000
+TAG_BLOCKS = 0x01410000
+TAG_ARCS = 0x01430000
+TAG_LINES = 0x01450000
+TAG_COUNTER_ARCS = 0x01a10000
+
+ARC_ON_TREE = 1
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+class _Reader(object):
+
+    def __init__(self, data, path, magic):
+        self.data = data
+        self.path = path
+        self.pos = 0
+        if len(data) < 12:
+            raise UnsupportedFormat('{}: truncated header'.format(path))
+        if struct.unpack_from('<I', data)[0] == magic:
+            self.fmt = '<I'
+        elif struct.unpack_from('>I', data)[0] == magic:
+            self.fmt = '>I'
+        else:
+            raise UnsupportedFormat('{}: bad magic'.format(path))
+        self.pos = 4
+        self.version = self.word()
+        self.major, self.minor = decode_version(self.version)
+        # since GCC 12 record and string lengths are counted in bytes
+        self.unit = 1 if self.major >= 12 else 4
+        self.stamp = self.word()
+
+    def word(self):
+        value = struct.unpack_from(self.fmt, self.data, self.pos)[0]
+        self.pos += 4
+        return value
+
+    def peek(self):
+        if self.pos + 4 > len(self.data):
+            return None
+        return struct.unpack_from(self.fmt, self.data, self.pos)[0]
+
+    def string(self):
+        length = self.word() * (4 if self.unit == 4 else 1)
+        raw = self.data[self.pos:self.pos + length]
+        self.pos += length
+        return raw.split(b'\0', 1)[0].decode('utf-8', 'surrogateescape')
+
+    def records(self):
+        while self.pos + 8 <= len(self.data):
+            tag = self.word()
+            length = self.word()
+            if length & 0x80000000:
+                # GCC 12 stores all-zero counters as a negative length and no payload
+                length -= 1 << 32
+            length *= self.unit
+            start = self.pos
+            yield tag, start, length
+            self.pos = start + max(0, length)
+
+
+def decode_version(version):
+    # three characters, most significant first: '408' is 4.8 (GCC < 5, two
+    # digit minor), since GCC 5 'A51' is 5.1 and 'B22' is 12.2
+    chars = [(version >> shift) & 0xff for shift in (24, 16, 8)]
+    digits = [c - ord('0') for c in chars[1:]]
+    if not all(0 <= d <= 9 for d in digits):
+        raise UnsupportedFormat('unknown gcov version 0x%08x' % version)
+    if ord('0') <= chars[0] <= ord('9'):
+        major, minor = chars[0] - ord('0'), digits[0] * 10 + digits[1]
+    elif ord('A') <= chars[0] <= ord('Z'):
+        major, minor = (chars[0] - ord('A')) * 10 + digits[0], digits[1]
+    else:
+        raise UnsupportedFormat('unknown gcov version 0x%08x' % version)
+    return major, minor
+
+
+class Function(object):
+    __slots__ = ('ident', 'artificial', 'nblocks', 'arcs', 'lines')
+
+    def __init__(self, ident):
+        self.ident = ident
+        self.artificial = False  # made by the compiler (e.g. a deleting destructor)
+        self.nblocks = 0
+        self.arcs = []  # (src, dst, flags) in notes order
+        self.lines = []  # (block, filename, [line numbers])
+
+
+def read_notes(path):
+    with open(path, 'rb') as f:
+        r = _Reader(f.read(), path, GCNO_MAGIC)
+    if r.major >= 12:
+        r.word()  # checksum
+        r.string()  # cwd
+        r.word()  # has unexecuted blocks
+    else:
+        # GCC 8 added the working directory, GCC 9 a flag after it; record tags
+        # are never that small, so both are recognized by value
+        value = r.peek()
+        if value is not None and value < 0x10000:
+            r.string()
+            value = r.peek()
+            if value in (0, 1):
+                r.word()
+    functions = []
+    fn = None
+    for tag, start, length in r.records():
+        if tag == TAG_FUNCTION:
+            fn = Function(r.word())
+            functions.append(fn)
+            if r.major >= 8 and length > 12:
+                # ident, two checksums, name, then the artificial flag (GCC 8 and later)
+                r.word()
+                r.word()
+                r.string()
+                fn.artificial = bool(r.word())
+        elif fn is None:
+            continue
+        elif tag == TAG_BLOCKS:
+            # one flags word per block before GCC 8, a single block count since
+            # (a function always has at least the entry and exit block)
+            if length == 4:
+                fn.nblocks = r.word()
+            else:
+                fn.nblocks = length // 4
+        elif tag == TAG_ARCS:
+            src = r.word()
+            while r.pos < start + length:
+                dst = r.word()
+                flags = r.word()
+                fn.arcs.append((src, dst, flags))
+        elif tag == TAG_LINES:
+            block = r.word()
+            filename = None
+            lines = None
+            while r.pos < start + length:
+                lineno = r.word()
+                if lineno:
+                    if lines is not None:
+                        lines.append(lineno)
+                    continue
+                name = r.string()
+                if not name:
+                    break
+                filename = name
+                lines = []
+                fn.lines.append((block, filename, lines))
+    return functions
+
+
+def read_counts(path):
+    with open(path, 'rb') as f:
+        r = _Reader(f.read(), path, GCDA_MAGIC)
+    if r.major >= 12:
+        r.word()  # checksum
+    counts = {}
+    ident = None
+    for tag, start, length in r.records():
+        if tag == TAG_FUNCTION:
+            ident = r.word() if length else None
+        elif tag == TAG_COUNTER_ARCS and ident is not None:
+            if length < 0:
+                counts[ident] = [0] * (-length // 8)
+                continue
+            n = length // 8
+            words = struct.unpack_from(r.fmt[0] + '%dI' % (2 * n), r.data, start)
+            counts[ident] = [words[2 * i] | (words[2 * i + 1] << 32) for i in range(n)]
+    return counts
+
+
+def solve_blocks(fn, counters):
+    """Propagate arc counters over the flow graph, return the block counts."""
+    narcs = len(fn.arcs)
+    arc_count = [None] * narcs
+    k = 0
+    for i, (_, _, flags) in enumerate(fn.arcs):
+        if not flags & ARC_ON_TREE:
+            arc_count[i] = counters[k] if k < len(counters) else 0
+            k += 1
+    nblocks = fn.nblocks or (max(max(s, d) for s, d, _ in fn.arcs) + 1 if fn.arcs else 0)
+    ins = [[] for _ in range(nblocks)]
+    outs = [[] for _ in range(nblocks)]
+    for i, (src, dst, _) in enumerate(fn.arcs):
+        outs[src].append(i)
+        ins[dst].append(i)
+    block_count = [None] * nblocks
+    changed = True
+    while changed:
+        changed = False
+        for b in range(nblocks):
+            if block_count[b] is None:
+                for side in (ins[b], outs[b]):
+                    if side and all(arc_count[a] is not None for a in side):
+                        block_count[b] = sum(arc_count[a] for a in side)
+                        changed = True
+                        break
+            if block_count[b] is None:
+                continue
+            for side in (ins[b], outs[b]):
+                unknown = [a for a in side if arc_count[a] is None]
+                if len(unknown) == 1:
+                    arc_count[unknown[0]] = max(0, block_count[b] - sum(arc_count[a] for a in side if arc_count[a] is not None))
+                    changed = True
+    return [count or 0 for count in block_count]
+
+
+# parsed notes files kept at once; a GCC build has some 600 of them under build/gcc,
+# so this holds the objects of a few revisions and a long run does not keep them all
+NOTES_CACHE_SIZE = 2048
+_notes_cache = OrderedDict()
+_notes_lock = threading.Lock()
+
+
+def cached_notes(path):
+    # notes files never change for an installed compiler, parse each one once
+    st = os.stat(path)
+    memo = (path, st.st_mtime_ns, st.st_size)
+    with _notes_lock:
+        functions = _notes_cache.get(memo)
+        if functions is not None:
+            _notes_cache.move_to_end(memo)
+            return functions
+    functions = read_notes(path)
+    with _notes_lock:
+        _notes_cache[memo] = functions
+        while len(_notes_cache) > NOTES_CACHE_SIZE:
+            _notes_cache.popitem(last=False)
+    return functions
+
+
+def executed_lines(gcno, gcda, lines=None):
+    """Add {source name: set(line numbers)} executed according to gcda to lines."""
+    if lines is None:
+        lines = {}
+    counts = read_counts(gcda)
+    for fn in cached_notes(gcno):
+        if fn.artificial:
+            continue  # gcov leaves out the lines of artificial functions as well
+        counters = counts.get(fn.ident)
+        if not counters or not any(counters):
+            continue  # nothing on the flow graph can be non-zero
+        block_count = solve_blocks(fn, counters)
+        for block, filename, linenos in fn.lines:
+            if block < len(block_count) and block_count[block] > 0:
+                lines.setdefault(filename, set()).update(linenos)
+    return lines
+
+
+_gcov_formats = {}
+
+
+def gcov_format(gcov, timeout=60):
+    """'stream' (JSON on stdout, gcov 10+), 'json' (.gcov.json.gz files, gcov 9) or 'text'."""
+    fmt = _gcov_formats.get(gcov)
+    if fmt is None:
+        try:
+            usage = execute.run([gcov, '--help'], timeout=timeout, kind='gcov').stdout.decode('utf-8', 'replace')
+        except OSError:
+            usage = ''
+        if '--json-format' not in usage:
+            fmt = 'text'
+        elif '--stdout' in usage:
+            fmt = 'stream'
+        else:
+            fmt = 'json'
+        _gcov_formats[gcov] = fmt
+    return fmt
+
+
+def gcov_text_lines(gcovfile):
+    """The executed line numbers of a .gcov text file."""
+    lines = set()
+    with open(gcovfile, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            items = line.split(':', 2)
+            if len(items) == 3 and items[0].strip() not in ('-', '#####', '=====') and items[1].strip().isdigit():
+                lines.add(int(items[1]))
+    return lines
+
+
+def _json_lines(doc, gcdafile=None):
+    gcdafile = doc.get('data_file', gcdafile)
+    for entry in doc.get('files', []):
+        lines = set(line['line_number'] for line in entry.get('lines', []) if line.get('count', 0) > 0)
+        yield gcdafile, entry['file'], lines
+
+
+def _stream(argv, cwd):
+    return execute.Stream(argv, cwd=cwd, kind='gcov')
+
+
+def gcov_json_lines(gcov, gcdafiles, cwd, spawn=_stream):
+    """Run gcov in JSON mode on gcdafiles, yield (data file, source name, executed lines).
+
+    With --stdout one document per counter file is parsed as soon as gcov
+    prints it and nothing is written to disk; otherwise the .gcov.json.gz
+    files are read from a private directory under cwd, so gcdafiles must have
+    distinct basenames. The notes files have to sit next to the counters.
+    spawn(argv, cwd) starts gcov as an execute.Stream; the run scripts pass
+    their own to add admission, timeout and limits. A gcov that is killed
+    raises ValueError.
+    """
+    if gcov_format(gcov) == 'stream':
+        with spawn([gcov, '--json-format', '--stdout'] + gcdafiles, cwd) as proc:
+            for raw in proc.stdout:
+                if raw.strip():
+                    for item in _json_lines(json.loads(raw)):
+                        yield item
+        _check(proc, gcdafiles)
+        return
+    outdir = tempfile.mkdtemp(prefix='gcovjson', dir=cwd)
+    with spawn([gcov, '--json-format'] + gcdafiles, outdir) as proc:
+        for _ in proc.stdout:
+            pass  # the summary of each file
+    _check(proc, gcdafiles)
+    # the output of x.gcda is x.gcov.json.gz
+    by_name = dict((os.path.basename(gcdafile)[:-len('.gcda')] + '.gcov.json.gz', gcdafile) for gcdafile in gcdafiles)
+    for name in sorted(os.listdir(outdir)):
+        if name in by_name:
+            with gzip.open(os.path.join(outdir, name), 'rt', encoding='utf-8') as f:
+                for item in _json_lines(json.load(f), by_name[name]):
+                    yield item
+
+
+def _check(proc, gcdafiles):
+    if proc.result.timedout or proc.result.returncode < 0:
+        raise ValueError('gcov on %d counter files (%s, ...) was killed%s' % (
+            len(gcdafiles), gcdafiles[0], ' after the timeout' if proc.result.timedout else ''))
+
+
+if __name__ == '__main__':
+    # python gcov_reader.py GCOV CWD GCDA...: compare with the text output of gcov
+    # run from CWD (the directory the sources are relative to)
+    gcov, cwd = sys.argv[1], os.path.abspath(sys.argv[2])
+    mismatches = 0
+    for gcda in sys.argv[3:]:
+        gcda = os.path.abspath(gcda)
+        native = executed_lines(gcda[:-len('.gcda')] + '.gcno', gcda)
+        native = dict((os.path.basename(name), lines) for name, lines in native.items())
+        before = set(os.listdir(cwd))
+        execute.run([gcov, gcda], cwd=cwd, kind='gcov')
+        for name in sorted(set(os.listdir(cwd)) - before):
+            if not name.endswith('.gcov'):
+                continue
+            expected = gcov_text_lines(os.path.join(cwd, name))
+            os.remove(os.path.join(cwd, name))
+            got = native.get(name[:-len('.gcov')], set())
+            if got != expected:
+                mismatches += 1
+                print('%s: %s native-only %s gcov-only %s' % (gcda, name, sorted(got - expected), sorted(expected - got)))
+    print('%d mismatching source files' % mismatches)
+    sys.exit(1 if mismatches else 0)
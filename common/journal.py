@@ -0,0 +1,107 @@
+"""Per-bug checkpoint journal, so that a restarted run resumes finished phases.
+
+cov/<bugId>/journal.json holds the result of every finished phase of the bug
+together with the fingerprint of the inputs it was computed from:
+
+    {"version": 1, "phases": {"fineopts": {"key": "<sha256>", "value": {...}}, ...}}
+
+A phase is taken from the journal only while its key matches -- the same
+revision, fail.c, option levels, option list and settings -- and is computed
+again otherwise. Keys of later phases include the results of earlier ones,
+so a changed input invalidates everything downstream of it. The file is
+replaced atomically after every phase, so a killed run leaves the last
+complete state behind.
+
+The coverage of a single configuration is kept next to the journal as a
+spectrum store (see spectra.py), journal-<phase>-<key>.bin, named after
+hashes of the phase and of its key.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import struct
+import threading
+import zlib
+
+from spectra import FileTable, SpectrumStore, write_store
+
+JOURNAL_VERSION = 1
+
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class Journal(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'journal.json')
+        self.lock = threading.Lock()
+        self.phases = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != JOURNAL_VERSION:
+            return {}
+        return data.get('phases', {})
+
+    def _save(self):
+        # caller holds the lock
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': JOURNAL_VERSION, 'phases': self.phases}, f, sort_keys=True)
+            os.chmod(tmppath, 0o644)  # mkstemp creates the file private
+            os.replace(tmppath, self.path)
+        except BaseException:
+            if os.path.exists(tmppath):
+                os.unlink(tmppath)
+            raise
+
+    def get(self, phase, key):
+        """The recorded result of phase if it was computed from key, else None."""
+        with self.lock:
+            entry = self.phases.get(phase)
+        if entry is None or entry.get('key') != key:
+            return None
+        return entry['value']
+
+    def put(self, phase, key, value):
+        with self.lock:
+            self.phases[phase] = {'key': key, 'value': value}
+            self._save()
+
+    def get_spectrum(self, phase, key):
+        """{file name: bitset} recorded by put_spectrum, None if missing or stale."""
+        name = self.get(phase, key)
+        if name is None:
+            return None
+        try:
+            with SpectrumStore(os.path.join(self.directory, name)) as store:
+                return dict((store.files.name(fid), bits) for fid, bits in store.spectrum('spectrum').items())
+        except (OSError, ValueError, KeyError, IndexError, EOFError, zlib.error, struct.error):
+            return None  # truncated or corrupt, e.g. by a killed run: computed again
+
+    def put_spectrum(self, phase, key, spectrum):
+        os.makedirs(self.directory, exist_ok=True)
+        # the phase is part of the name, entries of two tests never share a file
+        name = 'journal-%s-%s.bin' % (fingerprint(phase)[:8], key[:16])
+        files = FileTable()
+        write_store(os.path.join(self.directory, name), files,
+                    [('spectrum', dict((files.intern(filename), bits) for filename, bits in spectrum.items()))])
+        with self.lock:
+            entry = self.phases.get(phase)
+        if entry is not None and entry.get('value') != name:
+            # the configuration of this test changed, its old coverage is not needed any more
+            try:
+                os.unlink(os.path.join(self.directory, entry['value']))
+            except (OSError, TypeError):
+                pass
+        self.put(phase, key, name)
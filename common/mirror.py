@@ -0,0 +1,137 @@
+"""One local git mirror of a compiler repository, checked out per revision.
+
+The install scripts used to clone (or svn check out) the whole repository for
+every revision. Instead, ensure_mirror keeps a single bare clone that is only
+fetched when a revision is missing from it, and checkout creates the source
+tree of a revision from its object store:
+
+    worktree  a detached `git worktree` of the mirror (the default); the tree
+              shares all objects with the mirror and takes seconds to create
+    export    a plain copy of the tree (`git archive`) without .git, for
+              builds that must not see a repository
+
+Checkouts only take absolute paths and never change the working directory,
+so several of them can run in threads at once.
+"""
+import os
+import shutil
+import subprocess
+import threading
+
+CHECKOUT_MODES = ('worktree', 'export')
+
+# git keeps the list of worktrees in the mirror; adding and pruning entries is serialized
+_worktrees = threading.Lock()
+
+
+class MirrorError(Exception):
+    pass
+
+
+def git(mirror, *args, **kwargs):
+    cmd = ['git', '--git-dir=' + mirror] + list(args)
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
+    if result.returncode != 0:
+        raise MirrorError('%s: %s' % (' '.join(cmd), result.stderr.strip()))
+    return result.stdout
+
+
+def ensure_mirror(url, mirror):
+    """Clone url into the bare repository mirror unless it is there already."""
+    if os.path.exists(os.path.join(mirror, 'HEAD')):
+        return False
+    os.makedirs(os.path.dirname(os.path.abspath(mirror)), exist_ok=True)
+    tmp = mirror + '.partial'
+    shutil.rmtree(tmp, ignore_errors=True)
+    result = subprocess.run(['git', 'clone', '--bare', url, tmp])
+    if result.returncode != 0:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise MirrorError('git clone --bare %s failed' % url)
+    # branches and tags only; pull request refs of hosted mirrors are not needed
+    git(tmp, 'config', '--replace-all', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*')
+    git(tmp, 'config', '--add', 'remote.origin.fetch', '+refs/tags/*:refs/tags/*')
+    # worktrees share this file; the marker of checkout is no change of the tree
+    os.makedirs(os.path.join(tmp, 'info'), exist_ok=True)
+    with open(os.path.join(tmp, 'info', 'exclude'), 'a') as f:
+        f.write('/.odfl-commit\n')
+    os.rename(tmp, mirror)
+    return True
+
+
+def update(mirror):
+    subprocess.run(['git', '--git-dir=' + mirror, 'fetch', '--prune', 'origin'])
+
+
+def resolve(mirror, rev):
+    """The full commit id of rev (a hash, an abbreviation, a tag or a branch), or None."""
+    try:
+        return git(mirror, 'rev-parse', '--verify', '--quiet', rev + '^{commit}').strip()
+    except MirrorError:
+        return None
+
+
+def resolve_revisions(mirror, revs, lookup=None):
+    """{rev: commit} of revs, fetching the mirror once if any of them is missing.
+
+    lookup(mirror, revs) maps revision names to commits; the default takes
+    them as git revisions. Revisions still missing after the fetch map to None.
+    """
+    if lookup is None:
+        lookup = lambda mirror, revs: dict((rev, resolve(mirror, rev)) for rev in revs)
+    commits = lookup(mirror, revs)
+    missing = [rev for rev in revs if commits.get(rev) is None]
+    if missing:
+        print('fetching %d missing revisions into %s' % (len(missing), mirror))
+        update(mirror)
+        commits.update(lookup(mirror, missing))
+    return commits
+
+
+def head_of(path):
+    # commit checked out in path, None if path is no checkout of this module
+    try:
+        with open(os.path.join(path, '.odfl-commit'), 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def remove_checkout(mirror, path):
+    # a worktree is unregistered by the prune once its directory is gone
+    shutil.rmtree(path, ignore_errors=True)
+    with _worktrees:
+        git(mirror, 'worktree', 'prune')
+
+
+def checkout(mirror, commit, path, mode='worktree'):
+    """Create the source tree of commit at path; an existing one of the same commit is kept.
+
+    Returns True if the tree was created, False if it was already there.
+    """
+    if mode not in CHECKOUT_MODES:
+        raise ValueError('unknown checkout mode %r' % mode)
+    path = os.path.abspath(path)
+    if head_of(path) == commit:
+        return False
+    if os.path.exists(path):
+        remove_checkout(mirror, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if mode == 'worktree':
+        with _worktrees:
+            git(mirror, 'worktree', 'add', '--no-checkout', '--detach', '--force', path, commit)
+        # filling the tree is the slow part, it runs outside the lock
+        if subprocess.run(['git', '-C', path, 'reset', '--hard', '--quiet']).returncode != 0:
+            raise MirrorError('cannot check out %s in %s' % (commit, path))
+    else:
+        os.makedirs(path)
+        archive = subprocess.Popen(['git', '--git-dir=' + mirror, 'archive', '--format=tar', commit],
+                                   stdout=subprocess.PIPE)
+        tar = subprocess.run(['tar', '-x', '-C', path], stdin=archive.stdout)
+        archive.stdout.close()
+        if archive.wait() != 0 or tar.returncode != 0:
+            shutil.rmtree(path, ignore_errors=True)
+            raise MirrorError('cannot export %s to %s' % (commit, path))
+    # written last, so an interrupted checkout is redone
+    with open(os.path.join(path, '.odfl-commit'), 'w') as f:
+        f.write(commit + '\n')
+    return True
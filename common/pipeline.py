@@ -0,0 +1,563 @@
+"""The compiler-independent half of gcc-run.py and llvm-run.py.
+
+Both run scripts probe configurations, keep the coverage counters of the
+probes that can become final, collect the coverage of the final pass/fail
+configurations and rank the statements in the same way; only how the
+configurations are found and how counter files map to source names differ.
+Pipeline holds the shared part for one compiler:
+
+    pipeline = Pipeline('gcc', 'gcc', globals())
+
+The settings stay module globals of the run script (compilersDir, testDir,
+collectDir, scratchDir, timeout, covBackend, tracer, scheduler, ...) and are
+read when they are used, so a script or a benchmark that changes one of them
+after the import is followed. The script also provides the readers of its
+counter files, nativeCov(gcdafiles) and gcovCov(rev, cwd, gcdafiles), which
+collectCov calls with (gcno, gcda, source name or None) triples.
+"""
+import concurrent.futures
+import contextlib
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import traceback
+
+import execute
+from conf_cache import normalize_conf, source_hash, file_hash
+from covindex import cached_index, index_path
+from gcov_reader import UnsupportedFormat
+from journal import Journal, fingerprint
+from ranking import score_groups, top_groups, write_scores, write_sorted, write_jsonl, write_scoredict, read_scoredict
+from sbfl import evaluate
+from spectra import FileTable, SpectrumCounter, SpectrumStore, write_store, restrict, union, lines_to_bits, \
+    bits_to_lines
+
+# later phases first, so that started bugs finish before new probes are run
+PRIORITIES = {'probe': 0, 'coverage': 1, 'gcov': 2}
+
+
+class Settings(object):
+    """Attribute access to a namespace (the globals of a run script), read at every access."""
+
+    def __init__(self, namespace):
+        object.__setattr__(self, '_namespace', namespace)
+
+    def __getattr__(self, name):
+        try:
+            return self._namespace[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def gcov_env(covDir, prefix):
+    # redirect the .gcda files of the instrumented compiler into prefix, so that
+    # compilations that share a compiler revision never touch the same counters
+    env = dict(os.environ)
+    env['GCOV_PREFIX'] = prefix
+    env['GCOV_PREFIX_STRIP'] = str(len(covDir.strip(os.sep).split(os.sep)))
+    return env
+
+
+def tree_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.lstat(os.path.join(root, name)).st_size for name in files)
+    return total
+
+
+def exit_status(result):
+    # a process killed by a signal reports 128 + signal, as it did through the shell
+    return 128 - result.returncode if result.returncode < 0 else result.returncode
+
+
+def gcov_batches(gcdafiles, size):
+    # gcov names its output after the source basename, so two counter files with
+    # the same basename never share a batch; batches are merged by union afterwards
+    layers = []
+    seen = {}
+    for gcdafile in gcdafiles:
+        name = os.path.basename(gcdafile)
+        seen[name] = seen.get(name, -1) + 1
+        if seen[name] == len(layers):
+            layers.append([])
+        layers[seen[name]].append(gcdafile)
+    batches = []
+    for layer in layers:
+        batches += [layer[i:i + size] for i in range(0, len(layer), size)]
+    return batches
+
+
+def write_stmt_info(tempdir, merged):
+    if os.path.exists(tempdir):
+        shutil.rmtree(tempdir)
+    os.makedirs(tempdir)
+    covline_set = set()
+    for tmpfilename, lines in merged.items():
+        if len(lines) == 0: continue
+        covline_set.add(tmpfilename + '$' + ','.join(str(lineNum) for lineNum in sorted(lines)))
+
+    file_stmtinfo = os.path.join(tempdir, 'stmt_info.txt')
+    with open(file_stmtinfo, 'w') as stmtfile:
+        stmtfile.write('\n'.join(sorted(covline_set)))
+
+
+class Pipeline(object):
+
+    def __init__(self, compiler, index, namespace):
+        self.compiler = compiler  # driver name, also in outcome cache and journal keys
+        self.index = index  # kind of covindex
+        self.cfg = Settings(namespace)
+        self.journals = {}
+        self.stagedCompilers = {}
+        # outcomes of a.out by hash of the binary, for this run (outcomeCache keeps them across runs)
+        self.exeOutcomes = {}
+        self.keptGcda = {}  # bugId -> {gcdaKey: (conf, bytes)}
+        self.keptLock = threading.Lock()
+        self.compiles = {}  # bugId -> compiler invocations of its probes, outcome cache hits excluded
+        self.compilesLock = threading.Lock()
+
+    def failSource(self, bugId):
+        return os.path.join(self.cfg.testDir, bugId, 'fail.c')
+
+    def buildDir(self, rev):
+        return os.path.join(self.cfg.compilersDir, rev, 'build')
+
+    def bugJournal(self, bugId):
+        # one journal per bug, shared by the workers of the bug
+        journal = self.journals.get(bugId)
+        if journal is None:
+            journal = self.journals.setdefault(bugId, Journal(os.path.join(self.cfg.collectDir, bugId)))
+        return journal
+
+    def phaseKey(self, bugId, rev, phase, inputs):
+        # whatever a phase depends on besides its own inputs: compiler revision, test program, crash mode
+        return fingerprint(self.compiler, rev, source_hash(self.failSource(bugId)), bugId in self.cfg.crash_bugId_lst,
+                           phase, inputs)
+
+    def checkpoint(self, bugId, rev, phase, inputs, compute):
+        # the result of phase from the journal when it was computed from the same inputs, else
+        # compute() recorded; empty results (a compiler that did not answer) are not recorded
+        if not self.cfg.useJournal:
+            return compute()
+        journal = self.bugJournal(bugId)
+        key = self.phaseKey(bugId, rev, phase, inputs)
+        value = journal.get(phase, key)
+        if value is not None:
+            self.cfg.tracer.count('resumed')
+            return value
+        value = compute()
+        if value:
+            journal.put(phase, key, value)
+        return value
+
+    def makeScratch(self, bugId):
+        # every compilation runs in its own directory so that a.out never collides
+        scratchDir = self.cfg.scratchDir
+        os.makedirs(scratchDir, exist_ok=True)
+        workdir = tempfile.mkdtemp(prefix=bugId + '-', dir=scratchDir)
+        os.symlink(self.failSource(bugId), os.path.join(workdir, 'fail.c'))
+        return workdir
+
+    def stageCompiler(self, rev, stageDir):
+        # the driver finds its own programs relative to itself; whatever is not staged
+        # still resolves through the install prefix in compilers/<rev>/build
+        src = self.buildDir(rev)
+        dst = os.path.join(stageDir, rev)
+        for pattern in self.cfg.stagePaths:
+            for path in glob.glob(os.path.join(src, pattern)):
+                target = os.path.join(dst, os.path.relpath(path, src))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.copytree(path, target, symlinks=True)
+                else:
+                    shutil.copy2(path, target, follow_symlinks=False)
+        self.stagedCompilers[rev] = dst
+
+    def binPath(self, rev, name):
+        return os.path.join(self.stagedCompilers.get(rev, self.buildDir(rev)), 'bin', name)
+
+    def gcdaKey(self, bugId, rev, conf):
+        test = source_hash(self.failSource(bugId))
+        return hashlib.sha1((rev + '\0' + normalize_conf(conf) + '\0' + test).encode()).hexdigest()
+
+    def keepDir(self, bugId):
+        return os.path.join(self.cfg.scratchDir, 'gcda-' + bugId)
+
+    def keepGcda(self, bugId, rev, conf, gcdaDir):
+        # park the counters of a finished compile under scratch/gcda-<bugId>/<key>, unless
+        # that would exceed keepGcdaBytes (collectCov compiles the configuration again then)
+        key = self.gcdaKey(bugId, rev, conf)
+        size = tree_bytes(gcdaDir)
+        with self.keptLock:
+            kept = self.keptGcda.setdefault(bugId, {})
+            total = sum(b for entries in self.keptGcda.values() for _, b in entries.values())
+            if key in kept or total + size > self.cfg.keepGcdaBytes:
+                return
+            kept[key] = (conf, size)
+        os.makedirs(self.keepDir(bugId), exist_ok=True)
+        try:
+            os.rename(gcdaDir, os.path.join(self.keepDir(bugId), key))
+        except OSError:
+            with self.keptLock:  # nothing was written
+                kept.pop(key, None)
+
+    def takeGcda(self, bugId, rev, conf, gcdaDir):
+        # move kept counters of conf to gcdaDir, False if there are none
+        key = self.gcdaKey(bugId, rev, conf)
+        with self.keptLock:
+            if self.keptGcda.get(bugId, {}).pop(key, None) is None:
+                return False
+        try:
+            os.rename(os.path.join(self.keepDir(bugId), key), gcdaDir)
+        except OSError:
+            return False
+        return True
+
+    def pruneGcda(self, bugId, wanted):
+        # drop the kept counters of the configurations that can no longer become final,
+        # those for which wanted(conf) is false
+        with self.keptLock:
+            kept = self.keptGcda.get(bugId, {})
+            stale = [key for key, (conf, _) in kept.items() if not wanted(conf)]
+            for key in stale:
+                del kept[key]
+        for key in stale:
+            shutil.rmtree(os.path.join(self.keepDir(bugId), key), ignore_errors=True)
+
+    def dropGcda(self, bugId):
+        with self.keptLock:
+            self.keptGcda.pop(bugId, None)
+        shutil.rmtree(self.keepDir(bugId), ignore_errors=True)
+
+    def spawn(self, kind, argv, cwd, env=None, timeout=None, output=True):
+        # every compiler, gcov and a.out process goes through admission and execute.run
+        cfg = self.cfg
+        stream = subprocess.PIPE if output else subprocess.DEVNULL
+        with cfg.admission.slot(), cfg.tracer.span('exec:' + kind) as span:
+            result = execute.run(argv, cwd=cwd, env=env, timeout=timeout, stdout=stream, stderr=stream,
+                                 limits=cfg.procLimits, kind=kind)
+            span.args['cpu'] = round(result.cpu, 3)
+        cfg.tracer.count(kind)
+        if result.timedout:
+            cfg.tracer.count('timeouts')
+        return result
+
+    @contextlib.contextmanager
+    def spawnStream(self, kind, argv, cwd, timeout=None):
+        # spawn() for a process whose stdout is parsed while it runs (gcov_json_lines)
+        cfg = self.cfg
+        with cfg.admission.slot(), cfg.tracer.span('exec:' + kind) as span:
+            with execute.Stream(argv, cwd=cwd, timeout=timeout, limits=cfg.procLimits, kind=kind) as proc:
+                yield proc
+            span.args['cpu'] = round(proc.result.cpu, 3)
+        cfg.tracer.count(kind)
+        if proc.result.timedout:
+            cfg.tracer.count('timeouts')
+
+    def gcovStream(self, argv, cwd):
+        return self.spawnStream('gcov', argv, cwd, self.cfg.gcovTimeout)
+
+    def gcov(self, argv, cwd):
+        # gcov writing its text output into cwd
+        result = self.spawn('gcov', argv, cwd, timeout=self.cfg.gcovTimeout, output=False)
+        if result.timedout:
+            raise ValueError('gcov on %d counter files (%s, ...) was killed after the timeout' % (len(argv) - 1, argv[1]))
+        return result
+
+    def stopAfter(self, bugId):
+        # crash bugs only need the compiler's return code, so nothing is assembled or linked
+        return ['-S'] if bugId in self.cfg.crash_bugId_lst else []
+
+    def runExe(self, cwd, timeout):
+        # many configurations build the very same a.out; run every distinct binary once
+        outcomeCache = self.cfg.outcomeCache
+        digest = file_hash(os.path.join(cwd, 'a.out'))
+        result = self.exeOutcomes.get(digest)
+        key = outcomeCache.key('a.out', '', '', digest, 'exe') if outcomeCache is not None else None
+        if result is None and key is not None:
+            result = outcomeCache.get(key)
+        if result is not None:
+            self.cfg.tracer.count('exe_reuse')
+        else:
+            exeout = self.spawn('run', ['./a.out'], cwd, timeout=timeout)
+            if exeout.timedout:
+                return 'EXETimeoutExpired'
+            result = str(exit_status(exeout)) + ':' + exeout.stdout.decode().strip() + ':' + exeout.stderr.decode().strip()
+            if key is not None:
+                outcomeCache.put(key, result)
+        self.exeOutcomes[digest] = result
+        return result
+
+    def runConf(self, bugId, rev, conf, timeout, keep=False):
+        cwd = self.makeScratch(bugId)
+        try:
+            # keep the compiler's own coverage counters out of the shared build tree
+            env = gcov_env(self.buildDir(rev), os.path.join(cwd, 'gcda'))
+            argv = [self.binPath(rev, self.compiler), '-w'] + conf.split() + self.stopAfter(bugId) + ['fail.c']
+            with self.compilesLock:
+                self.compiles[bugId] = self.compiles.get(bugId, 0) + 1
+            cplout = self.spawn('compile', argv, cwd, env, timeout)
+            if cplout.timedout:
+                # killed before the compiler wrote its counters
+                return 'CPLTimeoutExpired'
+            if self.cfg.captureCoverage and keep:
+                self.keepGcda(bugId, rev, conf, os.path.join(cwd, 'gcda'))
+            if bugId in self.cfg.crash_bugId_lst:
+                return str(exit_status(cplout))
+            else:
+                if cplout.returncode != 0:
+                    return str(exit_status(cplout)) + ':' + cplout.stdout.decode().strip() + ':' + cplout.stderr.decode().strip()
+
+                return self.runExe(cwd, timeout)
+        finally:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+    def getConfResult(self, bugId, rev, conf, timeout=None, keep=False):
+        cfg = self.cfg
+        if timeout is None:
+            timeout = cfg.timeout
+        with cfg.tracer.span('probe', conf=conf):
+            if cfg.outcomeCache is None:
+                return self.runConf(bugId, rev, conf, timeout, keep)
+            mode = 'crash-S' if bugId in cfg.crash_bugId_lst else 'run'
+            key = cfg.outcomeCache.key(self.compiler, rev, conf, source_hash(self.failSource(bugId)), mode)
+            result = cfg.outcomeCache.get(key)
+            if result is None:
+                cfg.tracer.count('cache_miss')
+                result = self.runConf(bugId, rev, conf, timeout, keep)
+                cfg.outcomeCache.put(key, result)
+            else:
+                cfg.tracer.count('cache_hit')
+            return result
+
+    def mapParallel(self, func, items, pool='probe'):
+        # the workers trace the items under the bug of the caller
+        return self.cfg.scheduler.map(self.cfg.tracer.bound(func), items, PRIORITIES[pool])
+
+    def mapProbes(self, bugId, rev, confs, keep=False):
+        return self.mapParallel(lambda conf: self.getConfResult(bugId, rev, conf, keep=keep), confs)
+
+    def gcovBatches(self, gcdafiles):
+        return gcov_batches(gcdafiles, self.cfg.gcovBatchSize)
+
+    def counterFiles(self, bugId, rev, conf, testname, cwd):
+        # compile the test program like the probes do, unless one of them already did and kept
+        # its counters; the counters it wrote, restricted to the indexed objects of the build tree
+        covDir = self.buildDir(rev)
+        gcdaDir = os.path.join(cwd, 'gcda')
+        if self.takeGcda(bugId, rev, conf, gcdaDir):
+            self.cfg.tracer.count('kept_gcda')
+        else:
+            argv = [self.binPath(rev, self.compiler), '-w'] + conf.split() + self.stopAfter(bugId) + ['fail.c']
+            self.spawn('coverage', argv, cwd, gcov_env(covDir, gcdaDir), output=False)
+
+        objects = cached_index(covDir, self.index)
+        gcdafiles = []
+        written = 0
+        for root, _, files in os.walk(gcdaDir):
+            written += len(files)
+            for name in files:
+                gcdafile = os.path.join(root, name)
+                relgcda = os.path.relpath(gcdafile, gcdaDir)
+                if relgcda in objects:
+                    gcdafiles.append((os.path.join(covDir, relgcda[:-len('.gcda')] + '.gcno'), gcdafile, objects[relgcda]))
+        gcdafiles.sort(key=lambda item: item[1])
+        if not gcdafiles:
+            # every spectrum would be empty and every score 0: the compiler wrote no counters,
+            # GCOV_PREFIX_STRIP does not fit the build path, or the index is stale
+            raise ValueError('%s %s: no counter file of the indexed objects (%d written for %r, index %s)' % (
+                bugId, testname, written, conf, index_path(covDir)))
+        return gcdafiles
+
+    def collectCov(self, bugId, rev, conf, testname, collectDir):
+        cfg = self.cfg
+        cwd = self.makeScratch(bugId)
+        try:
+            gcdafiles = self.counterFiles(bugId, rev, conf, testname, cwd)
+            merged = None
+            if cfg.covBackend != 'gcov':
+                try:
+                    merged = cfg.nativeCov(gcdafiles)
+                except UnsupportedFormat:
+                    if cfg.covBackend == 'native':
+                        raise
+            if merged is None:
+                merged = cfg.gcovCov(rev, cwd, gcdafiles)
+        finally:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+        # {source name: bitset of executed lines}
+        spectrum = dict((tmpfilename, lines_to_bits(lines)) for tmpfilename, lines in merged.items() if len(lines) > 0)
+
+        if cfg.exportStmtInfo:
+            write_stmt_info(os.path.join(collectDir, bugId, testname), merged)
+        return spectrum
+
+    @staticmethod
+    def rankAll(files, failSpectra, passSpectra, formulaNames=None):
+        # efs: how many failing test programs executed each statement
+        failcount = SpectrumCounter()
+        failstmtset = {}  # all statements executed by some failing test program
+        for spectrum in failSpectra:
+            failcount.add(spectrum)
+            failstmtset = union([failstmtset, spectrum])
+
+        # eps, only statements that some failing test program executed are scored
+        passcount = SpectrumCounter()
+        for spectrum in passSpectra:
+            passcount.add(restrict(spectrum, failstmtset))
+
+        # the scores only depend on the counts, so every formula is evaluated once
+        # per group of statements sharing (ef, ep)
+        efs, eps = [], []
+        filestmts = []  # (filename, [(line, group)] in line order)
+        for fid in sorted(failstmtset, key=files.name):
+            stmts = []
+            for ef, efmask in failcount.classes(fid, failstmtset[fid]):
+                for ep, mask in passcount.classes(fid, efmask):
+                    stmts += [(line, len(efs)) for line in bits_to_lines(mask)]
+                    efs.append(ef)
+                    eps.append(ep)
+            stmts.sort()
+            filestmts.append((files.name(fid), stmts))
+        groupscores = evaluate(efs, eps, failcount.total, passcount.total, formulaNames)
+
+        keys = [filename + ',' + str(line) for filename, stmts in filestmts for line, _ in stmts]
+        results = {}
+        for formula, values in groupscores.items():
+            score = {}  # the buggy value of each statement and its line number in each file
+            scoredict = {}  # the buggy value of each file, the average of its statement values
+            i = 0
+            for filename, stmts in filestmts:
+                stmtvalues = [values[group] for _, group in stmts]
+                score.update(zip(keys[i:i + len(stmts)], stmtvalues))
+                scoredict[filename] = sum(stmtvalues) / len(stmtvalues)
+                i += len(stmts)
+            results[formula] = (scoredict, score)
+        return results
+
+    def writeRanking(self, outdir, formula, scoredict, stmt_score):
+        # write file-level score dict (unsorted), as JSON and as the Python literal older scripts eval
+        write_scoredict(os.path.join(outdir, formula + '_scoredict.json'), scoredict)
+        with open(os.path.join(outdir, formula + '_scoredict.txt'), 'w', encoding='utf-8') as f:
+            f.write(str(scoredict))
+
+        # write file-level sorted list
+        with open(os.path.join(outdir, formula + '_scoredict_sorted.txt'), 'w', encoding='utf-8') as f:
+            for k, v in sorted(scoredict.items(), key=lambda x: x[1], reverse=True):
+                f.write(str(k)+"\t"+str(v)+"\n")
+
+        # write statement-level scores, see ranking.py for the modes
+        stmtOutput = self.cfg.stmtOutput
+        groups = score_groups(stmt_score)
+        if stmtOutput == 'full':
+            write_scores(os.path.join(outdir, formula + '_stmt_scores.txt'), stmt_score)
+            write_sorted(os.path.join(outdir, formula + '_stmt_sorted.txt'), groups)
+        elif stmtOutput == 'topk':
+            write_sorted(os.path.join(outdir, formula + '_stmt_sorted.txt'), top_groups(groups, self.cfg.stmtTopK))
+        elif stmtOutput == 'jsonl':
+            write_jsonl(os.path.join(outdir, formula + '_stmt_ranks.jsonl'), groups)
+        else:
+            raise ValueError('unknown stmtOutput %r' % stmtOutput)
+
+    def getRank(self, bugId, rev, passConfs, failConfs, collectDir):
+        cfg = self.cfg
+        sbflFormulas = cfg.sbflFormulas
+        # collect cov
+        tempdir = os.path.join(collectDir, bugId)
+        # the journal of the bug lives here, so earlier results are kept
+        os.makedirs(tempdir, exist_ok=True)
+
+        # every collection has its own GCOV_PREFIX, so all of them can run at once
+        tests = [('pass' + str(i + 1), conf) for i, conf in enumerate(passConfs)]
+        tests += [('fail' + str(i + 1), conf) for i, conf in enumerate(failConfs)]
+
+        # the rankings of a finished run with the same configurations and outputs are kept
+        rankKey = self.phaseKey(bugId, rev, 'ranking', [tests, sbflFormulas, cfg.stmtOutput, cfg.stmtTopK])
+        if cfg.useJournal and self.bugJournal(bugId).get('ranking', rankKey) is not None and \
+                all(os.path.exists(os.path.join(tempdir, formula + '_scoredict.json')) for formula in sbflFormulas):
+            cfg.tracer.count('resumed')
+            return read_scoredict(os.path.join(tempdir, sbflFormulas[0] + '_scoredict.json'))
+
+        def collect(test):
+            testname, conf = test
+            key = self.phaseKey(bugId, rev, 'coverage', [conf])
+            if cfg.useJournal:
+                spectrum = self.bugJournal(bugId).get_spectrum('coverage/' + testname, key)
+                if spectrum is not None:
+                    cfg.tracer.count('resumed')
+                    return spectrum
+            with cfg.tracer.span('coverage', test=testname):
+                spectrum = self.collectCov(bugId, rev, conf, testname, collectDir)
+            if cfg.useJournal:
+                self.bugJournal(bugId).put_spectrum('coverage/' + testname, key, spectrum)
+            return spectrum
+        spectra = self.mapParallel(collect, tests, pool='coverage')
+
+        # one binary store per bug holds the spectra of all configurations
+        files = FileTable()
+        storeFile = os.path.join(collectDir, bugId, 'spectra.bin')
+        write_store(storeFile, files, [(testname, dict((files.intern(name), bits) for name, bits in spectrum.items()))
+                                       for (testname, _), spectrum in zip(tests, spectra)])
+        del spectra
+
+        # rank files and statements by every formula from one pass over the spectra
+        with SpectrumStore(storeFile) as store:
+            failSpectra = (store.spectrum(testname) for testname, _ in tests if testname.startswith('fail'))
+            passSpectra = (store.spectrum(testname) for testname, _ in tests if testname.startswith('pass'))
+            with cfg.tracer.span('rank'):
+                rankings = self.rankAll(store.files, failSpectra, passSpectra, sbflFormulas)
+        for formula, (scoredict, stmt_score) in rankings.items():
+            with cfg.tracer.span('write', formula=formula):
+                self.writeRanking(os.path.join(collectDir, bugId), formula, scoredict, stmt_score)
+        if cfg.useJournal:
+            self.bugJournal(bugId).put('ranking', rankKey, sbflFormulas)
+        return rankings[sbflFormulas[0]][0]
+
+    def runBugs(self, bugs, revOf, task):
+        # task(bug) for every bug whose compiler is built, in a private scratch directory
+        # of this run below scratchBase that is removed at the end
+        cfg = self.cfg
+        bugs = [bug for bug in bugs if os.path.exists(self.buildDir(revOf(bug)))]
+        print('scratch: %s' % cfg.scratchDir)
+        try:
+            if cfg.stageCompilers:
+                # RAM copies of the compilers, private to this run
+                stageDir = tempfile.mkdtemp(prefix='compilers-', dir=cfg.scratchDir)
+                for rev in sorted(set(revOf(bug) for bug in bugs)):
+                    self.stageCompiler(rev, stageDir)
+            if not cfg.parallel:
+                for bug in bugs:
+                    task(bug)
+            else:
+                # one driver thread per bug in flight; the drivers only wait for their
+                # bug's tasks, which run on the shared workers of scheduler
+                with concurrent.futures.ThreadPoolExecutor(cfg.processes) as drivers:
+                    futures = [drivers.submit(task, bug) for bug in bugs]
+                    for bug, future in zip(bugs, futures):
+                        try:
+                            future.result()
+                        except Exception:
+                            print('\033[1;31m%s failed\033[0m' % bug)
+                            traceback.print_exc()
+        finally:
+            # the staged compilers and the counters of bugs that failed go with it
+            shutil.rmtree(cfg.scratchDir, ignore_errors=True)
+
+    def report(self):
+        cfg = self.cfg
+        # how long processes waited for admission
+        print('admission: ' + ', '.join('%s=%s' % item for item in sorted(cfg.admission.stats().items())))
+        # wall time, CPU time and peak RSS of the spawned processes, per kind
+        for kind, entry in sorted(execute.stats.summary().items()):
+            print('%s: calls=%d, timeouts=%d, wall=%.3f, cpu=%.3f, maxrss=%dMB' % (
+                kind, entry['calls'], entry['timeouts'], entry['wall'], entry['cpu'], entry['maxrss'] // (1024 * 1024)))
+        if cfg.traceRun:
+            trace, summary = os.path.join(cfg.collectDir, 'trace.json'), os.path.join(cfg.collectDir, 'trace_summary.txt')
+            cfg.tracer.write_chrome(trace)
+            cfg.tracer.write_summary(summary)
+            print('trace: %s, summary: %s' % (trace, summary))
@@ -0,0 +1,111 @@
+"""Writers for the statement and file rankings of getRank.
+
+A bug has up to hundreds of thousands of scored statements but only a few
+distinct scores (one per (ef, ep) count pair). The writers therefore work on
+score groups -- every score with its statements in scoring order -- which
+gives the order of a stable descending sort without sorting the statements,
+and stream the lines to disk in chunks instead of building one large string.
+
+    full   <formula>_stmt_scores.txt and <formula>_stmt_sorted.txt, all statements
+    topk   <formula>_stmt_sorted.txt with the best k statements, plus all
+           statements tied with the k-th
+    jsonl  <formula>_stmt_ranks.jsonl, one line per score:
+           {"score": s, "first": r, "last": r', "stmts": {file: [line, ...]}}
+           where first..last is the range of ranks the tied statements share
+"""
+import json
+import os
+import tempfile
+
+CHUNK = 4096
+
+
+def score_groups(scores):
+    """[(score, [statement, ...])] by descending score, statements in the order of scores."""
+    groups = {}
+    for key, value in scores.items():
+        members = groups.get(value)
+        if members is None:
+            members = groups[value] = []
+        members.append(key)
+    return sorted(groups.items(), key=lambda x: x[0], reverse=True)
+
+
+def top_groups(groups, k):
+    """The leading groups that hold at least k statements; ties with the k-th are kept."""
+    result = []
+    count = 0
+    for value, keys in groups:
+        if count >= k:
+            break
+        result.append((value, keys))
+        count += len(keys)
+    return result
+
+
+def _atomic(path, mode='w'):
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp')
+    return os.fdopen(fd, mode, encoding='utf-8'), tmppath
+
+
+def _publish(f, tmppath, path):
+    f.close()
+    os.chmod(tmppath, 0o644)  # mkstemp creates the file private
+    os.replace(tmppath, path)
+
+
+def _write(path, lines):
+    f, tmppath = _atomic(path)
+    try:
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == CHUNK:
+                f.write(''.join(chunk))
+                chunk = []
+        f.write(''.join(chunk))
+        _publish(f, tmppath, path)
+    except BaseException:
+        f.close()
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+        raise
+
+
+def write_scores(path, scores):
+    """key<TAB>score lines in the order of scores."""
+    _write(path, (key + '\t' + str(value) + '\n' for key, value in scores.items()))
+
+
+def write_sorted(path, groups):
+    """key<TAB>score lines by descending score."""
+    def lines():
+        for value, keys in groups:
+            suffix = '\t' + str(value) + '\n'
+            for key in keys:
+                yield key + suffix
+    _write(path, lines())
+
+
+def write_jsonl(path, groups):
+    def lines():
+        first = 1
+        for value, keys in groups:
+            stmts = {}
+            for key in keys:
+                filename, line = key.rsplit(',', 1)
+                stmts.setdefault(filename, []).append(int(line))
+            yield json.dumps({'score': value, 'first': first, 'last': first + len(keys) - 1, 'stmts': stmts},
+                             separators=(',', ':')) + '\n'
+            first += len(keys)
+    _write(path, lines())
+
+
+def write_scoredict(path, scoredict):
+    """File-level scores as one JSON object."""
+    _write(path, [json.dumps(scoredict)])
+
+
+def read_scoredict(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
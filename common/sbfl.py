@@ -0,0 +1,98 @@
+"""SBFL suspiciousness formulas, evaluated for many statements at once.
+
+Every formula takes the four spectrum counts (ef, nf, ep, np) and has to work
+both on floats and on numpy arrays; use div() and sqrt() from this module
+instead of / and math.sqrt so that zero denominators and arrays are handled
+alike. Custom formulas are added with register().
+
+numpy is optional: without it the formulas are applied to one count tuple at
+a time, with the same floating point results.
+"""
+import math
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _isarray(x):
+    return numpy is not None and isinstance(x, numpy.ndarray)
+
+
+def div(a, b, default=0.0):
+    """a / b, or default where b is zero (0/0 has no meaningful suspiciousness)."""
+    if _isarray(a) or _isarray(b):
+        nonzero = numpy.asarray(b) != 0
+        return numpy.where(nonzero, a / numpy.where(nonzero, b, 1), default)
+    return a / b if b != 0 else default
+
+
+def sqrt(x):
+    return numpy.sqrt(x) if _isarray(x) else math.sqrt(x)
+
+
+def ochiai(ef, nf, ep, np):
+    return div(ef, sqrt((ef + nf) * (ef + ep)))
+
+
+def tarantula(ef, nf, ep, np):
+    failed = div(ef, ef + nf)
+    passed = div(ep, np + ep)
+    return div(failed, failed + passed)
+
+
+def dstar(ef, nf, ep, np):
+    return div(ef * ef, ep + nf, 1.0)
+
+
+def dice(ef, nf, ep, np):
+    return div(2 * ef, ef + nf + ep)
+
+
+def barinel(ef, nf, ep, np):
+    return 1 - div(ep, ep + ef)
+
+
+def op2(ef, nf, ep, np):
+    return ef - div(ep, 1 + np + ep)
+
+
+formulas = OrderedDict([
+    ('Ochiai', ochiai),
+    ('Tarantula', tarantula),
+    ('DStar', dstar),
+    ('Dice', dice),
+    ('Barinel', barinel),
+    ('Op2', op2),
+])
+
+
+def register(name, formula):
+    formulas[name] = formula
+
+
+def evaluate(ef, ep, nfail, npass, names=None):
+    """Score count vectors ef and ep (sequences of ints) with every formula in names.
+
+    nfail and npass are the numbers of failing and passing test programs.
+    Returns {formula name: list of float scores, aligned with ef and ep}.
+    """
+    if names is None:
+        names = list(formulas)
+    scores = {}
+    if numpy is not None:
+        ef = numpy.asarray(ef, dtype=float)
+        ep = numpy.asarray(ep, dtype=float)
+        nf = nfail - ef
+        np = npass - ep
+        for name in names:
+            values = formulas[name](ef, nf, ep, np)
+            scores[name] = numpy.broadcast_to(values, ef.shape).astype(float).tolist()
+        return scores
+    counts = [(float(a), float(nfail - a), float(b), float(npass - b)) for a, b in zip(ef, ep)]
+    for name in names:
+        formula = formulas[name]
+        scores[name] = [float(formula(*count)) for count in counts]
+    return scores
@@ -0,0 +1,95 @@
+"""Shared worker pool for all bugs of a run.
+
+Every bug is driven by its own thread (task), which submits the work it is
+ready for -- option probes, coverage collections, gcov batches -- to one
+Scheduler. The driver blocks until that work is done, so the order of the
+phases of a bug (probes -> minimization -> coverage -> rank) is kept by the
+driver, while the workers take whatever is queued by any bug. A bug with many
+probes thus spreads over all idle workers instead of occupying one process.
+
+Tasks of later phases have a higher priority, so bugs that are already
+collecting coverage finish first and release their scratch space. A worker
+that submits tasks itself (a coverage collection submitting gcov batches)
+runs queued tasks of at least the same priority while it waits, so nested
+submissions never deadlock the pool.
+"""
+import heapq
+import itertools
+import threading
+import concurrent.futures
+
+
+class Scheduler(object):
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.queue = []  # (-priority, sequence, future, func, item)
+        self.cond = threading.Condition()
+        self.sequence = itertools.count()
+        self.local = threading.local()
+        self.threads = []
+
+    def _start(self):
+        # workers are started on first use, so importing the run scripts stays cheap
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._work, name='worker-%d' % len(self.threads))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, func, item, priority=0):
+        future = concurrent.futures.Future()
+        with self.cond:
+            self._start()
+            heapq.heappush(self.queue, (-priority, next(self.sequence), future, func, item))
+            self.cond.notify()
+        return future
+
+    def _pop(self, priority=None):
+        # caller holds the lock
+        if not self.queue or (priority is not None and -self.queue[0][0] < priority):
+            return None
+        return heapq.heappop(self.queue)
+
+    def _run(self, entry):
+        _, _, future, func, item = entry
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(item)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _work(self):
+        self.local.worker = True
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                entry = self._pop()
+            try:
+                self._run(entry)
+            finally:
+                with self.cond:
+                    self.cond.notify_all()  # wake helpers waiting for this result
+
+    def map(self, func, items, priority=0):
+        items = list(items)
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        futures = [self.submit(func, item, priority) for item in items]
+        if getattr(self.local, 'worker', False):
+            # help instead of blocking a worker slot
+            while not all(future.done() for future in futures):
+                with self.cond:
+                    entry = self._pop(priority)
+                    if entry is None:
+                        if not all(future.done() for future in futures):
+                            self.cond.wait(0.1)
+                        continue
+                self._run(entry)
+                with self.cond:
+                    self.cond.notify_all()
+        return [future.result() for future in futures]
@@ -0,0 +1,58 @@
+"""Scratch roots of the run scripts.
+
+Probe outputs and coverage counters are written below a scratch base:
+$ODFL_SCRATCH/<compiler> if set, /dev/shm/odfl-<uid>/<compiler> if /dev/shm
+is writable and has enough free space, and a directory next to the scripts
+otherwise. Every run works in its own directory below the base, so runs of
+the same bugs from other checkouts never see each other's files.
+"""
+import os
+import shutil
+import socket
+import tempfile
+
+SHM = '/dev/shm'
+
+
+def free_bytes(path):
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def scratch_base(compiler, fallback, shm_min_free):
+    if os.environ.get('ODFL_SCRATCH'):
+        return os.path.join(os.environ['ODFL_SCRATCH'], compiler)
+    if os.access(SHM, os.W_OK) and free_bytes(SHM) >= shm_min_free:
+        return os.path.join(SHM, 'odfl-%d' % os.getuid(), compiler)
+    return fallback
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _host():
+    # the base may be shared by several machines (ODFL_SCRATCH on NFS); '-' separates the name parts
+    return socket.gethostname().split('.')[0].replace('-', '_') or 'localhost'
+
+
+def make_run_dir(base):
+    """A new private directory run-<host>-<pid>-* below base for this run.
+
+    Directories of runs on this host whose process is gone (killed before they
+    could clean up) are removed first; the pids of other hosts mean nothing
+    here, their directories are left alone.
+    """
+    os.makedirs(base, exist_ok=True)
+    host = _host()
+    for name in os.listdir(base):
+        parts = name.split('-')
+        if len(parts) > 3 and parts[0] == 'run' and parts[1] == host and parts[2].isdigit() and not _alive(int(parts[2])):
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    return tempfile.mkdtemp(prefix='run-%s-%d-' % (host, os.getpid()), dir=base)
@@ -0,0 +1,250 @@
+"""Compact coverage spectra for SBFL ranking.
+
+A spectrum maps an interned file id to the set of executed lines of that file,
+stored as a Python integer used as a bitset (bit n set = line n executed).
+Union, difference and intersection of whole files are then single integer
+operations carried out in C, and a file costs one bit per source line instead
+of one "file,line" string object per executed statement.
+
+SpectrumCounter counts, for every line, how many spectra executed it. The
+counts are kept bit-sliced (plane k holds bit k of every line's count), so
+adding a spectrum is a handful of integer operations per file, and all lines
+sharing one count are extracted together as a mask.
+
+The spectra of one bug are stored in a single binary file (write_store) that
+is read back through mmap (SpectrumStore): a header with the file name table
+and an offset index, followed by one zlib block per configuration holding
+the bitsets of the files it executed.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+
+STORE_MAGIC = b'ODFLSPC1'
+
+
+class FileTable(object):
+    """Interns file names to small integer ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        fid = self.ids.get(name)
+        if fid is None:
+            fid = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return fid
+
+    def name(self, fid):
+        return self.names[fid]
+
+
+def lines_to_bits(lines):
+    lines = list(lines)
+    if not lines:
+        return 0
+    buf = bytearray(max(lines) // 8 + 1)
+    for line in lines:
+        buf[line >> 3] |= 1 << (line & 7)
+    return int.from_bytes(bytes(buf), 'little')
+
+
+def bits_to_lines(bits):
+    # bin() is linear in the number of bits, unlike peeling off one bit at a time
+    digits = bin(bits)[:1:-1]
+    lines = []
+    pos = digits.find('1')
+    while pos != -1:
+        lines.append(pos)
+        pos = digits.find('1', pos + 1)
+    return lines
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def read_spectrum(path, files):
+    """Read a stmt_info.txt file ("file$line,line,..." per line) into a spectrum."""
+    spectrum = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            filename, stmts = line.split('$')
+            fid = files.intern(filename)
+            spectrum[fid] = spectrum.get(fid, 0) | lines_to_bits(map(int, stmts.split(',')))
+    return spectrum
+
+
+def format_spectrum(spectrum, files):
+    """stmt_info.txt lines ("file$line,line,...") of a spectrum, sorted by file name."""
+    return sorted(files.name(fid) + '$' + ','.join(str(line) for line in bits_to_lines(bits))
+                  for fid, bits in spectrum.items() if bits)
+
+
+def union(spectra):
+    result = {}
+    for spectrum in spectra:
+        for fid, bits in spectrum.items():
+            result[fid] = result.get(fid, 0) | bits
+    return result
+
+
+def restrict(spectrum, domain):
+    """The part of spectrum inside domain (another spectrum)."""
+    result = {}
+    for fid, bits in spectrum.items():
+        if fid in domain:
+            bits &= domain[fid]
+            if bits:
+                result[fid] = bits
+    return result
+
+
+class SpectrumCounter(object):
+
+    def __init__(self):
+        self.planes = {}  # file id -> [bit 0 of the counts, bit 1, ...]
+        self.total = 0
+
+    def add(self, spectrum):
+        self.total += 1
+        for fid, carry in spectrum.items():
+            planes = self.planes.setdefault(fid, [])
+            k = 0
+            while carry:
+                if k == len(planes):
+                    planes.append(carry)
+                    break
+                planes[k], carry = planes[k] ^ carry, planes[k] & carry
+                k += 1
+
+    def mask(self, fid, count, domain):
+        """Lines of domain (a bitset of file fid) executed by exactly count spectra."""
+        planes = self.planes.get(fid, [])
+        if count >> len(planes):
+            return 0
+        bits = domain
+        for k, plane in enumerate(planes):
+            bits &= plane if count >> k & 1 else ~plane
+            if not bits:
+                break
+        return bits
+
+    def classes(self, fid, domain):
+        """Yield (count, mask) for every count that occurs among the lines of domain."""
+        remaining = domain
+        for count in range(self.total + 1):
+            if not remaining:
+                break
+            bits = self.mask(fid, count, remaining)
+            if bits:
+                remaining &= ~bits
+                yield count, bits
+
+
+def write_store(path, files, spectra):
+    """Write [(test name, spectrum)] to path atomically; spectra use the ids of files."""
+    blocks = []
+    for _, spectrum in spectra:
+        raw = []
+        for fid in sorted(spectrum):
+            bits = spectrum[fid]
+            if bits:
+                data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+                raw.append(struct.pack('<II', fid, len(data)) + data)
+        raw = b''.join(raw)
+        blocks.append((zlib.compress(raw, 6), len(raw)))
+
+    names = [name.encode('utf-8') for name in files.names]
+    tests = [name.encode('utf-8') for name, _ in spectra]
+    header = struct.calcsize('<8sII') + sum(struct.calcsize('<H') + len(name) for name in names) \
+        + sum(struct.calcsize('<HQII') + len(name) for name in tests)
+    parts = [struct.pack('<8sII', STORE_MAGIC, len(names), len(tests))]
+    parts += [struct.pack('<H', len(name)) + name for name in names]
+    offset = header
+    for name, (block, rawlen) in zip(tests, blocks):
+        parts.append(struct.pack('<H', len(name)) + name + struct.pack('<QII', offset, len(block), rawlen))
+        offset += len(block)
+    parts += [block for block, _ in blocks]
+
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b''.join(parts))
+        os.chmod(tmppath, 0o644)  # mkstemp creates the file private
+        os.replace(tmppath, path)
+    except BaseException:
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+        raise
+
+
+class SpectrumStore(object):
+    """Read-only view of a file written by write_store."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, nfiles, ntests = struct.unpack_from('<8sII', self.map)
+        if magic != STORE_MAGIC:
+            self.close()
+            raise ValueError('{}: not a spectrum store'.format(path))
+        pos = struct.calcsize('<8sII')
+        self.files = FileTable()
+        for _ in range(nfiles):
+            length, = struct.unpack_from('<H', self.map, pos)
+            pos += 2
+            self.files.intern(bytes(self.view[pos:pos + length]).decode('utf-8'))
+            pos += length
+        self.index = {}
+        self.tests = []
+        for _ in range(ntests):
+            length, = struct.unpack_from('<H', self.map, pos)
+            pos += 2
+            name = bytes(self.view[pos:pos + length]).decode('utf-8')
+            pos += length
+            self.index[name] = struct.unpack_from('<QII', self.map, pos)
+            pos += struct.calcsize('<QII')
+            self.tests.append(name)
+
+    def spectrum(self, name):
+        offset, length, rawlen = self.index[name]
+        raw = memoryview(zlib.decompress(self.view[offset:offset + length], 15, max(rawlen, 1)))
+        spectrum = {}
+        pos = 0
+        while pos < len(raw):
+            fid, nbytes = struct.unpack_from('<II', raw, pos)
+            pos += 8
+            spectrum[fid] = int.from_bytes(raw[pos:pos + nbytes], 'little')
+            pos += nbytes
+        return spectrum
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    # python spectra.py cov/<bugId>/spectra.bin: export every configuration as
+    # cov/<bugId>/<test name>/stmt_info.txt
+    with SpectrumStore(sys.argv[1]) as store:
+        for name in store.tests:
+            outdir = os.path.join(os.path.dirname(sys.argv[1]), name)
+            os.makedirs(outdir, exist_ok=True)
+            with open(os.path.join(outdir, 'stmt_info.txt'), 'w') as f:
+                f.write('\n'.join(format_spectrum(store.spectrum(name), store.files)))
@@ -0,0 +1,147 @@
+"""Spans and counters of a run, kept per bug.
+
+A span times one phase of one bug (an option query, a probe, a coverage
+collection, a gcov batch, a compiler process...); a counter counts events such
+as compiler invocations, cache hits or timeouts. The bug a span or counter
+belongs to is the one of the enclosing 'task' span of the thread; work handed
+to the scheduler keeps the bug of its submitter through bound().
+
+Recording is one tuple appended to a list per span, so tracing can stay on
+in production runs. At the end of a run write_chrome writes the spans in the
+Chrome trace_event format (chrome://tracing, Perfetto), one process per bug
+and one thread per worker, and write_summary the time per phase and the
+counters per bug:
+
+    phase   calls   total   mean    max
+    probe   63      3.612   0.057   0.120
+    ...
+
+    bug     compile run     ...
+    56478   63      17      ...
+"""
+import json
+import threading
+import time
+
+
+class _Span(object):
+    __slots__ = ('tracer', 'name', 'bug', 'args', 'prev', 'start')
+
+    def __init__(self, tracer, name, bug, args):
+        self.tracer = tracer
+        self.name = name
+        self.bug = bug
+        self.args = args
+
+    def __enter__(self):
+        local = self.tracer.local
+        self.prev = getattr(local, 'bug', None)
+        if self.bug is None:
+            self.bug = self.prev
+        else:
+            local.bug = self.bug
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        self.tracer.local.bug = self.prev
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        # list.append is atomic, no lock needed
+        self.tracer.spans.append((self.name, self.bug, threading.get_ident(), self.start, end - self.start, self.args))
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = ('args',)
+
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class Tracer(object):
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.spans = []  # (name, bug, thread, start, duration, args)
+        self.counts = {}  # bug -> {counter: n}
+
+    def span(self, name, bug=None, **args):
+        """Context manager timing name; bug (for the thread's enclosing spans as well) defaults to the current one."""
+        if not self.enabled:
+            return _NullSpan()
+        return _Span(self, name, bug, args)
+
+    def current(self):
+        return getattr(self.local, 'bug', None)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        bug = getattr(self.local, 'bug', None)
+        with self.lock:
+            counts = self.counts.setdefault(bug, {})
+            counts[name] = counts.get(name, 0) + n
+
+    def bound(self, func):
+        """func running with the current bug of the calling thread, in whatever thread calls it."""
+        if not self.enabled:
+            return func
+        bug = self.current()
+
+        def call(item):
+            local = self.local
+            prev = getattr(local, 'bug', None)
+            local.bug = bug
+            try:
+                return func(item)
+            finally:
+                local.bug = prev
+        return call
+
+    def phases(self):
+        """{span name: (calls, total seconds, max seconds)}"""
+        result = {}
+        for name, _, _, _, duration, _ in list(self.spans):
+            calls, total, longest = result.get(name, (0, 0.0, 0.0))
+            result[name] = (calls + 1, total + duration, max(longest, duration))
+        return result
+
+    def write_chrome(self, path):
+        bugs = {}
+        threads = {}
+        events = []
+        for name, bug, thread, start, duration, args in list(self.spans):
+            pid = bugs.setdefault(bug, len(bugs))
+            tid = threads.setdefault(thread, len(threads))
+            events.append({'name': name, 'cat': 'odfl', 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': round((start - self.origin) * 1e6, 1), 'dur': round(duration * 1e6, 1), 'args': args})
+        for bug, pid in bugs.items():
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': bug or 'run'}})
+        with self.lock:
+            counts = dict((bug or 'run', dict(counts)) for bug, counts in self.counts.items())
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counts': counts}}, f)
+
+    def write_summary(self, path):
+        lines = ['phase\tcalls\ttotal\tmean\tmax\n']
+        for name, (calls, total, longest) in sorted(self.phases().items(), key=lambda x: -x[1][1]):
+            lines.append('%s\t%d\t%.3f\t%.3f\t%.3f\n' % (name, calls, total, total / calls, longest))
+        with self.lock:
+            counts = dict((bug or 'run', dict(counts)) for bug, counts in self.counts.items())
+        names = sorted(set(name for bugcounts in counts.values() for name in bugcounts))
+        lines.append('\nbug\t' + '\t'.join(names) + '\n')
+        for bug in sorted(counts):
+            lines.append(bug + '\t' + '\t'.join(str(counts[bug].get(name, 0)) for name in names) + '\n')
+        with open(path, 'w') as f:
+            f.write(''.join(lines))
@@ -1,9 +1,31 @@
 import os
+import sys
+import argparse
+import bisect
+import concurrent.futures
+import multiprocessing
 import subprocess
 
+# helper modules shared by the gcc and llvm scripts
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from covindex import write_index
+import mirror
+
 current_directory = os.path.dirname(os.path.abspath(__file__))
 compilersDir = os.path.join(current_directory, 'compilers')
 gccbugsFile = os.path.join(current_directory, 'benchmark', 'gccbugs_summary.txt')
+# parallel make jobs; make starts no new job while the load average is above jobs
+jobs = multiprocessing.cpu_count()
+# git repository of GCC (the svn history is in it as well); a local bare repository works too
+gccRepo = os.environ.get('ODFL_GCC_REPO', 'https://gcc.gnu.org/git/gcc.git')
+gccBranch = 'master'
+# every revision is checked out of this one clone instead of a full svn checkout each
+mirrorDir = os.path.join(compilersDir, 'gcc.git')
+# 'worktree' (git worktree of the mirror) or 'export' (plain copy of the tree)
+checkoutMode = 'worktree'
+# revisions checked out at the same time, while the previous ones are built
+checkoutWorkers = 4
 
 
 def getBugInfo(gccbug):
@@ -12,28 +34,79 @@ def getBugInfo(gccbug):
     return bugId, rev, passOptLevel, failOptLevel, buggyFiles
 
 
+def svnCommits(repo, revs):
+    # the commit of trunk@rNNN, as `svn co -rNNN trunk` checked it out: the last commit of
+    # the branch converted from svn revision NNN or an earlier one (From-SVN: rNNN)
+    log = mirror.git(repo, 'log', '--first-parent', '--format=%H %(trailers:key=From-SVN,valueonly,separator=%x20)', gccBranch)
+    converted = []
+    for line in log.splitlines():
+        items = line.split()
+        if len(items) > 1 and items[1].startswith('r') and items[1][1:].isdigit():
+            converted.append((int(items[1][1:]), items[0]))
+    converted.sort()
+    numbers = [number for number, _ in converted]
+    commits = {}
+    for rev in revs:
+        if not (rev.startswith('r') and rev[1:].isdigit()):
+            commits[rev] = mirror.resolve(repo, rev)  # a git revision
+            continue
+        number = int(rev[1:])
+        i = bisect.bisect_right(numbers, number)
+        if i == 0 or number > numbers[-1]:
+            commits[rev] = None  # older than the branch, or newer than the mirror (fetch it)
+        else:
+            commits[rev] = converted[i - 1][1]
+    return commits
+
+
+def checkoutRev(rev, commit):
+    revpath = os.path.join(compilersDir, rev)
+    if mirror.checkout(mirrorDir, commit, os.path.join(revpath, 'trunk'), checkoutMode):
+        print('\033[1;35m %s checked out (%s)\033[0m' % (rev, commit[:12]))
+
+
 def install(rev):
-    os.chdir(compilersDir)
     revpath = os.path.join(compilersDir, rev)
-    os.system('mkdir ' + revpath)
-    os.chdir(revpath)
-    print('\033[1;35m svn downloading..\033[0m')
-    os.system('svn co svn://gcc.gnu.org/svn/gcc/trunk -' + rev)
     os.chdir(revpath + '/trunk')
     os.system('./contrib/download_prerequisites')
     os.system('mkdir ' + revpath + '/build')
     os.chdir(revpath + '/build')
     os.system('../trunk/configure --enable-languages=c,c++ --enable-checking=release --enable-coverage --prefix='+revpath+'/build')
     print('\033[1;35m make..\033[0m')
-    os.system('make -j 20')
+    os.system('make -j %d -l %d' % (jobs, jobs))
     os.system('make install')
+    # list the instrumented objects once, collectCov reads this index
+    write_index(revpath + '/build', 'gcc')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check out and build the GCC revisions of the benchmark.')
+    parser.add_argument('--checkout-only', action='store_true', help='only check out the sources of every revision')
+    args = parser.parse_args()
     if not os.path.exists(compilersDir):
         subprocess.run('mkdir -p ' + compilersDir, shell=True)
     with open(gccbugsFile, 'r') as f:
         gccbugs = [item.strip() for item in f.readlines()]
+    revs = []
     for item in gccbugs:
         _, rev, _, _, _ = getBugInfo(item)
-        install(rev)
+        if rev not in revs:
+            revs.append(rev)
+    print('\033[1;35m updating %s..\033[0m' % mirrorDir)
+    mirror.ensure_mirror(gccRepo, mirrorDir)
+    commits = mirror.resolve_revisions(mirrorDir, revs, svnCommits)
+    for rev in revs:
+        if commits[rev] is None:
+            print('%s: no commit of %s in %s, skipped' % (rev, gccBranch, gccRepo))
+    revs = [rev for rev in revs if commits[rev] is not None]
+    # a revision is built as soon as its sources are there, the next ones are checked out meanwhile
+    with concurrent.futures.ThreadPoolExecutor(checkoutWorkers) as pool:
+        checkouts = [(rev, pool.submit(checkoutRev, rev, commits[rev])) for rev in revs]
+        for rev, future in checkouts:
+            try:
+                future.result()
+            except mirror.MirrorError as e:
+                print('%s: %s, skipped' % (rev, e))
+                continue
+            if not args.checkout_only:
+                install(rev)
@@ -1,9 +1,24 @@
 import os
+import sys
+import ast
+import json
+import bisect
+import tempfile
+import concurrent.futures
+from collections import OrderedDict
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
 collectDir = os.path.join(current_directory, 'cov')
 gccbugsFile = os.path.join(current_directory, 'benchmark', 'gccbugs_summary.txt')
-rankFile = os.path.join(current_directory, 'ranks.txt')
+# formulas whose rankings are evaluated (getRank writes all of them), e.g. python gcc-result.py DStar,Op2
+formulas = sys.argv[1].split(',') if len(sys.argv) > 1 else ['Ochiai']
+# rank of a buggy file that ties with other files: 'best' (1 + files scoring higher, the
+# original behaviour), 'worst' (files scoring at least as high) or 'average' of the two
+tiePolicy = sys.argv[2] if len(sys.argv) > 2 else 'best'
+# ranks of unchanged bugs are reused from here
+cacheDir = os.path.join(current_directory, 'cache', 'results')
+# bugs whose rankings changed are evaluated by this many processes
+workers = os.cpu_count() or 1
 resultdict = {}
 
 
@@ -34,50 +49,124 @@ def calculate_metrics(resultlist):
     return result
 
 
-if __name__ == '__main__':
-    # Rank
-    with open(gccbugsFile, 'r') as f:
-        gccbugs = [item.strip() for item in f.readlines()]
-
+def scoredictFile(bugId, formula):
+    # the JSON written by getRank, or the Python literal of older runs
+    path = os.path.join(collectDir, bugId, formula + '_scoredict.json')
+    if os.path.exists(path):
+        return path
+    return os.path.join(collectDir, bugId, formula + '_scoredict.txt')
+
+
+def loadScoredict(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return ast.literal_eval(f.read())
+
+
+def fileRank(values, score, policy):
+    # values: all file scores in ascending order
+    best = len(values) - bisect.bisect_right(values, score) + 1
+    if policy == 'best':
+        return best
+    worst = len(values) - bisect.bisect_left(values, score)
+    if policy == 'worst':
+        return worst
+    return (best + worst) / 2
+
+
+def bugRanks(job):
+    # ranks of the buggy files that were scored, None when there are none
+    path, buggyFiles, policy = job
+    scoredict = loadScoredict(path)
+    values = sorted(scoredict.values())
+    ranks = [fileRank(values, scoredict[buggyfile], policy) for buggyfile in buggyFiles if buggyfile in scoredict]
+    return ranks or None
+
+
+def loadCache(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def writeAtomic(path, text):
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.chmod(tmppath, 0o644)  # mkstemp creates the file private
+        os.replace(tmppath, path)
+    except BaseException:
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+        raise
+
+
+def evaluateFormula(gccbugs, formula, policy):
+    # {bugId: ranks}; a bug is evaluated again only when its score file or buggy files changed
+    cacheFile = os.path.join(cacheDir, '%s-%s.json' % (formula, policy))
+    cache = loadCache(cacheFile)
+    newCache = {}
+    jobs = {}
     for gccbug in gccbugs:
         bugId, _, _, _, buggyFiles = getBugInfo(gccbug)
+        path = scoredictFile(bugId, formula)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # not ranked (yet)
+        stamp = [path, st.st_mtime_ns, st.st_size, buggyFiles]
+        entry = cache.get(bugId)
+        if entry is not None and entry['stamp'] == stamp:
+            newCache[bugId] = entry
+        else:
+            newCache[bugId] = {'stamp': stamp, 'ranks': None}
+            jobs[bugId] = (path, buggyFiles, policy)
+
+    if len(jobs) > 1 and workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+            results = pool.map(bugRanks, list(jobs.values()), chunksize=max(1, len(jobs) // (4 * workers)))
+            for bugId, ranks in zip(list(jobs), results):
+                newCache[bugId]['ranks'] = ranks
+    else:
+        for bugId, job in jobs.items():
+            newCache[bugId]['ranks'] = bugRanks(job)
+
+    if newCache != cache:
+        os.makedirs(cacheDir, exist_ok=True)
+        writeAtomic(cacheFile, json.dumps(newCache))
+    # in the order of the summary file, like the ranks files always were
+    return OrderedDict((bugId, entry['ranks']) for bugId, entry in newCache.items() if entry['ranks'] is not None)
 
-        with open(os.path.join(collectDir, bugId, 'Ochiai_scoredict.txt'), 'r') as f:
-            scoredict = eval(f.read())
-
-        tmpresultlist = []
-        flag = False
-        for buggyfile in buggyFiles:
-            if buggyfile not in scoredict:
-                continue
-            else:
-                flag = True
-                score = scoredict[buggyfile]
-                cnt = 1
-                for v in scoredict.values():
-                    if v > score:
-                        cnt += 1
-                tmpresultlist.append(cnt)
-        if flag == True:
-            with open(rankFile, 'a') as f:
-                f.write('%s,%s\n' % (bugId, tmpresultlist))
-
-    with open(rankFile, 'r') as f:
-        lines = f.readlines()
-        for line in lines:
-            bugId, tmpresultlist = line.strip().split(',', 1)
-            resultdict[bugId] = [int(item) for item in tmpresultlist.strip('][').split(', ')]
-    
-    # Result
-    print('\033[1;35m===================================================\033[0m')
-    for key in sorted(resultdict):
-        print('%s,%s' % (key, resultdict[key]))
-    print('\033[1;35m===================================================\033[0m')
-
-    # Metric calculation
-    print('\033[1;35m[metric]:\033[0m')
-    result = calculate_metrics(resultdict.values())
-    for key, value in result.items():
-        print(f"{key}: {value}")
-    print('\033[1;35m===================================================\033[0m')
 
+if __name__ == '__main__':
+    # Rank
+    with open(gccbugsFile, 'r') as f:
+        gccbugs = [item.strip() for item in f.readlines() if item.strip()]
+
+    for formula in formulas:
+        rankName = 'ranks' if formula == 'Ochiai' else formula + '_ranks'
+        if tiePolicy != 'best':
+            rankName += '_' + tiePolicy
+        rankFile = os.path.join(current_directory, rankName + '.txt')
+        resultdict = evaluateFormula(gccbugs, formula, tiePolicy)
+        # rewritten as a whole, so repeated runs do not add lines
+        writeAtomic(rankFile, ''.join('%s,%s\n' % (bugId, resultdict[bugId]) for bugId in resultdict))
+
+        # Result
+        print('\033[1;35m===================================================\033[0m')
+        if len(formulas) > 1:
+            print('\033[1;35m[%s]\033[0m' % formula)
+        for key in sorted(resultdict):
+            print('%s,%s' % (key, resultdict[key]))
+        print('\033[1;35m===================================================\033[0m')
+
+        # Metric calculation
+        print('\033[1;35m[metric]:\033[0m')
+        result = calculate_metrics(resultdict.values())
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        print('\033[1;35m===================================================\033[0m')
@@ -1,8 +1,22 @@
 import os
-import subprocess
-import math
+import sys
+import resource
+import shutil
 import multiprocessing
 
+# helper modules shared by the gcc and llvm scripts
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from conf_cache import OutcomeCache
+from spectra import FileTable, read_spectrum
+from scheduler import Scheduler
+from admission import Admission
+from minimize import minimize, strategies
+from gcov_reader import executed_lines, gcov_format, gcov_json_lines, gcov_text_lines
+from tracing import Tracer
+from scratch import scratch_base, make_run_dir
+from pipeline import Pipeline, gcov_env
+
 current_directory = os.path.dirname(os.path.abspath(__file__))
 compilersDir = os.path.join(current_directory, 'compilers')
 collectDir = os.path.join(current_directory, 'cov')
@@ -10,6 +24,16 @@ testDir = os.path.join(current_directory, 'benchmark', 'gccbugs')
 gccbugsFile = os.path.join(current_directory, 'benchmark', 'gccbugs_summary.txt')
 resultdict = {}
 rankFile = os.path.join(current_directory, 'ranks.txt')
+cacheDir = os.path.join(current_directory, 'cache', 'outcomes')
+# probe outputs and coverage counters go below a RAM-backed scratch base when /dev/shm
+# has shmMinFree bytes free, below ./scratch otherwise, or below ODFL_SCRATCH
+shmMinFree = 4 * 1024 * 1024 * 1024
+scratchBase = scratch_base('gcc', os.path.join(current_directory, 'scratch'), shmMinFree)
+# the private directory of this run below scratchBase, made at startup
+scratchDir = None
+# copy the executables of every revision into scratchDir at startup (paths below build/)
+stageCompilers = False
+stagePaths = ['bin', 'libexec']
 
 # avoid warning
 skipped_fineOpt_lst = ['-fno-rtti', '-fno-handle-exceptions', '-fthreadsafe-statics']
@@ -17,8 +41,63 @@ skipped_fineOpt_lst = ['-fno-rtti', '-fno-handle-exceptions', '-fthreadsafe-stat
 crash_bugId_lst = ['58343', '56478', '58068', '58451', '58539']
 
 timeout = 15
+# bugs in flight at once; all of them share the workers of one scheduler
 processes = 10
 parallel = True
+# compiles, coverage collections and gcov batches running at once, over all bugs
+workers = multiprocessing.cpu_count()
+scheduler = Scheduler(workers if parallel else 1)
+# admission control for every compiler, gcov and a.out process: at most cpuSlots at
+# once, and back off while the machine has more runnable tasks than CPUs (+1 for
+# this process) or less than memPerJob available memory
+cpuSlots = multiprocessing.cpu_count()
+memPerJob = 1024 * 1024 * 1024
+admission = Admission(cpuSlots, cpuSlots + 1, memPerJob)
+# resource limits of every spawned process; crashing compilers and a.out dump no core
+procLimits = [(resource.RLIMIT_CORE, (0, 0))]
+# .gcda files handed to one gcov process, and the seconds it may take before it is killed
+gcovBatchSize = 64
+gcovTimeout = 1800
+# how coverage is read: 'native' parses the .gcno/.gcda files in process, 'gcov' runs
+# gcov and parses its text output, 'auto' uses native and falls back to gcov for
+# formats gcov_reader does not know
+covBackend = 'auto'
+# how bug-triggering options are found: 'exhaustive' flips every option on its own,
+# 'group' flips batches of groupSize options and only splits batches that pass
+triggerSearch = 'exhaustive'
+groupSize = 16
+# bug-free option minimization: 'greedy' (linear), 'ddmin' or 'bisect' (binary partition)
+minimizeStrategy = 'ddmin'
+# also run the other strategies and record how many compilations each one needs
+compareMinimizers = False
+# outcome cache shared with validate_min_configs.py
+useOutcomeCache = True
+cacheMaxBytes = 256 * 1024 * 1024
+outcomeCache = OutcomeCache(cacheDir, cacheMaxBytes) if useOutcomeCache else None
+# SBFL formulas ranked by getRank, each one written to cov/<bugId>/<formula>_*.txt
+sbflFormulas = ['Ochiai', 'Tarantula', 'DStar', 'Dice', 'Barinel', 'Op2']
+# coverage is kept in cov/<bugId>/spectra.bin; also write the readable
+# cov/<bugId>/<test>/stmt_info.txt files (python spectra.py exports them later)
+exportStmtInfo = False
+# statement-level ranking files: 'full' (all statements, scoring order and sorted),
+# 'topk' (the best stmtTopK statements and their ties) or 'jsonl' (one line per score)
+stmtOutput = 'full'
+stmtTopK = 1000
+# keep the coverage counters of the probes whose configuration can become a final
+# pass/fail configuration, so that getRank reads their spectra instead of compiling
+# them again; at most keepGcdaBytes of counters are kept at once, over all bugs
+captureCoverage = True
+keepGcdaBytes = 1024 * 1024 * 1024
+# spans and counters of every bug, written to cov/trace.json (chrome://tracing) and
+# cov/trace_summary.txt at the end of a run
+traceRun = True
+tracer = Tracer(traceRun)
+# record every finished phase of a bug in cov/<bugId>/journal.json, so that a
+# restarted run skips the phases whose inputs did not change
+useJournal = True
+# probes, kept counters, coverage and ranking, shared with llvm-run.py (common/pipeline.py)
+pipeline = Pipeline('gcc', 'gcc', globals())
+
 
 def getBugInfo(gccbug):
     items = gccbug.strip().split(',')
@@ -26,35 +105,15 @@ def getBugInfo(gccbug):
     return bugId, rev, passOptLevel, failOptLevel, buggyFiles
 # 56478,r196310,-O1+-c,-O2+-c,gcc/predict.c 变成 56478,r196310,-O1 -c，-O2 -c，gcc/predict.c
 
-def getConfResult(bugId, rev, conf, timeout=timeout):
-    cwd = os.path.join(testDir, bugId)
-    gccPath = os.path.join(compilersDir, rev, 'build/bin/gcc')
-
-    cplcmd = gccPath + ' -w ' + conf + ' fail.c'
-    cplcmd = 'timeout --signal=SIGKILL ' + str(timeout) + ' ' + cplcmd
-    try:
-       
-        cplout = subprocess.run(cplcmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout+1)
-        if bugId in crash_bugId_lst:
-            return str(cplout.returncode)
-        else:
-            if cplout.returncode != 0:
-                return str(cplout.returncode) + ':' + cplout.stdout.decode().strip() + ':' + cplout.stderr.decode().strip()
-
-            execmd = 'timeout --signal=SIGKILL ' + str(timeout) + ' ./a.out'
-            try:
-                exeout = subprocess.run(execmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout+1)
-                return str(exeout.returncode) + ':' + exeout.stdout.decode().strip() + ':' + exeout.stderr.decode().strip()
-            except subprocess.TimeoutExpired:
-                return 'EXETimeoutExpired'
-    except subprocess.TimeoutExpired:
-        return 'CPLTimeoutExpired'
-    
-
 def get_fineOpt_dict(rev, bugId, conf):
-    gccPath = os.path.join(compilersDir, rev, 'build/bin/gcc')
-    cwd = os.path.join(testDir, bugId)
-    out = subprocess.run(gccPath + ' -Q --help=optimizers ' + conf, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    gccPath = pipeline.binPath(rev, 'gcc')
+    cwd = pipeline.makeScratch(bugId)
+    try:
+        env = gcov_env(os.path.join(compilersDir, rev, 'build'), os.path.join(cwd, 'gcda'))
+        with tracer.span('query'):
+            out = pipeline.spawn('query', [gccPath, '-Q', '--help=optimizers'] + conf.split(), cwd, env)
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
     fineOpt_dict = {}
     for line in out.stdout.decode().splitlines():
         line = line.strip()
@@ -66,12 +125,9 @@ def get_fineOpt_dict(rev, bugId, conf):
 
 
 def collect_option(rev, bugId, failOptLevel, passOptLevel):
-    fail_fineOpt_dict = get_fineOpt_dict(rev, bugId, failOptLevel)
-    passResult = getConfResult(bugId, rev, passOptLevel)
+    fail_fineOpt_dict = pipeline.checkpoint(bugId, rev, 'fineopts', [failOptLevel], lambda: get_fineOpt_dict(rev, bugId, failOptLevel))
 
-    bugtrigger_fineOpt = set()
-    all_fineOpt = set()
-    
+    flipped_lst = []
     for fineOpt, optStatus in sorted(fail_fineOpt_dict.items()):
         if optStatus != '[enabled]':
             continue
@@ -81,103 +137,227 @@ def collect_option(rev, bugId, failOptLevel, passOptLevel):
             flipped_fineOpt = fineOpt.replace('-f', '-fno-', 1)
         if flipped_fineOpt in skipped_fineOpt_lst:
             continue
-        tmpConf = failOptLevel + ' ' + flipped_fineOpt
-        tmpResult = getConfResult(bugId, rev, tmpConf)
-        if tmpResult == passResult:  # fail -> pass
-            bugtrigger_fineOpt.add(flipped_fineOpt)
-        all_fineOpt.add(flipped_fineOpt)
-        
-    baseConf = failOptLevel + ' ' + ' '.join(sorted(all_fineOpt - bugtrigger_fineOpt))
-    if getConfResult(bugId, rev, baseConf) == passResult:  # pass
-        bugfree_fineOpt = set()
-        for fineOpt in sorted(all_fineOpt-bugtrigger_fineOpt):
-            tmpConf = failOptLevel + ' ' + ' '.join(sorted(bugfree_fineOpt)) + ' ' + fineOpt
-            if getConfResult(bugId, rev, tmpConf) != passResult:  # fail
-                bugfree_fineOpt.add(fineOpt)
-        baseConf = failOptLevel + ' ' + ' '.join(sorted(bugfree_fineOpt))
-
-    passConfs = []
-    failConfs = []
-
-    failConfs.append(baseConf) 
-    for f in sorted(bugtrigger_fineOpt):
-        tmpConf = baseConf + ' ' + f
-        if getConfResult(bugId, rev, tmpConf) == passResult:  # pass
-            passConfs.append(tmpConf)
+        flipped_lst.append(flipped_fineOpt)
+
+    def searchTriggers():
+        # passOptLevel is the pass configuration when no trigger turns the failure into a pass
+        passResult = pipeline.getConfResult(bugId, rev, passOptLevel, keep=True)
+        outcomes = {}
+        if triggerSearch == 'group':
+            failResult = pipeline.getConfResult(bugId, rev, failOptLevel)
+            with tracer.span('group', options=len(flipped_lst)):
+                bugtrigger_fineOpt = group_bugtrigger(rev, bugId, failOptLevel, passResult, failResult, flipped_lst)
         else:
-            failConfs.append(tmpConf)
-
-    if len(passConfs) == 0:
-        passConfs.append(passOptLevel)
-
-    return passConfs, failConfs
-
-
-def collectCov(bugId, rev, option, testname, collectDir):
-    gccPath = os.path.join(compilersDir, rev, 'build/bin/gcc')
-    gcovPath = os.path.join(compilersDir, rev, 'build/bin/gcov')
-    covDir = os.path.join(compilersDir, rev, 'build')
-    gccbuildPath = os.path.join(compilersDir, rev, 'build/gcc')
-
-    cwd = os.path.join(testDir, bugId)
-
-    subprocess.run('find ' + covDir + ' -name "*.gcda" | xargs rm -f', shell=True, cwd=cwd)  # delete all .gcda files
-    subprocess.run(gccPath + ' -w ' + option + ' fail.c > /dev/null 2>&1', shell=True, cwd=cwd)  # compile test program
-
-    file_gcdalist = os.path.join(cwd, 'gcdalist')
-    if os.path.exists(file_gcdalist):
-        subprocess.run('rm ' + file_gcdalist, shell=True, cwd=cwd)
-
-    subprocess.run('find ' + covDir + ' -name "*.gcda" > ' + file_gcdalist, shell=True, cwd=cwd)
-
-    tempdir = os.path.join(collectDir, bugId, testname)
-    if os.path.exists(tempdir):
-        subprocess.run('rm -rf ' + tempdir, shell=True, cwd=cwd)
-
-    subprocess.run('mkdir -p ' + tempdir, shell=True, cwd=cwd)
-
-    with open(file_gcdalist, 'r') as f:
-        gcdafilelines = f.readlines()
+            bugtrigger_fineOpt = set()
+            tmpResults = pipeline.mapProbes(bugId, rev, [failOptLevel + ' ' + f for f in flipped_lst])
+            for flipped_fineOpt, tmpResult in zip(flipped_lst, tmpResults):
+                if tmpResult == passResult:  # fail -> pass
+                    bugtrigger_fineOpt.add(flipped_fineOpt)
+                outcomes[flipped_fineOpt] = tmpResult
+        return {'passResult': passResult, 'triggers': sorted(bugtrigger_fineOpt), 'outcomes': outcomes}
+
+    # the single-flip outcomes (exhaustive search) and the bug-triggering options
+    flips = pipeline.checkpoint(bugId, rev, 'flips', [failOptLevel, passOptLevel, flipped_lst, triggerSearch, groupSize], searchTriggers)
+    passResult = flips['passResult']
+    bugtrigger_fineOpt = set(flips['triggers'])
+    all_fineOpt = set(flipped_lst)
+
+    def minimizeConfs():
+        baseConf = failOptLevel + ' ' + ' '.join(sorted(all_fineOpt - bugtrigger_fineOpt))
+        if pipeline.getConfResult(bugId, rev, baseConf, keep=True) == passResult:  # pass
+            with tracer.span('minimize'):
+                bugfree_fineOpt = minimize_bugfree(rev, bugId, failOptLevel, passResult, sorted(all_fineOpt - bugtrigger_fineOpt))
+            baseConf = failOptLevel + ' ' + ' '.join(sorted(bugfree_fineOpt))
+
+        passConfs = []
+        failConfs = []
+
+        failConfs.append(baseConf)
+        tmpConfs = [baseConf + ' ' + f for f in sorted(bugtrigger_fineOpt)]
+        for tmpConf, tmpResult in zip(tmpConfs, pipeline.mapProbes(bugId, rev, tmpConfs, keep=True)):
+            if tmpResult == passResult:  # pass
+                passConfs.append(tmpConf)
+            else:
+                failConfs.append(tmpConf)
 
-        subprocess.run('find ' + covDir + ' -name "*.c.gcov" | xargs rm -f', shell=True, cwd=cwd)
-        for gcdafile in sorted(gcdafilelines):
-            gcdafile = gcdafile.strip()
-            if '/gcc/testsuite/' in gcdafile:
-                continue
+        if len(passConfs) == 0:
+            passConfs.append(passOptLevel)
+        return {'passConfs': passConfs, 'failConfs': failConfs}
 
-            subprocess.run(gcovPath + ' ' + gcdafile + ' > /dev/null 2>&1', shell=True, cwd=gccbuildPath)
+    # the minimized pass and fail configurations
+    confs = pipeline.checkpoint(bugId, rev, 'configs', [flips, minimizeStrategy], minimizeConfs)
+    final = set(confs['passConfs'] + confs['failConfs'])
+    pipeline.pruneGcda(bugId, lambda conf: conf in final)
+    return confs['passConfs'], confs['failConfs']
 
-    file_gcovlist = os.path.join(cwd, 'gcovlist')
-    if os.path.exists(file_gcovlist):
-        subprocess.run('rm ' + file_gcovlist, shell=True, cwd=cwd)
 
-    subprocess.run('find ' + covDir + ' -name "*.c.gcov" > ' + file_gcovlist, shell=True, cwd=cwd)
+def group_bugtrigger(rev, bugId, failOptLevel, passResult, failResult, flipped_lst):
+    # adaptive group testing: a batch whose flip keeps the original failure holds no
+    # trigger, a batch that turns the failure into a pass is split in halves. Other
+    # outcomes, and passing batches whose halves both keep failing (the options only
+    # hide the bug together), are resolved by flipping their options one at a time
+    bugtrigger_fineOpt = set()
+    singles = []
+    pending = [(flipped_lst[i:i + groupSize], None) for i in range(0, len(flipped_lst), groupSize)]
+    probes = 0
+    while pending:
+        tmpResults = pipeline.mapProbes(bugId, rev, [failOptLevel + ' ' + ' '.join(group) for group, _ in pending])
+        probes += len(pending)
+        children = {}
+        nextPending = []
+        for (group, parent), tmpResult in zip(pending, tmpResults):
+            if parent is not None:
+                children.setdefault(id(parent), (parent, []))[1].append((group, tmpResult))
+            if tmpResult == passResult:
+                if len(group) == 1:
+                    bugtrigger_fineOpt.add(group[0])
+                else:
+                    half = len(group) // 2
+                    nextPending += [(group[:half], group), (group[half:], group)]
+            elif tmpResult != failResult and len(group) > 1:
+                singles.extend(group)
+        for parent, results in children.values():
+            if all(tmpResult == failResult for _, tmpResult in results):
+                singles.extend(f for group, _ in results if len(group) > 1 for f in group)
+        pending = nextPending
+
+    tmpResults = pipeline.mapProbes(bugId, rev, [failOptLevel + ' ' + f for f in singles])
+    probes += len(singles)
+    for flipped_fineOpt, tmpResult in zip(singles, tmpResults):
+        if tmpResult == passResult:  # fail -> pass
+            bugtrigger_fineOpt.add(flipped_fineOpt)
 
-    covline_set = set()
-    with open(file_gcovlist, 'r') as f:
-        gcovfilelines = f.readlines()
-        for gcovfile in sorted(gcovfilelines):
-            gcovfile = gcovfile.strip()
-            tmpfilename = os.path.relpath(gcovfile, covDir).replace('.c.gcov', '.c')
-            with open(gcovfile, 'r', encoding='utf-8') as f:
-                stmtlines = f.readlines()
-                tmp = []
-                for stmtline in stmtlines:
-                    stmtline = stmtline.strip()
-                    if ':' in stmtline:
-                        lineCov = stmtline.split(':')[0].strip()
-                        lineNum = stmtline.split(':')[1].strip()
-                        if lineCov != '-' and lineCov != '#####' and lineCov != '=====':
-                            tmp.append(lineNum)
-                if len(tmp) == 0: continue                
-                covline = tmpfilename + '$' + ','.join(tmp)
-                covline_set.add(covline)
+    out_dir = os.path.join(collectDir, bugId)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'trigger_stats.txt'), 'w') as f:
+        f.write('mode\tprobes\toptions\ttriggers\n')
+        f.write('group\t%d\t%d\t%d\n' % (probes, len(flipped_lst), len(bugtrigger_fineOpt)))
+    print('\033[1;35m %s: group testing used %d probes for %d options (%d triggers)\033[0m' % (bugId, probes, len(flipped_lst), len(bugtrigger_fineOpt)))
+    return bugtrigger_fineOpt
+
+
+def minimize_bugfree(rev, bugId, failOptLevel, passResult, candidates):
+    # find a 1-minimal set of options that must stay enabled for the failure,
+    # every other candidate goes into bugfree_fineOpt
+    probed = set()
+    failing = []  # the failing configurations of the last round that had one
+
+    def stillFailing(keptSets, keep=False):
+        confs = [failOptLevel + ' ' + ' '.join(sorted(set(candidates) - set(kept))) for kept in keptSets]
+        results = [tmpResult != passResult for tmpResult in pipeline.mapProbes(bugId, rev, confs, keep=keep)]
+        if keep:
+            # the minimized configuration becomes the base of the final ones, and it is one of
+            # the failing configurations of the last round that had any: keep only those
+            probed.update(confs)
+            if any(results):
+                failing[:] = [conf for conf, result in zip(confs, results) if result]
+            pipeline.pruneGcda(bugId, lambda conf: conf not in probed or conf in failing)
+        return results
+
+    stats = []
+    for strategy in [minimizeStrategy] + ([s for s in strategies if s != minimizeStrategy] if compareMinimizers else []):
+        test = (lambda keptSets: stillFailing(keptSets, keep=True)) if strategy == minimizeStrategy else stillFailing
+        compiles = pipeline.compiles.get(bugId, 0)
+        kept, calls = minimize(candidates, test, strategy, workers)
+        # the configurations tested, and how many of them the compiler ran (not in the outcome cache)
+        stats.append((strategy, calls, pipeline.compiles.get(bugId, 0) - compiles, len(kept)))
+        if strategy == minimizeStrategy:
+            bugfree_fineOpt = set(candidates) - set(kept)
 
-    file_stmtinfo = os.path.join(tempdir, 'stmt_info.txt')
-    with open(file_stmtinfo, 'w') as stmtfile:
-        stmtfile.write('\n'.join(sorted(covline_set)))
-    
-    return covline_set
+    out_dir = os.path.join(collectDir, bugId)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'minimize_stats.txt'), 'w') as f:
+        f.write('strategy\tconfigurations\tcompilations\tcandidates\tkept\n')
+        for strategy, calls, compiled, nkept in stats:
+            f.write('%s\t%d\t%d\t%d\t%d\n' % (strategy, calls, compiled, len(candidates), nkept))
+            print('\033[1;35m %s: %s tested %d configurations, %d compiled (%d -> %d options kept)\033[0m' % (
+                bugId, strategy, calls, compiled, len(candidates), nkept))
+    return bugfree_fineOpt
+
+
+def gcovShadow(rev, cwd, count):
+    # gcov resolves the relative source names in the notes files (../../trunk/gcc/x.c)
+    # against its working directory and writes the .gcov files there. Mirror
+    # build/gcc once per gcov batch inside the scratch directory, so that sources
+    # still resolve while the output of every batch stays private
+    revPath = os.path.join(compilersDir, rev)
+    gccbuildPath = os.path.join(revPath, 'build', 'gcc')
+    shadow = os.path.join(cwd, 'rev')
+    os.makedirs(shadow)
+    for name in os.listdir(revPath):
+        if name != 'build':
+            os.symlink(os.path.join(revPath, name), os.path.join(shadow, name))
+    generated = [name for name in os.listdir(gccbuildPath) if name.endswith('.c')]  # e.g. insn-recog.c
+    gcovDirs = []
+    for k in range(count):
+        gcovDir = os.path.join(shadow, 'build%d' % k, 'gcc')
+        os.makedirs(gcovDir)
+        for name in generated:
+            os.symlink(os.path.join(gccbuildPath, name), os.path.join(gcovDir, name))
+        gcovDirs.append(gcovDir)
+    return gcovDirs
+
+
+def nativeCov(gcdafiles):
+    def readBatch(batch):
+        covlines = {}
+        with tracer.span('read', files=len(batch)):
+            for gcnofile, gcdafile, _ in batch:
+                for source, lines in executed_lines(gcnofile, gcdafile).items():
+                    # same naming as the gcov backend, which keeps the <basename>.c.gcov files
+                    name = os.path.basename(source)
+                    if name.endswith('.c'):
+                        covlines.setdefault('gcc/' + name, set()).update(lines)
+        return covlines
+
+    batches = [gcdafiles[i:i + gcovBatchSize] for i in range(0, len(gcdafiles), gcovBatchSize)]
+    merged = {}
+    for covlines in pipeline.mapParallel(readBatch, batches, pool='gcov'):
+        for tmpfilename, lines in covlines.items():
+            merged.setdefault(tmpfilename, set()).update(lines)
+    return merged
+
+
+def gcovCov(rev, cwd, gcdafiles):
+    gcovPath = pipeline.binPath(rev, 'gcov')
+    for gcnofile, gcdafile, _ in gcdafiles:
+        # gcov expects the notes file next to the counters
+        os.symlink(gcnofile, gcdafile[:-len('.gcda')] + '.gcno')
+    batches = pipeline.gcovBatches([gcdafile for _, gcdafile, _ in gcdafiles])
+
+    if gcov_format(gcovPath) != 'text':
+        # the JSON format lists line counts without reading the sources, so no shadow tree is needed
+        def runGcovJson(batch):
+            covlines = {}
+            with tracer.span('gcov', files=len(batch)):
+                for _, source, lines in gcov_json_lines(gcovPath, batch, cwd, pipeline.gcovStream):
+                    name = os.path.basename(source)
+                    if name.endswith('.c'):
+                        covlines.setdefault('gcc/' + name, set()).update(lines)
+            return covlines
+
+        merged = {}
+        for covlines in pipeline.mapParallel(runGcovJson, batches, pool='gcov'):
+            for tmpfilename, lines in covlines.items():
+                merged.setdefault(tmpfilename, set()).update(lines)
+        return merged
+
+    gcovDirs = gcovShadow(rev, cwd, len(batches))
+
+    def runGcov(k):
+        covlines = {}
+        with tracer.span('gcov', files=len(batches[k])):
+            pipeline.gcov([gcovPath] + batches[k], gcovDirs[k])
+            for gcovname in os.listdir(gcovDirs[k]):
+                if gcovname.endswith('.c.gcov'):
+                    covlines['gcc/' + gcovname.replace('.c.gcov', '.c')] = gcov_text_lines(os.path.join(gcovDirs[k], gcovname))
+        return covlines
+
+    merged = {}
+    for covlines in pipeline.mapParallel(runGcov, list(range(len(batches))), pool='gcov'):
+        for tmpfilename, lines in covlines.items():
+            merged.setdefault(tmpfilename, set()).update(lines)
+    return merged
 
 
 def topk(resultlist, k):
@@ -201,144 +381,20 @@ def calculate_metrics(resultlist):
     return result
 
 
-def getStmtInfo(covFile):
-    stmtInfoSet = set()
-    with open(covFile, 'r') as f:
-        for line in f:
-            filename, stmts = line.strip().split('$')
-            for stmt in stmts.split(','):
-                stmtInfoSet.add(filename + ',' + stmt)
-    return stmtInfoSet
-
-
 def rank(failStmtInfoDir, passStmtInfoDir, formula = 'Ochiai'):
-    failstmt = {}  # the stmt cov information of failing test program
-    passstmt = {}
-    nfstmt = {}
-    npstmt = {}
-
-    failstmtset = set()  # all failstmt
-    passstmtset = set()  # all passstmt
-
-    # efs
-    # the statements that the falling test program executed
-    for failStmtInfo in failStmtInfoDir:
-        tmpfailstmtset = getStmtInfo(failStmtInfo)
-        failstmtset.update(tmpfailstmtset)
-        for stmt in tmpfailstmtset:
-            failstmt[stmt] = failstmt.get(stmt, 0) + 1
-
-    # init nfstmt and passstmt
-    for stmt in failstmtset:
-        nfstmt[stmt] = 0
-        passstmt[stmt] = 0
-        npstmt[stmt] = 0
-
-    # nfs
-    for failStmtInfo in failStmtInfoDir:
-        nfset = failstmtset - getStmtInfo(failStmtInfo)
-        for nf in nfset:
-            nfstmt[nf] += 1
-
-    # eps and nps
-    for passStmtInfo in passStmtInfoDir:
-        tmppassstmtset = getStmtInfo(passStmtInfo)
-        passstmtset.update(failstmtset - tmppassstmtset)
-        for stmt in tmppassstmtset:
-            if stmt in failstmtset:
-                passstmt[stmt] += 1
-        npset = failstmtset - tmppassstmtset
-        for np in npset:
-            npstmt[np] += 1
-
-    # compute statement score based on SBFL
-    score = {}  # the buggy value of each statement and its line number in each file
-    filescore = {}  # the buggy value of each file, and we can get the corresponding statement values
-    for key in failstmt:
-        if formula == 'Ochiai':
-            score[key] = failstmt[key] / math.sqrt((failstmt[key] + nfstmt[key]) * (failstmt[key] + passstmt[key]))
-
-        elif formula == 'Tarantula': 
-            score[key] = (failstmt[key]/(failstmt[key]+nfstmt[key])) / ((failstmt[key]/(failstmt[key] + nfstmt[key])) + (passstmt[key]/(npstmt[key] + passstmt[key])))
-        
-        elif formula == 'DStar':
-            if passstmt[key] + nfstmt[key] != 0:
-                score[key] = failstmt[key] * failstmt[key] / (passstmt[key] + nfstmt[key])
-            else:
-                score[key] = 1
-
-        elif formula == 'Dice':
-            score[key] = 2 * failstmt[key] / (failstmt[key] + nfstmt[key] + passstmt[key])
-
-        elif formula == 'Barinel':
-            score[key] = 1 - passstmt[key] / (passstmt[key] + failstmt[key])
-
-        elif formula == 'Op2':
-            score[key] = failstmt[key] - passstmt[key] / (1 + npstmt[key] + passstmt[key])
-
-        filename = key.rsplit(',', 1)[0]
-        filescore.setdefault(filename, []).append(score[key])
-
-    # compute the buggy values of each file based on average aggregation
-    scoredict = {key: sum(values) / len(values) for key, values in filescore.items()}
-
+    # rank exported stmt_info.txt files
+    files = FileTable()
+    failSpectra = (read_spectrum(failStmtInfo, files) for failStmtInfo in failStmtInfoDir)
+    passSpectra = (read_spectrum(passStmtInfo, files) for passStmtInfo in passStmtInfoDir)
+    scoredict, score = pipeline.rankAll(files, failSpectra, passSpectra, [formula])[formula]
     return scoredict, score
 
 
-def getRank(bugId, rev, passConfs, failConfs, collectDir):
-    # collect cov
-    cwd = os.path.join(testDir, bugId)
-    tempdir = os.path.join(collectDir, bugId)
-    # if os.path.exists(tempdir):
-    #     subprocess.run('rm -rf ' + tempdir, shell=True, cwd=cwd)
-    subprocess.run('mkdir ' + tempdir, shell=True, cwd=cwd)
-
-    passStmtInfoDir = []
-    passcnt = 0
-    for passConf in passConfs:
-        passcnt += 1
-        testname = 'pass'+str(passcnt)
-        collectCov(bugId, rev, passConf, testname, collectDir)
-        passStmtInfoDir.append(os.path.join(collectDir, bugId, testname, 'stmt_info.txt'))
-    
-    failStmtInfoDir = []
-    failcnt = 0
-    for failConf in failConfs:
-        failcnt += 1
-        testname = 'fail'+str(failcnt)
-        collectCov(bugId, rev, failConf, testname, collectDir)
-        failStmtInfoDir.append(os.path.join(collectDir, bugId, testname, 'stmt_info.txt'))
-
-    # rank file by score
-    scoredict, stmt_score = rank(failStmtInfoDir, passStmtInfoDir, formula = 'Ochiai')
-
-    # write file-level score dict (unsorted)
-    with open(os.path.join(collectDir, bugId, 'Ochiai_scoredict.txt'), 'w', encoding='utf-8') as f:
-        f.write(str(scoredict))
-
-    # write file-level sorted list
-    with open(os.path.join(collectDir, bugId, 'Ochiai_scoredict_sorted.txt'), 'w', encoding='utf-8') as f:
-        for k, v in sorted(scoredict.items(), key=lambda x: x[1], reverse=True):
-            f.write(str(k)+"\t"+str(v)+"\n")
-
-    # write statement-level raw scores
-    with open(os.path.join(collectDir, bugId, 'Ochiai_stmt_scores.txt'), 'w', encoding='utf-8') as f:
-        for k, v in stmt_score.items():
-            f.write(str(k)+"\t"+str(v)+"\n")
-
-    # write statement-level sorted scores
-    with open(os.path.join(collectDir, bugId, 'Ochiai_stmt_sorted.txt'), 'w', encoding='utf-8') as f:
-        for k, v in sorted(stmt_score.items(), key=lambda x: x[1], reverse=True):
-            f.write(str(k)+"\t"+str(v)+"\n")
-
-    return scoredict
-
-
-def task(gccbug):
+def runTask(gccbug):
     bugId, rev, passOptLevel, failOptLevel, buggyFiles = getBugInfo(gccbug)
-
     # generate configurations
-    passConfs, failConfs = collect_option(rev, bugId, failOptLevel, passOptLevel)
+    with tracer.span('options'):
+        passConfs, failConfs = collect_option(rev, bugId, failOptLevel, passOptLevel)
     
     # 添加调试信息 (Python 3.5兼容)
     print("Debug - Bug {0}:".format(bugId))
@@ -373,37 +429,22 @@ def task(gccbug):
         print("  Error writing config file: {0}".format(e))
     
     # SBFL rank
-    scoredict = getRank(bugId, rev, passConfs, failConfs, collectDir)
+    scoredict = pipeline.getRank(bugId, rev, passConfs, failConfs, collectDir)
+    pipeline.dropGcda(bugId)
+
+
+def task(gccbug):
+    # everything traced while the bug runs is attributed to it
+    with tracer.span('task', bug=getBugInfo(gccbug)[0]):
+        runTask(gccbug)
         
 
 if __name__ == '__main__':
-    if not os.path.exists(collectDir):
-        subprocess.run('mkdir -p ' + collectDir, shell=True)
+    os.makedirs(collectDir, exist_ok=True)
 
     with open(gccbugsFile, 'r') as f:
         gccbugs = [item.strip() for item in f.readlines()]
     
-    if not parallel:
-        for gccbug in gccbugs:
-            _, rev, _, _, _ = getBugInfo(gccbug)
-            if os.path.exists(os.path.join(compilersDir, rev, 'build')):
-                task(gccbug)
-    else:
-        bugs = []
-        for item in gccbugs:
-            bugId, rev, _, _, _ = getBugInfo(item)
-            if not os.path.exists(os.path.join(compilersDir, rev, 'build')):
-                continue
-            if bugId == '61518':  # same gcc version as 61517
-                continue
-            bugs.append(item)
-        pool = multiprocessing.Pool(processes)
-        result = pool.map_async(task, bugs)
-        result.wait()
-
-        for gccbug in gccbugs:
-            bugId, _, _, _, _ = getBugInfo(gccbug)
-            if bugId == '61518':
-                task(gccbug)
-    
-    
+    scratchDir = make_run_dir(scratchBase)
+    pipeline.runBugs(gccbugs, lambda gccbug: getBugInfo(gccbug)[1], task)
+    pipeline.report()
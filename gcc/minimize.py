@@ -0,0 +1,115 @@
+"""Minimization engine for the bug-free option loop of collect_option.
+
+All strategies work on the ordered list of candidate options and look for a
+1-minimal subset that has to stay unflipped for the failure to reproduce.
+``test_many`` receives a list of such subsets and returns, for each of them,
+whether the failure still reproduces when only that subset is left unflipped.
+The caller guarantees that the full list fails and the empty subset passes.
+
+Subsets handed to ``test_many`` in one call are independent, so the caller can
+evaluate them concurrently; ``width`` bounds how many are speculated at once,
+and no step speculates more than one subset per two candidates it still has to
+decide: the first answers of a wider round mostly make the rest of it moot.
+"""
+
+
+class Minimizer(object):
+
+    def __init__(self, test_many, width=1):
+        self.test_many = test_many
+        self.width = max(1, width)
+        self.calls = 0
+
+    def test(self, subsets):
+        self.calls += len(subsets)
+        return self.test_many(subsets)
+
+    def span(self, remaining):
+        # how many subsets to test at once while remaining candidates are undecided
+        return max(1, min(self.width, (remaining + 1) // 2))
+
+    def first_failing(self, subsets, remaining):
+        # evaluate in chunks of span(remaining), stop at the first chunk with a failure
+        width = self.span(remaining)
+        for start in range(0, len(subsets), width):
+            chunk = subsets[start:start + width]
+            for subset, failing in zip(chunk, self.test(chunk)):
+                if failing:
+                    return subset
+        return None
+
+    def greedy(self, items):
+        # the linear loop collect_option has always used: try dropping each
+        # option once, in order, and keep the drop if the failure survives
+        kept = list(items)
+        i = 0
+        while i < len(kept):
+            batch = kept[i:i + self.span(len(kept) - i)]
+            # later trials speculate that every earlier drop in the batch is rejected
+            trials = [kept[:i + j] + kept[i + j + 1:] for j in range(len(batch))]
+            for j, failing in enumerate(self.test(trials)):
+                if failing:
+                    kept = trials[j]
+                    i += j
+                    break
+            else:
+                i += len(batch)
+        return kept
+
+    def ddmin(self, items):
+        kept = list(items)
+        n = 2
+        while len(kept) >= 2:
+            size = len(kept)
+            chunks = [kept[size * k // n:size * (k + 1) // n] for k in range(n)]
+            subset = self.first_failing(chunks, size)
+            if subset is not None:
+                kept, n = subset, 2
+                continue
+            if n > 2:
+                complements = [[x for x in kept if x not in chunk] for chunk in chunks]
+                subset = self.first_failing(complements, size)
+                if subset is not None:
+                    kept, n = subset, max(n - 1, 2)
+                    continue
+            if n >= size:
+                break
+            n = min(2 * n, size)
+        return kept
+
+    def bisect(self, items):
+        # binary partition: repeatedly search for the shortest prefix of the
+        # remaining options that, together with what was already found,
+        # reproduces the failure; its last option is necessary
+        found = []
+        rest = list(items)
+        while rest:
+            if found and self.test([found])[0]:
+                break
+            lo, hi = 0, len(rest)  # found + rest[:lo] passes, found + rest[:hi] fails
+            while hi - lo > 1:
+                width = self.span(hi - lo)
+                step = (hi - lo) / (width + 1)
+                points = sorted(set(lo + max(1, int(step * (k + 1))) for k in range(width)))
+                points = [p for p in points if p < hi]
+                results = self.test([found + rest[:p] for p in points])
+                for p, failing in zip(points, results):
+                    if failing:
+                        hi = p
+                        break
+                    lo = p
+            found.append(rest[hi - 1])
+            rest = rest[:hi - 1]
+        return [x for x in items if x in found]
+
+
+strategies = ('greedy', 'ddmin', 'bisect')
+
+
+def minimize(items, test_many, strategy='ddmin', width=1):
+    """Return (kept options, number of configurations tested)."""
+    if strategy not in strategies:
+        raise ValueError('unknown minimization strategy: {}'.format(strategy))
+    minimizer = Minimizer(test_many, width)
+    kept = getattr(minimizer, strategy)(items)
+    return kept, minimizer.calls
@@ -1,19 +1,43 @@
 import os
+import sys
 import argparse
 import random
-import subprocess
+import resource
+import shutil
+import tempfile
 
+# helper modules shared by the gcc and llvm scripts
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import execute
+from conf_cache import OutcomeCache, source_hash, file_hash
+from scratch import scratch_base, make_run_dir
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
 compilersDir = os.path.join(current_directory, 'compilers')
 collectDir = os.path.join(current_directory, 'cov')
 testDir = os.path.join(current_directory, 'benchmark', 'gccbugs')
 gccbugsFile = os.path.join(current_directory, 'benchmark', 'gccbugs_summary.txt')
+cacheDir = os.path.join(current_directory, 'cache', 'outcomes')
+# Same scratch base as gcc-run.py, the benchmark directory stays untouched
+shmMinFree = 4 * 1024 * 1024 * 1024
+scratchBase = scratch_base('gcc', os.path.join(current_directory, 'scratch'), shmMinFree)
+# private directory of this run below scratchBase
+scratchDir = None
 
 
 # Keep consistent with gcc-run.py default behavior
 CRASH_BUG_IDS = ['58343', '56478', '58068', '58451', '58539']
 
+# No core dumps from crashing compilers or a.out
+PROC_LIMITS = [(resource.RLIMIT_CORE, (0, 0))]
+
+# Shared with gcc-run.py, entries are keyed the same way there
+outcome_cache = None
+
+# Outcomes of a.out by hash of the binary, identical binaries are run once
+exe_outcomes = {}
+
 
 def read_bug_info(bug_id):
     with open(gccbugsFile, 'r', encoding='utf-8') as f:
@@ -32,40 +56,72 @@ def read_bug_info(bug_id):
 
 
 def get_conf_result(bug_id, rev, conf, timeout_seconds):
-    cwd = os.path.join(testDir, bug_id)
-    gcc_path = os.path.join(compilersDir, rev, 'build/bin/gcc')
+    if outcome_cache is None:
+        return run_conf(bug_id, rev, conf, timeout_seconds)
+    mode = 'crash-S' if bug_id in CRASH_BUG_IDS else 'run'
+    key = outcome_cache.key('gcc', rev, conf, source_hash(os.path.join(testDir, bug_id, 'fail.c')), mode)
+    result = outcome_cache.get(key)
+    if result is None:
+        result = run_conf(bug_id, rev, conf, timeout_seconds)
+        outcome_cache.put(key, result)
+    return result
+
+
+def exit_status(result):
+    # signals as 128 + signal, the same outcome strings gcc-run.py caches
+    return 128 - result.returncode if result.returncode < 0 else result.returncode
+
 
-    compile_cmd = [gcc_path, '-w'] + conf.split() + ['fail.c']
+def gcov_env(rev, cwd):
+    # Counters of the instrumented compiler go below cwd, not into the shared build tree
+    cov_dir = os.path.join(compilersDir, rev, 'build')
+    env = dict(os.environ)
+    env['GCOV_PREFIX'] = os.path.join(cwd, 'gcda')
+    env['GCOV_PREFIX_STRIP'] = str(len(cov_dir.strip(os.sep).split(os.sep)))
+    return env
+
+
+def make_scratch(bug_id):
+    os.makedirs(scratchDir, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix=bug_id + '-', dir=scratchDir)
+    os.symlink(os.path.join(testDir, bug_id, 'fail.c'), os.path.join(workdir, 'fail.c'))
+    return workdir
+
+
+def run_conf(bug_id, rev, conf, timeout_seconds):
+    cwd = make_scratch(bug_id)
+    gcc_path = os.path.join(compilersDir, rev, 'build/bin/gcc')
     try:
-        cpl = subprocess.run(
-            compile_cmd,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout_seconds + 1,
-            universal_newlines=True,
-        )
+        # Crash bugs only need the compiler's return code: stop after compilation
+        stop_after = ['-S'] if bug_id in CRASH_BUG_IDS else []
+        compile_cmd = [gcc_path, '-w'] + conf.split() + stop_after + ['fail.c']
+        cpl = execute.run(compile_cmd, cwd=cwd, env=gcov_env(rev, cwd), timeout=timeout_seconds, limits=PROC_LIMITS,
+                          kind='compile')
+        if cpl.timedout:
+            return 'CPLTimeoutExpired'
         if bug_id in CRASH_BUG_IDS:
-            return str(cpl.returncode)
+            return str(exit_status(cpl))
         if cpl.returncode != 0:
-            return '{}:{}:{}'.format(cpl.returncode, (cpl.stdout or '').strip(), (cpl.stderr or '').strip())
+            return '{}:{}:{}'.format(exit_status(cpl), cpl.stdout.decode().strip(), cpl.stderr.decode().strip())
 
-        # run a.out
+        # run a.out, unless the same binary has been run already
         exec_path = os.path.join(cwd, 'a.out')
-        try:
-            exe = subprocess.run(
-                [exec_path],
-                cwd=cwd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=timeout_seconds + 1,
-                universal_newlines=True,
-            )
-            return '{}:{}:{}'.format(exe.returncode, (exe.stdout or '').strip(), (exe.stderr or '').strip())
-        except subprocess.TimeoutExpired:
-            return 'EXETimeoutExpired'
-    except subprocess.TimeoutExpired:
-        return 'CPLTimeoutExpired'
+        digest = file_hash(exec_path)
+        result = exe_outcomes.get(digest)
+        key = outcome_cache.key('a.out', '', '', digest, 'exe') if outcome_cache is not None else None
+        if result is None and key is not None:
+            result = outcome_cache.get(key)
+        if result is None:
+            exe = execute.run([exec_path], cwd=cwd, timeout=timeout_seconds, limits=PROC_LIMITS, kind='run')
+            if exe.timedout:
+                return 'EXETimeoutExpired'
+            result = '{}:{}:{}'.format(exit_status(exe), exe.stdout.decode().strip(), exe.stderr.decode().strip())
+            if key is not None:
+                outcome_cache.put(key, result)
+        exe_outcomes[digest] = result
+        return result
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
 
 
 def load_fail_configs(bug_id):
@@ -115,22 +171,19 @@ def random_flip_conf(conf, rng, max_flips):
 
 
 def get_enabled_fopts(bug_id, rev, conf):
-    cwd = os.path.join(testDir, bug_id)
+    cwd = make_scratch(bug_id)
     gcc_path = os.path.join(compilersDir, rev, 'build/bin/gcc')
     # Query optimizer switches under the provided configuration
     try:
-        out = subprocess.run(
-            [gcc_path, '-Q', '--help=optimizers'] + conf.split(),
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
+        out = execute.run([gcc_path, '-Q', '--help=optimizers'] + conf.split(), cwd=cwd, env=gcov_env(rev, cwd),
+                          kind='query')
     except Exception as e:
         return []
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
 
     enabled = []
-    for line in (out.stdout or '').splitlines():
+    for line in out.stdout.decode().splitlines():
         line = line.strip()
         if not line.startswith('-'):
             continue
@@ -151,8 +204,14 @@ def main():
     parser.add_argument('--list-enabled', action='store_true', help='List actually enabled -f* options for FAIL CONFIGS')
     parser.add_argument('--enabled-limit', type=int, default=0, help='If >0, only process this many FAIL CONFIGS when listing enabled')
     parser.add_argument('--show-summary', action='store_true', help='Show enabled options summary for original vs minimized configs')
+    parser.add_argument('--no-cache', action='store_true', help='Always recompile instead of reusing cached outcomes')
+    parser.add_argument('--cache-max-mb', type=int, default=256, help='Size bound of the shared outcome cache')
     args = parser.parse_args()
 
+    global outcome_cache
+    if not args.no_cache:
+        outcome_cache = OutcomeCache(cacheDir, args.cache_max_mb * 1024 * 1024)
+
     rng = random.Random(args.seed)
 
     bug_id = args.bug_id
@@ -267,6 +326,10 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    scratchDir = make_run_dir(scratchBase)
+    try:
+        main()
+    finally:
+        shutil.rmtree(scratchDir, ignore_errors=True)
 
 
@@ -1,8 +1,28 @@
 import os
+import sys
+import argparse
+import concurrent.futures
+import multiprocessing
+
+# helper modules shared by the gcc and llvm scripts
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from covindex import write_index
+import mirror
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
 compilersDir = os.path.join(current_directory, 'compilers')
 llvmbugsFile = os.path.join(current_directory, 'benchmark', 'llvmbugs_summary.txt')
+# parallel make jobs; make starts no new job while the load average is above jobs
+jobs = multiprocessing.cpu_count()
+# git repository of llvm-project; a local bare repository works too
+llvmRepo = os.environ.get('ODFL_LLVM_REPO', 'https://github.com/llvm/llvm-project.git')
+# every revision is checked out of this one clone instead of a full clone each
+mirrorDir = os.path.join(compilersDir, 'llvm-project.git')
+# 'worktree' (git worktree of the mirror) or 'export' (plain copy of the tree)
+checkoutMode = 'worktree'
+# revisions checked out at the same time, while the previous ones are built
+checkoutWorkers = 4
 
 
 def getBugInfo(llvmbug):
@@ -11,30 +31,54 @@ def getBugInfo(llvmbug):
     return bugId, rev, passOptLevel, failOptLevel, buggyFiles
 
 
+def checkoutRev(rev, commit):
+    revpath = os.path.join(compilersDir, rev)
+    if mirror.checkout(mirrorDir, commit, revpath, checkoutMode):
+        print('\033[1;35m %s checked out (%s)\033[0m' % (rev, commit[:12]))
+
+
 def install(rev):
-    os.chdir(compilersDir)
     revpath = os.path.join(compilersDir, rev)
-    if os.path.exists(revpath):
-        os.system('rm -rf ' + revpath)
-    print('\033[1;35m git cloning..\033[0m')
-    os.system('git clone https://github.com/llvm/llvm-project.git ' + rev)
     os.chdir(revpath)
-    os.system('rm -rf ./*')
-    os.system('git reset --hard ' + rev)
     os.system('mv clang llvm/tools')
     os.system('mkdir build')
     os.chdir(revpath + '/build')
     print('\033[1;35m cmake..\033[0m')
     os.system('cmake -DCMAKE_EXPORT_COMPILER_COMMANDS=ON -DCMAKE_INSTALL_PREFIX=' + revpath + '/build -DCMAKE_BUILD_TYPE=Release -DCMAKE_C_COMPILER=/usr/bin/gcc -DCMAKE_CXX_COMPILER=/usr/bin/g++ -DCMAKE_C_FLAGS="-g -O0 -fprofile-arcs -ftest-coverage" -DCMAKE_CXX_FLAGS="-g -O0 -fprofile-arcs -ftest-coverage" -DCMAKE_EXE_LINKER_FLAGS="-g -fprofile-arcs -ftest-coverage -lgcov" -DPYTHON_EXECUTABLE:FILEPATH=/usr/bin/python ../llvm')
     print('\033[1;35m make..\033[0m')
-    os.system('make -j48')
+    os.system('make -j %d -l %d' % (jobs, jobs))
     os.system('make install')
+    # list the instrumented objects once, collectCov reads this index
+    write_index(revpath + '/build', 'llvm')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check out and build the LLVM revisions of the benchmark.')
+    parser.add_argument('--checkout-only', action='store_true', help='only check out the sources of every revision')
+    args = parser.parse_args()
     with open(llvmbugsFile, 'r') as f:
         llvmbugs = [item.strip() for item in f.readlines()]
+    revs = []
     for item in llvmbugs:
         _, rev, _, _, _ = getBugInfo(item)
-        install(rev)
+        if rev not in revs:
+            revs.append(rev)
+    print('\033[1;35m updating %s..\033[0m' % mirrorDir)
+    mirror.ensure_mirror(llvmRepo, mirrorDir)
+    commits = mirror.resolve_revisions(mirrorDir, revs)
+    for rev in revs:
+        if commits[rev] is None:
+            print('%s: no such commit in %s, skipped' % (rev, llvmRepo))
+    revs = [rev for rev in revs if commits[rev] is not None]
+    # a revision is built as soon as its sources are there, the next ones are checked out meanwhile
+    with concurrent.futures.ThreadPoolExecutor(checkoutWorkers) as pool:
+        checkouts = [(rev, pool.submit(checkoutRev, rev, commits[rev])) for rev in revs]
+        for rev, future in checkouts:
+            try:
+                future.result()
+            except mirror.MirrorError as e:
+                print('%s: %s, skipped' % (rev, e))
+                continue
+            if not args.checkout_only:
+                install(rev)
         
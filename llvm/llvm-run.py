@@ -1,8 +1,21 @@
 import os
-import math
-import subprocess
+import sys
+import resource
+import shutil
+import tempfile
 import multiprocessing
-import re
+
+# helper modules shared by the gcc and llvm scripts
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from conf_cache import OutcomeCache
+from spectra import FileTable, read_spectrum
+from scheduler import Scheduler
+from admission import Admission
+from gcov_reader import executed_lines, gcov_format, gcov_json_lines, gcov_text_lines
+from tracing import Tracer
+from scratch import scratch_base, make_run_dir
+from pipeline import Pipeline, gcov_env
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
 compilersDir = os.path.join(current_directory, 'compilers')
@@ -10,13 +23,72 @@ collectDir = os.path.join(current_directory, 'cov')
 testDir = os.path.join(current_directory, 'benchmark', 'llvmbugs')
 llvmbugsFile = os.path.join(current_directory, 'benchmark', 'llvmbugs_summary.txt')
 rankFile = os.path.join(current_directory, 'ranks.txt')
+cacheDir = os.path.join(current_directory, 'cache', 'outcomes')
+# probe outputs and coverage counters go below a RAM-backed scratch base when /dev/shm
+# has shmMinFree bytes free, below ./scratch otherwise, or below ODFL_SCRATCH
+shmMinFree = 4 * 1024 * 1024 * 1024
+scratchBase = scratch_base('llvm', os.path.join(current_directory, 'scratch'), shmMinFree)
+# the private directory of this run below scratchBase, made at startup
+scratchDir = None
+# copy the executables of every revision into scratchDir at startup (paths below build/)
+stageCompilers = False
+stagePaths = ['bin/clang*', 'lib/clang']
 
 # crash while compiling
 crash_bugId_lst = []
 
 timeout = 15
+# bugs in flight at once; all of them share the workers of one scheduler
 processes = 10
 parallel = True
+# compiles, coverage collections and gcov batches running at once, over all bugs
+workers = multiprocessing.cpu_count()
+scheduler = Scheduler(workers if parallel else 1)
+# admission control for every compiler, gcov and a.out process: at most cpuSlots at
+# once, and back off while the machine has more runnable tasks than CPUs (+1 for
+# this process) or less than memPerJob available memory
+cpuSlots = multiprocessing.cpu_count()
+memPerJob = 1024 * 1024 * 1024
+admission = Admission(cpuSlots, cpuSlots + 1, memPerJob)
+# resource limits of every spawned process; crashing compilers and a.out dump no core
+procLimits = [(resource.RLIMIT_CORE, (0, 0))]
+# .gcda files handed to one gcov process, and the seconds it may take before it is killed
+gcovBatchSize = 64
+gcovTimeout = 1800
+# how coverage is read: 'native' parses the .gcno/.gcda files in process, 'gcov' runs
+# gcov and parses its text output, 'auto' uses native and falls back to gcov for
+# formats gcov_reader does not know
+covBackend = 'auto'
+# opt-bisect probes the next bisectDepth steps of its binary search at once, i.e. a
+# (2 ** bisectDepth)-ary search with 2 ** bisectDepth - 1 compiles per round that
+# ends at exactly the limits the one-step search finds
+bisectDepth = max(1, (workers + 1).bit_length() - 1) if parallel else 1
+useOutcomeCache = True
+cacheMaxBytes = 256 * 1024 * 1024
+outcomeCache = OutcomeCache(cacheDir, cacheMaxBytes) if useOutcomeCache else None
+# SBFL formulas ranked by getRank, each one written to cov/<bugId>/<formula>_*.txt
+sbflFormulas = ['Ochiai', 'Tarantula', 'DStar', 'Dice', 'Barinel', 'Op2']
+# coverage is kept in cov/<bugId>/spectra.bin; also write the readable
+# cov/<bugId>/<test>/stmt_info.txt files (python spectra.py exports them later)
+exportStmtInfo = False
+# statement-level ranking files: 'full' (all statements, scoring order and sorted),
+# 'topk' (the best stmtTopK statements and their ties) or 'jsonl' (one line per score)
+stmtOutput = 'full'
+stmtTopK = 1000
+# keep the coverage counters of the probes whose configuration can become a final
+# pass/fail configuration, so that getRank reads their spectra instead of compiling
+# them again; at most keepGcdaBytes of counters are kept at once, over all bugs
+captureCoverage = True
+keepGcdaBytes = 1024 * 1024 * 1024
+# spans and counters of every bug, written to cov/trace.json (chrome://tracing) and
+# cov/trace_summary.txt at the end of a run
+traceRun = True
+tracer = Tracer(traceRun)
+# record every finished phase of a bug in cov/<bugId>/journal.json, so that a
+# restarted run skips the phases whose inputs did not change
+useJournal = True
+# probes, kept counters, coverage and ranking, shared with gcc-run.py (common/pipeline.py)
+pipeline = Pipeline('clang', 'llvm', globals())
 
 
 def getBugInfo(llvmbug):
@@ -25,53 +97,77 @@ def getBugInfo(llvmbug):
     return bugId, rev, passOptLevel, failOptLevel, buggyFiles
 
 
-def getConfResult(bugId, rev, conf, timeout=timeout):
-    cwd = os.path.join(testDir, bugId)
-    clangPath = os.path.join(compilersDir, rev, 'build/bin/clang')
+def bisectLimits(passLimit, failLimit, depth):
+    # every limit the binary search can test in its next depth steps: 2**depth - 1
+    # evenly spaced limits, whatever the outcomes turn out to be
+    limits = []
+    intervals = [(passLimit, failLimit)]
+    for _ in range(depth):
+        nextIntervals = []
+        for low, high in intervals:
+            if high - low > 1:
+                mid = (low + high) // 2
+                limits.append(mid)
+                nextIntervals += [(low, mid), (mid, high)]
+        intervals = nextIntervals
+    return sorted(limits)
+
 
-    cplcmd = clangPath + ' -w ' + conf + ' fail.c'
-    cplcmd = 'timeout --signal=SIGKILL ' + str(timeout) + ' ' + cplcmd
+def bisectLimit(conf):
+    return int(conf.rsplit('-opt-bisect-limit=', 1)[1])
+
+
+def countBisectPasses(bugId, rev, failOptLevel):
+    # clang prints one line for every pass that the bisection can skip
+    cwd = pipeline.makeScratch(bugId)
     try:
-        cplout = subprocess.run(cplcmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout+1)
-        if bugId in crash_bugId_lst:
-            return str(cplout.returncode)
-        else:
-            if cplout.returncode != 0:
-                return str(cplout.returncode) + ':' + cplout.stdout.decode().strip() + ':' + cplout.stderr.decode().strip()
-
-            execmd = 'timeout --signal=SIGKILL ' + str(timeout) + ' ./a.out'
-            try:
-                exeout = subprocess.run(execmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout+1)
-                return str(exeout.returncode) + ':' + exeout.stdout.decode().strip() + ':' + exeout.stderr.decode().strip()
-            except subprocess.TimeoutExpired:
-                return 'EXETimeoutExpired'
-    except subprocess.TimeoutExpired:
-        return 'CPLTimeoutExpired'
-    
+        argv = [pipeline.binPath(rev, 'clang')] + failOptLevel.split() + ['-mllvm', '-opt-bisect-limit=-1', 'fail.c']
+        with tracer.span('query'):
+            out = pipeline.spawn('query', argv, cwd, gcov_env(os.path.join(compilersDir, rev, 'build'), os.path.join(cwd, 'gcda')))
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
+    return len((out.stdout + out.stderr).splitlines())
+
 
 def getOptBisectLimit(bugId, rev, failOptLevel, passOptLevel):
-    passResult = getConfResult(bugId, rev, passOptLevel)
     passConfs = []
     failConfs = []
-    os.chdir(os.path.join(testDir, bugId))
-    clangPath = os.path.join(compilersDir, rev, 'build/bin/clang')
-    os.system(clangPath + ' ' + failOptLevel + ' -mllvm -opt-bisect-limit=-1 fail.c > failLimit.txt 2>&1')
-    with open('failLimit.txt', 'r') as f:
-        maxfailLimit = len(f.readlines())
-    failLimit = maxfailLimit
-    passLimit = 0
-    while True:
-        print('\033[1;35m passLimit = %d, failLimit = %d\033[0m' % (passLimit, failLimit))
-        if failLimit - passLimit == 1:
-            break
-        tmpLimit = (failLimit + passLimit) // 2
-        tmpConf = failOptLevel + ' -mllvm -opt-bisect-limit=' + str(tmpLimit)
-        tmpResult = getConfResult(bugId, rev, tmpConf)
-        if tmpResult == passResult:  # pass
-            passLimit = tmpLimit
-        else:  # fail
-            failLimit = tmpLimit
-    
+
+    def search():
+        passResult, maxfailLimit = pipeline.mapParallel(lambda job: job(), [
+            lambda: pipeline.getConfResult(bugId, rev, passOptLevel),
+            lambda: pipeline.checkpoint(bugId, rev, 'passes', [failOptLevel], lambda: countBisectPasses(bugId, rev, failOptLevel))])
+        failLimit = maxfailLimit
+        passLimit = 0
+        passed = {}  # limit -> whether it reproduces passResult
+        while True:
+            print('\033[1;35m passLimit = %d, failLimit = %d\033[0m' % (passLimit, failLimit))
+            if failLimit - passLimit == 1:
+                break
+            tmpLimit = (failLimit + passLimit) // 2
+            if tmpLimit not in passed:
+                # the final limits and their neighbours lie within two of the current interval
+                low, high = passLimit - 2, failLimit + 2
+                pipeline.pruneGcda(bugId, lambda conf: low <= bisectLimit(conf) <= high)
+                # probe the next bisectDepth steps of the search in one round
+                limits = bisectLimits(passLimit, failLimit, bisectDepth)
+                confs = [failOptLevel + ' -mllvm -opt-bisect-limit=' + str(limit) for limit in limits]
+                with tracer.span('bisect', passLimit=passLimit, failLimit=failLimit, probes=len(limits)):
+                    results = pipeline.mapProbes(bugId, rev, confs, keep=True)
+                passed.update((limit, result == passResult) for limit, result in zip(limits, results))
+            if passed[tmpLimit]:  # pass
+                passLimit = tmpLimit
+            else:  # fail
+                failLimit = tmpLimit
+        return {'maxfailLimit': maxfailLimit, 'passLimit': passLimit, 'failLimit': failLimit,
+                'outcomes': dict((str(limit), ok) for limit, ok in sorted(passed.items()))}
+
+    # the limits the search ends at, and whether every limit it probed passed
+    bisect = pipeline.checkpoint(bugId, rev, 'bisect', [failOptLevel, passOptLevel], search)
+    maxfailLimit, passLimit, failLimit = bisect['maxfailLimit'], bisect['passLimit'], bisect['failLimit']
+
+    # the neighbours are kept only where the search probed them; the others have
+    # not been compiled yet, collectCov compiles them once
     passConfs.append(failOptLevel + ' -mllvm -opt-bisect-limit=' + str(passLimit))
     failConfs.append(failOptLevel + ' -mllvm -opt-bisect-limit=' + str(failLimit))
 
@@ -87,213 +183,99 @@ def getOptBisectLimit(bugId, rev, failOptLevel, passOptLevel):
         else:
             passConfs.append(failOptLevel + ' -mllvm -opt-bisect-limit=' + str(passLimit - i - 1))
 
+    final = set(passConfs + failConfs)
+    pipeline.pruneGcda(bugId, lambda conf: conf in final)
     return passConfs, failConfs
 
 
-def collectCov(bugId, rev, conf, testname, collectDir):
-    clangPath = os.path.join(compilersDir, rev, 'build/bin/clang')
+def nativeCov(gcdafiles):
+    def readBatch(batch):
+        covlines = []
+        with tracer.span('read', files=len(batch)):
+            for gcnofile, gcdafile, name in batch:
+                # only the main source of each object, like the <source>.gcov file gcov writes for it
+                source = os.path.basename(gcdafile)[:-len('.gcda')]
+                lines = set()
+                for filename, linenos in executed_lines(gcnofile, gcdafile).items():
+                    if os.path.basename(filename) == source:
+                        lines.update(linenos)
+                covlines.append((name, lines))
+        return covlines
+
+    batches = [gcdafiles[i:i + gcovBatchSize] for i in range(0, len(gcdafiles), gcovBatchSize)]
+    merged = {}
+    for covlines in pipeline.mapParallel(readBatch, batches, pool='gcov'):
+        for tmpfilename, lines in covlines:
+            merged.setdefault(tmpfilename, set()).update(lines)
+    return merged
+
+
+def gcovCov(rev, cwd, gcdafiles):
     gcovPath = os.path.join('gcov-5')
-    covDir = os.path.join(compilersDir, rev, 'build')
-    clangbuildPath = os.path.join(compilersDir, rev, 'build')
-    cwd = os.path.join(testDir, bugId)
-    covline_set = set()
-
-    subprocess.run('find ' + covDir + ' -name "*.gcda" | xargs rm -f', shell=True, cwd=cwd)  # delete all .gcda files
-    subprocess.run(clangPath + ' -w ' + conf + ' fail.c > /dev/null 2>&1', shell=True, cwd=cwd)  # compile test program
-
-    file_gcdalist = os.path.join(cwd, 'gcdalist')
-    if os.path.exists(file_gcdalist):
-        subprocess.run('rm ' + file_gcdalist, shell=True, cwd=cwd)
-
-    subprocess.run('find ' + covDir + ' -name "*.gcda" > ' + file_gcdalist, shell=True, cwd=cwd)
-
-    tempdir = os.path.join(collectDir, bugId, testname)
-    if os.path.exists(tempdir):
-        subprocess.run('rm -rf ' + tempdir, shell=True, cwd=cwd)
-
-    subprocess.run('mkdir -p ' + tempdir, shell=True, cwd=cwd)
-
-    with open(file_gcdalist, 'r') as f:
-        gcdafilelines = f.readlines()
-
-        subprocess.run('find ' + covDir + ' -name "*.cpp.gcov" | xargs rm -f', shell=True, cwd=cwd)
-        for gcdafile in sorted(gcdafilelines):
-            gcdafile = gcdafile.strip()
-            if '/build/lib/' not in gcdafile:
-                continue
-            subprocess.run(gcovPath + ' ' + gcdafile + ' > /dev/null 2>&1', shell=True, cwd=clangbuildPath)
-            gcovfile = os.path.join(clangbuildPath, gcdafile.strip().split('/')[-1].split('.gcda')[0] + '.gcov')
-            if not os.path.exists(gcovfile):
-                continue
-            tmpfilename = os.path.relpath(gcdafile, covDir).replace('.cpp.gcda', '.cpp')
-            tmpfilename = tmpfilename.split('/CMakeFiles/')[0] + tmpfilename.split('.dir')[1]
-            with open(gcovfile, 'r', encoding='utf-8') as f:
-                stmtlines = f.readlines()
-                tmp = []
-                for stmtline in stmtlines:
-                    stmtline = stmtline.strip()
-                    if ':' in stmtline:
-                        lineCov = stmtline.split(':')[0].strip()
-                        lineNum = stmtline.split(':')[1].strip()
-                        if lineCov != '-' and lineCov != '#####' and lineCov != '=====':
-                            tmp.append(lineNum)
-                if len(tmp) == 0: continue                
-                covline = tmpfilename + '$' + ','.join(tmp)
-                covline_set.add(covline)
-
-    file_stmtinfo = os.path.join(tempdir, 'stmt_info.txt')
-    with open(file_stmtinfo, 'w') as stmtfile:
-        stmtfile.write('\n'.join(sorted(covline_set)))
-    
-    return covline_set
-
-
-def getStmtInfo(covFile):
-    stmtInfoSet = set()
-    with open(covFile, 'r') as f:
-        for line in f:
-            filename, stmts = line.strip().split('$')
-            for stmt in stmts.split(','):
-                stmtInfoSet.add(filename + ',' + stmt)
-    return stmtInfoSet
+    names = {}
+    for gcnofile, gcdafile, name in gcdafiles:
+        names[gcdafile] = name
+        # gcov expects the notes file next to the counters
+        os.symlink(gcnofile, gcdafile[:-len('.gcda')] + '.gcno')
+
+    def runGcovJson(batch):
+        lines = {}
+        with tracer.span('gcov', files=len(batch)):
+            for gcdafile, source, linenos in gcov_json_lines(gcovPath, batch, cwd, pipeline.gcovStream):
+                if os.path.basename(source) == os.path.basename(gcdafile)[:-len('.gcda')]:
+                    lines.setdefault(gcdafile, set()).update(linenos)
+        return [(names[gcdafile], linenos) for gcdafile, linenos in lines.items()]
+
+    def runGcov(batch):
+        # sources are absolute, so gcov can run in a private output directory
+        gcovDir = tempfile.mkdtemp(prefix='gcov', dir=cwd)
+        covlines = []
+        with tracer.span('gcov', files=len(batch)):
+            pipeline.gcov([gcovPath] + batch, gcovDir)
+            for gcdafile in batch:
+                gcovfile = os.path.join(gcovDir, os.path.basename(gcdafile)[:-len('.gcda')] + '.gcov')
+                if not os.path.exists(gcovfile):
+                    continue
+                covlines.append((names[gcdafile], gcov_text_lines(gcovfile)))
+        return covlines
+
+    runBatch = runGcov if gcov_format(gcovPath) == 'text' else runGcovJson
+    merged = {}
+    for covlines in pipeline.mapParallel(runBatch, pipeline.gcovBatches([gcdafile for _, gcdafile, _ in gcdafiles]), pool='gcov'):
+        for tmpfilename, lines in covlines:
+            merged.setdefault(tmpfilename, set()).update(lines)
+    return merged
 
 
 def rank(failStmtInfoDir, passStmtInfoDir, formula = 'Ochiai'):
-    failstmt = {}  # the stmt cov information of failing test program
-    passstmt = {}
-    nfstmt = {}
-    npstmt = {}
-
-    failstmtset = set()  # all failstmt
-    passstmtset = set()  # all passstmt
-
-    # efs
-    # the statements that the falling test program executed
-    for failStmtInfo in failStmtInfoDir:
-        tmpfailstmtset = getStmtInfo(failStmtInfo)
-        failstmtset.update(tmpfailstmtset)
-        for stmt in tmpfailstmtset:
-            failstmt[stmt] = failstmt.get(stmt, 0) + 1
-
-    # init nfstmt and passstmt
-    for stmt in failstmtset:
-        nfstmt[stmt] = 0
-        passstmt[stmt] = 0
-        npstmt[stmt] = 0
-
-    # nfs
-    for failStmtInfo in failStmtInfoDir:
-        nfset = failstmtset - getStmtInfo(failStmtInfo)
-        for nf in nfset:
-            nfstmt[nf] += 1
-
-    # eps and nps
-    for passStmtInfo in passStmtInfoDir:
-        tmppassstmtset = getStmtInfo(passStmtInfo)
-        passstmtset.update(failstmtset - tmppassstmtset)
-        for stmt in tmppassstmtset:
-            if stmt in failstmtset:
-                passstmt[stmt] += 1
-        npset = failstmtset - tmppassstmtset
-        for np in npset:
-            npstmt[np] += 1
-
-    # compute statement score based on SBFL
-    score = {}  # the buggy value of each statement and its line number in each file
-    filescore = {}  # the buggy value of each file, and we can get the corresponding statement values
-    for key in failstmt:
-        if formula == 'Ochiai':
-            score[key] = failstmt[key] / math.sqrt((failstmt[key] + nfstmt[key]) * (failstmt[key] + passstmt[key]))
-
-        elif formula == 'Tarantula': 
-            score[key] = (failstmt[key]/(failstmt[key]+nfstmt[key])) / ((failstmt[key]/(failstmt[key] + nfstmt[key])) + (passstmt[key]/(npstmt[key] + passstmt[key])))
-        
-        elif formula == 'DStar':
-            if passstmt[key] + nfstmt[key] != 0:
-                score[key] = failstmt[key] * failstmt[key] / (passstmt[key] + nfstmt[key])
-            else:
-                score[key] = 1
-
-        elif formula == 'Dice':
-            score[key] = 2 * failstmt[key] / (failstmt[key] + nfstmt[key] + passstmt[key])
-
-        elif formula == 'Barinel':
-            score[key] = 1 - passstmt[key] / (passstmt[key] + failstmt[key])
-
-        elif formula == 'Op2':
-            score[key] = failstmt[key] - passstmt[key] / (1 + npstmt[key] + passstmt[key])
-
-        filename = key.rsplit(',', 1)[0]
-        filescore.setdefault(filename, []).append(score[key])
-
-    # compute the buggy values of each file based on average aggregation
-    scoredict = {key: sum(values) / len(values) for key, values in filescore.items()}
-
-    return scoredict
-
-
-def getRank(bugId, rev, passConfs, failConfs, collectDir):
-    # collect cov
-    cwd = os.path.join(testDir, bugId)
-    tempdir = os.path.join(collectDir, bugId)
-    if os.path.exists(tempdir):
-        subprocess.run('rm -rf ' + tempdir, shell=True, cwd=cwd)
-    subprocess.run('mkdir ' + tempdir, shell=True, cwd=cwd)
-
-    passStmtInfoDir = []
-    passcnt = 0
-    for passConf in passConfs:
-        passcnt += 1
-        testname = 'pass'+str(passcnt)
-        collectCov(bugId, rev, passConf, testname, collectDir)
-        passStmtInfoDir.append(os.path.join(collectDir, bugId, testname, 'stmt_info.txt'))
-    
-    failStmtInfoDir = []
-    failcnt = 0
-    for failConf in failConfs:
-        failcnt += 1
-        testname = 'fail'+str(failcnt)
-        collectCov(bugId, rev, failConf, testname, collectDir)
-        failStmtInfoDir.append(os.path.join(collectDir, bugId, testname, 'stmt_info.txt'))
-
-    # rank file by score
-    scoredict = rank(failStmtInfoDir, passStmtInfoDir, formula = 'Ochiai')
-    with open(os.path.join(collectDir, bugId, 'Ochiai_scoredict.txt'), 'w') as f:
-        f.write(str(scoredict))
+    # rank exported stmt_info.txt files
+    files = FileTable()
+    failSpectra = (read_spectrum(failStmtInfo, files) for failStmtInfo in failStmtInfoDir)
+    passSpectra = (read_spectrum(passStmtInfo, files) for passStmtInfo in passStmtInfoDir)
+    scoredict, score = pipeline.rankAll(files, failSpectra, passSpectra, [formula])[formula]
     return scoredict
 
 
 def task(llvmbug):
     print('\033[1;35m%s\033[0m' % llvmbug)
     bugId, rev, passOptLevel, failOptLevel, buggyFiles = getBugInfo(llvmbug)
+    # everything traced while the bug runs is attributed to it
+    with tracer.span('task', bug=bugId):
+        # generate configurations
+        with tracer.span('options'):
+            passConfs, failConfs = getOptBisectLimit(bugId, rev, failOptLevel, passOptLevel)
 
-    # generate configurations
-    passConfs, failConfs = getOptBisectLimit(bugId, rev, failOptLevel, passOptLevel)
-
-    # SBFL rank
-    scoredict = getRank(bugId, rev, passConfs, failConfs, collectDir)
+        # SBFL rank
+        scoredict = pipeline.getRank(bugId, rev, passConfs, failConfs, collectDir)
+        pipeline.dropGcda(bugId)
 
 
 if __name__ == '__main__':
-    if not os.path.exists(collectDir):
-                subprocess.run('mkdir -p ' + collectDir, shell=True)
+    os.makedirs(collectDir, exist_ok=True)
     
     with open(llvmbugsFile, 'r') as f:
         llvmbugs = [item.strip() for item in f.readlines()]
     
-    if not parallel:
-        for llvmbug in llvmbugs:
-            _, rev, _, _, _ = getBugInfo(llvmbug)
-            if os.path.exists(os.path.join(compilersDir, rev, 'build')):
-                task(llvmbug)
-    else:
-        bugs = []
-        for item in llvmbugs:
-            bugId, rev, _, _, _ = getBugInfo(item)
-            if not os.path.exists(os.path.join(compilersDir, rev, 'build')):
-                continue
-            bugs.append(item)
-        pool = multiprocessing.Pool(processes)
-        result = pool.map_async(task, bugs)
-        result.wait()
-
+    scratchDir = make_run_dir(scratchBase)
+    pipeline.runBugs(llvmbugs, lambda llvmbug: getBugInfo(llvmbug)[1], task)
+    pipeline.report()
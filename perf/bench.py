@@ -0,0 +1,380 @@
+"""Hermetic benchmark of the gcc-run.py and llvm-run.py pipelines.
+
+    python perf/bench.py [--compiler gcc|llvm|both] [--scale small|medium|large]
+                         [--cov-backend auto|native|gcov] [--gcov-format stream|text]
+                         [--stmt-output full|topk|jsonl] [--repeat N]
+                         [--update-baseline] [--tolerance 0.5] [--keep]
+
+Every run builds a private workspace with a fake compilers/<rev> tree: stub
+gcc/clang/gcov executables (stubcc.py), the .gcno files of a synthetic build
+tree (synthcov.py) and a few benchmark bugs whose triggering options or
+passes are hidden in their fail.c. The run script is loaded as a module,
+pointed at the workspace and runs task() for every bug; the time spent in
+each phase is recorded by wrapping the functions that implement it:
+
+    query     get_fineOpt_dict (gcc) / countBisectPasses (llvm)
+    probes    getConfResult: compile and run one configuration
+    minimize  minimize_bugfree (gcc)
+    options   collect_option (gcc) / getOptBisectLimit (llvm), probes included
+    coverage  collectCov: compile (unless kept) and read the counters
+    rank      rankAll
+    write     writeRanking
+    ranking   getRank, coverage/rank/write included
+    index     covindex.write_index, as run by the install scripts
+    result    evaluateFormula of gcc-result.py / llvm-result.py, cold and warm
+
+Phases that run inside a parallel map add up the time of all their calls.
+Each configuration runs in its own process --repeat times and the fastest
+time of every phase is kept. The results are compared with perf/baseline.json:
+a phase more than --tolerance (relative) and 50 ms slower than its baseline,
+or a change in the number of compiler/gcov/a.out processes or in the ranks of
+the buggy files, is reported and makes the exit status 1. --update-baseline
+records the results instead. Timings depend on the machine, so a baseline
+is only meaningful on the machine that recorded it.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import synthcov
+
+PERF_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(PERF_DIR)
+BASELINE_FILE = os.path.join(PERF_DIR, 'baseline.json')
+SEED = 20240613
+REV = 'r1'
+
+# units: options (gcc) or passes of -O3 (llvm); objects and functions per object of the build tree
+SCALES = {
+    'small': {'options': 40, 'passes': 300, 'objects': 60, 'functions': 30, 'bugs': 2},
+    'medium': {'options': 120, 'passes': 1000, 'objects': 300, 'functions': 60, 'bugs': 3},
+    'large': {'options': 200, 'passes': 2500, 'objects': 1000, 'functions': 80, 'bugs': 4},
+}
+
+PHASES = {
+    'gcc': [('query', 'get_fineOpt_dict'), ('probes', 'getConfResult'), ('minimize', 'minimize_bugfree'),
+            ('options', 'collect_option'), ('coverage', 'collectCov'), ('rank', 'rankAll'),
+            ('write', 'writeRanking'), ('ranking', 'getRank')],
+    'llvm': [('query', 'countBisectPasses'), ('probes', 'getConfResult'), ('options', 'getOptBisectLimit'),
+             ('coverage', 'collectCov'), ('rank', 'rankAll'), ('write', 'writeRanking'), ('ranking', 'getRank')],
+}
+
+LLVM_PASSES = ['SROAPass', 'EarlyCSEPass', 'SimplifyCFGPass', 'InstCombinePass', 'GVNPass', 'LICMPass',
+               'LoopRotatePass', 'IndVarSimplifyPass', 'LoopUnrollPass', 'SCCPPass', 'JumpThreadingPass',
+               'DSEPass', 'MemCpyOptPass', 'ReassociatePass', 'CorrelatedValuePropagationPass',
+               'LoopVectorizePass', 'SLPVectorizerPass', 'InlinerPass', 'ADCEPass', 'TailCallElimPass']
+LLVM_DIRS = [('Analysis', 'LLVMAnalysis'), ('Transforms/Scalar', 'LLVMScalarOpts'), ('Transforms/IPO', 'LLVMipo'),
+             ('Transforms/InstCombine', 'LLVMInstCombine'), ('Transforms/Vectorize', 'LLVMVectorize'),
+             ('CodeGen', 'LLVMCodeGen'), ('IR', 'LLVMCore')]
+
+
+def make_model(compiler, scale, rev_dir, rng):
+    """The model.json of a fake compiler and the bugs of the benchmark."""
+    if compiler == 'gcc':
+        units = ['opt%03d' % i for i in range(scale['options'])]
+        # lowest -O level that enables each option; 4: only enabled by -f
+        first = [rng.choice([0, 1, 1, 1, 2, 2, 2, 3, 3, 4]) for _ in units]
+        levels = dict(('-O%d' % k, [i for i in range(len(units)) if first[i] <= k]) for k in range(4))
+        owned = 3
+    else:
+        units = ['%s on f%d' % (LLVM_PASSES[i % len(LLVM_PASSES)], i // len(LLVM_PASSES)) for i in range(scale['passes'])]
+        # -O1 and -O2 skip some of the passes of -O3
+        levels = {'-O0': [], '-O3': list(range(len(units)))}
+        levels['-O2'] = [i for i in levels['-O3'] if rng.random() < 0.9]
+        levels['-O1'] = [i for i in levels['-O2'] if rng.random() < 0.6]
+        owned = 1
+    codegen = [i for i in range(len(units)) if rng.random() < 0.5]
+
+    objects = []
+    for k in range(scale['objects']):
+        if compiler == 'gcc':
+            name = 'unit%03d' % k
+            relgcda = 'gcc/%s.gcda' % name
+            source = '../../trunk/gcc/%s.c' % name
+            header = '../../trunk/gcc/%s.h' % name
+        elif k % 10 == 9:
+            # outside build/lib, left out by the index
+            name = 'Sema%03d' % k
+            relgcda = 'tools/clang/lib/Sema/CMakeFiles/clangSema.dir/%s.cpp.gcda' % name
+            source = os.path.join(rev_dir, 'llvm', 'tools', 'clang', 'lib', 'Sema', name + '.cpp')
+            header = os.path.join(rev_dir, 'llvm', 'tools', 'clang', 'include', 'clang', 'Sema', name + '.h')
+        else:
+            directory, library = LLVM_DIRS[k % len(LLVM_DIRS)]
+            name = 'Unit%03d' % k
+            relgcda = 'lib/%s/CMakeFiles/%s.dir/%s.cpp.gcda' % (directory, library, name)
+            source = os.path.join(rev_dir, 'llvm', 'lib', directory, name + '.cpp')
+            header = os.path.join(rev_dir, 'llvm', 'include', 'llvm', directory, name + '.h')
+        functions = [[-1, rng.randrange(len(units)) if rng.random() < 0.5 else -1, int(rng.random() < 0.1)]
+                     for _ in range(scale['functions'])]
+        objects.append([relgcda, source, header, functions])
+
+    # every unit runs a few functions of its home object
+    candidates = [k for k, obj in enumerate(objects) if compiler == 'gcc' or '/build/lib/' in '/build/' + obj[0]]
+    homes = []
+    for unit in range(len(units)):
+        home = rng.choice(candidates)
+        homes.append(home)
+        functions = objects[home][3]
+        for _ in range(owned):
+            functions.insert(rng.randrange(len(functions) + 1), [unit, -1, 0])
+
+    # bugs: hidden triggers active at -O2 but not at -O0
+    bugs = []
+    summary = []
+    for b in range(scale['bugs']):
+        bugId = '%s%d' % ('b' if compiler == 'gcc' else 'l', b + 1)
+        candidates = [i for i in levels['-O2'] if i not in levels['-O0']]
+        if compiler == 'gcc':
+            triggers = rng.sample(candidates, 1 + b % 2)
+        else:
+            triggers = [rng.choice(candidates[len(candidates) // 4:])]
+        crash = compiler == 'gcc' and b % 2 == 1
+        buggy = []
+        for unit in triggers:
+            relgcda = objects[homes[unit]][0]
+            if compiler == 'gcc':
+                name = 'gcc/' + os.path.basename(relgcda)[:-len('.gcda')] + '.c'
+            else:
+                name = relgcda[:-len('.gcda')].split('/CMakeFiles/')[0] + relgcda[:-len('.gcda')].split('.dir')[1]
+            if name not in buggy:
+                buggy.append(name)
+        bugs.append((bugId, [units[unit] for unit in triggers], crash))
+        summary.append('%s,%s,-O0,-O2,%s' % (bugId, REV, '+'.join(buggy)))
+    model = {'compiler': compiler, 'units': units, 'levels': levels, 'codegen': codegen, 'objects': objects}
+    return model, bugs, summary
+
+
+def write_tool(path, *args):
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\nexec %s "$@"\n' % ' '.join("'%s'" % arg for arg in (sys.executable,) + args))
+    os.chmod(path, 0o755)
+
+
+def make_workspace(workspace, compiler, scale, gcov_format):
+    rev_dir = os.path.join(workspace, 'compilers', REV)
+    build_dir = os.path.join(rev_dir, 'build')
+    model, bugs, summary = make_model(compiler, scale, rev_dir, random.Random(SEED))
+    model_path = os.path.join(rev_dir, 'model.json')
+    os.makedirs(os.path.join(build_dir, 'bin'))
+    with open(model_path, 'w') as f:
+        json.dump(model, f)
+
+    stub = os.path.join(PERF_DIR, 'stubcc.py')
+    if compiler == 'gcc':
+        write_tool(os.path.join(build_dir, 'bin', 'gcc'), stub, 'gcc', model_path)
+        write_tool(os.path.join(build_dir, 'bin', 'gcov'), stub, 'gcov', gcov_format)
+    else:
+        write_tool(os.path.join(build_dir, 'bin', 'clang'), stub, 'clang', model_path)
+        # llvm-run.py runs gcov-5 from PATH
+        os.makedirs(os.path.join(workspace, 'bin'))
+        write_tool(os.path.join(workspace, 'bin', 'gcov-5'), stub, 'gcov', gcov_format)
+
+    for relgcda, source, header, functions in model['objects']:
+        gcno = os.path.join(build_dir, relgcda[:-len('.gcda')] + '.gcno')
+        os.makedirs(os.path.dirname(gcno), exist_ok=True)
+        synthcov.write_notes(gcno, functions, source, header, os.path.dirname(gcno))
+
+    test_dir = os.path.join(workspace, 'benchmark', 'bugs')
+    for bugId, triggers, crash in bugs:
+        os.makedirs(os.path.join(test_dir, bugId))
+        with open(os.path.join(test_dir, bugId, 'fail.c'), 'w') as f:
+            f.write('/* stubcc: triggers=%s%s */\nint main(void) { return 0; }\n' % (','.join(triggers), ' crash' if crash else ''))
+    return build_dir, test_dir, summary, [bugId for bugId, _, crash in bugs if crash]
+
+
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.time() - start)
+        return timed
+
+    def add(self, phase, seconds):
+        with self.lock:
+            entry = self.phases.setdefault(phase, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+
+def run_flow(options):
+    """Benchmark one pipeline in this process, return its results."""
+    compiler = options.compiler
+    src_dir = os.path.join(ROOT_DIR, compiler)
+    sys.path.insert(0, src_dir)
+    sys.path.insert(1, os.path.join(ROOT_DIR, 'common'))
+    import execute
+    from conf_cache import OutcomeCache
+    from covindex import write_index
+
+    workspace = tempfile.mkdtemp(prefix='odfl-bench-')
+    timer = Timer()
+    try:
+        start = time.time()
+        build_dir, test_dir, summary, crashes = make_workspace(workspace, compiler, SCALES[options.scale], options.gcov_format)
+        setup = time.time() - start
+        if compiler == 'llvm':
+            os.environ['PATH'] = os.path.join(workspace, 'bin') + os.pathsep + os.environ.get('PATH', '')
+
+        run = load_script(compiler + '_run', os.path.join(src_dir, compiler + '-run.py'))
+        run.compilersDir = os.path.join(workspace, 'compilers')
+        run.testDir = test_dir
+        run.collectDir = os.path.join(workspace, 'cov')
+        run.scratchDir = run.make_run_dir(run.scratchBase)
+        if run.outcomeCache is not None:
+            run.outcomeCache = OutcomeCache(os.path.join(workspace, 'cache', 'outcomes'), run.cacheMaxBytes)
+        run.crash_bugId_lst = list(run.crash_bugId_lst) + crashes
+        run.covBackend = options.cov_backend
+        run.stmtOutput = options.stmt_output
+        for phase, name in PHASES[compiler]:
+            # the shared phases are methods of run.pipeline (common/pipeline.py); an
+            # instance attribute also catches the calls the pipeline makes itself
+            owner = run.pipeline if hasattr(run.pipeline, name) else run
+            setattr(owner, name, timer.wrap(phase, getattr(owner, name)))
+
+        timer.wrap('index', write_index)(build_dir, compiler)
+        start = time.time()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stderr if options.verbose else devnull):
+            for bug in summary:
+                run.task(bug)
+        total = time.time() - start
+
+        result = load_script(compiler + '_result', os.path.join(src_dir, compiler + '-result.py'))
+        result.collectDir = run.collectDir
+        result.cacheDir = os.path.join(workspace, 'cache', 'results')
+        evaluate = timer.wrap('result', result.evaluateFormula)
+        ranks = evaluate(summary, 'Ochiai', 'best')
+        timer.wrap('result-warm', result.evaluateFormula)(summary, 'Ochiai', 'best')
+    finally:
+        if not options.keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+        else:
+            print('workspace kept in %s' % workspace, file=sys.stderr)
+    shutil.rmtree(run.scratchDir, ignore_errors=True)
+
+    phases = dict((phase, round(entry['seconds'], 4)) for phase, entry in timer.phases.items())
+    phases['total'] = round(total, 4)
+    counts = dict((kind, entry['calls']) for kind, entry in execute.stats.summary().items())
+    counts.update(('calls:' + phase, entry['calls']) for phase, entry in timer.phases.items())
+    return {'phases': phases, 'counts': counts, 'ranks': dict(ranks), 'setup': round(setup, 4)}
+
+
+def config_key(options, compiler):
+    return '/'.join([compiler, options.scale, options.cov_backend, options.gcov_format, options.stmt_output])
+
+
+def measure(options, compiler):
+    # every repetition in a fresh process, so nothing is cached between them
+    best = None
+    argv = [sys.executable, os.path.abspath(__file__), '--child', '--compiler', compiler, '--scale', options.scale,
+            '--cov-backend', options.cov_backend, '--gcov-format', options.gcov_format,
+            '--stmt-output', options.stmt_output] + (['--verbose'] if options.verbose else []) + \
+           (['--keep'] if options.keep else [])
+    for _ in range(options.repeat):
+        out = subprocess.run(argv, stdout=subprocess.PIPE, check=True).stdout
+        results = json.loads(out.decode())
+        if best is None:
+            best = results
+            continue
+        if results['counts'] != best['counts'] or results['ranks'] != best['ranks']:
+            raise RuntimeError('%s: repetitions differ, the benchmark is not deterministic' % compiler)
+        for phase, seconds in results['phases'].items():
+            best['phases'][phase] = min(best['phases'].get(phase, seconds), seconds)
+    return best
+
+
+def compare(key, results, baseline, tolerance):
+    """Lines describing regressions of results against baseline, empty when there are none."""
+    problems = []
+    for phase, seconds in sorted(baseline['phases'].items()):
+        now = results['phases'].get(phase)
+        if now is None:
+            problems.append('%s: phase %s is gone' % (key, phase))
+        elif now > seconds * (1 + tolerance) and now - seconds > 0.05:
+            problems.append('%s: %s took %.3fs, baseline %.3fs (+%.0f%%)' % (key, phase, now, seconds, 100 * (now / seconds - 1)))
+    for kind in sorted(set(baseline['counts']) | set(results['counts'])):
+        if baseline['counts'].get(kind) != results['counts'].get(kind):
+            problems.append('%s: %s calls %s, baseline %s' % (key, kind, results['counts'].get(kind), baseline['counts'].get(kind)))
+    if baseline['ranks'] != results['ranks']:
+        problems.append('%s: ranks %s, baseline %s' % (key, results['ranks'], baseline['ranks']))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the phases of gcc-run.py and llvm-run.py against stub compilers.')
+    parser.add_argument('--compiler', choices=['gcc', 'llvm', 'both'], default='both')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--cov-backend', choices=['auto', 'native', 'gcov'], default='auto')
+    parser.add_argument('--gcov-format', choices=['stream', 'text'], default='stream')
+    parser.add_argument('--stmt-output', choices=['full', 'topk', 'jsonl'], default='full')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown of a phase')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--keep', action='store_true', help='keep the workspaces')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the run scripts')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        print(json.dumps(run_flow(options)))
+        return 0
+
+    try:
+        with open(options.baseline, 'r') as f:
+            baseline = json.load(f)
+    except OSError:
+        baseline = {}
+
+    problems = []
+    for compiler in (['gcc', 'llvm'] if options.compiler == 'both' else [options.compiler]):
+        key = config_key(options, compiler)
+        results = measure(options, compiler)
+        print('%s (setup %.2fs)' % (key, results['setup']))
+        for phase, seconds in sorted(results['phases'].items()):
+            base = baseline.get(key, {}).get('phases', {}).get(phase)
+            print('  %-12s %8.3fs%s' % (phase, seconds, '' if base is None else '  (baseline %.3fs)' % base))
+        print('  ' + ', '.join('%s=%d' % item for item in sorted(results['counts'].items())))
+        if options.update_baseline:
+            del results['setup']
+            baseline[key] = results
+        elif key in baseline:
+            problems += compare(key, results, baseline[key], options.tolerance)
+        else:
+            print('  no baseline for %s' % key)
+
+    if options.update_baseline:
+        with open(options.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print('baseline written to %s' % options.baseline)
+    for problem in problems:
+        print('REGRESSION ' + problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Stand-in for an instrumented gcc, clang or gcov, driven by a model file.
+
+    stubcc.py gcc MODEL ARGS...     behaves like compilers/<rev>/build/bin/gcc
+    stubcc.py clang MODEL ARGS...   behaves like compilers/<rev>/build/bin/clang
+    stubcc.py gcov FORMAT ARGS...   gcov; FORMAT 'stream' offers --json-format
+                                    and --stdout in --help, 'text' does not
+
+MODEL is the compilers/<rev>/model.json written by bench.py. Its units are the
+optimization options (gcc) or the pass sequence of -O3 (clang); an -O level
+enables a subset of them, -f<name>/-fno-<name> switch gcc options and
+-mllvm -opt-bisect-limit=N runs only the first N passes, printing one BISECT
+line per pass on stderr like clang.
+
+The test program decides whether it is miscompiled: a comment
+
+    /* stubcc: triggers=opt017,opt042 crash */
+
+makes the compile fail when all trigger units are active, with an internal
+compiler error if 'crash' is given and a wrong a.out otherwise. Every compile
+writes the .gcda files of all objects of the model (under GCOV_PREFIX with
+GCOV_PREFIX_STRIP, like libgcov), see synthcov.py.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import synthcov
+
+LEVEL_ALIASES = {'-O': '-O1', '-Os': '-O2', '-Og': '-O1', '-Ofast': '-O3'}
+
+
+def hidden_spec(source):
+    try:
+        with open(source, 'r', errors='replace') as f:
+            match = re.search(r'stubcc:([^*]*)\*/', f.read())
+    except OSError:
+        return [], False
+    if match is None:
+        return [], False
+    triggers = []
+    crash = False
+    for item in match.group(1).split():
+        if item.startswith('triggers='):
+            triggers = item[len('triggers='):].split(',')
+        elif item == 'crash':
+            crash = True
+    return triggers, crash
+
+
+def gcda_path(build_dir, relgcda):
+    # libgcov: drop GCOV_PREFIX_STRIP leading components of the object path, prepend GCOV_PREFIX
+    path = os.path.join(build_dir, relgcda)
+    prefix = os.environ.get('GCOV_PREFIX')
+    if not prefix:
+        return path
+    parts = path.strip(os.sep).split(os.sep)
+    return os.path.join(prefix, *parts[int(os.environ.get('GCOV_PREFIX_STRIP', '0')):])
+
+
+def dump_counters(model_path, model, active):
+    from gcov_reader import read_counts, UnsupportedFormat
+    build_dir = os.path.join(os.path.dirname(model_path), 'build')
+    made = set()
+    for relgcda, _, _, functions in model['objects']:
+        path = gcda_path(build_dir, relgcda)
+        directory = os.path.dirname(path)
+        if directory not in made:
+            os.makedirs(directory, exist_ok=True)
+            made.add(directory)
+        previous = None
+        if os.path.exists(path):
+            # counters of earlier runs are merged, as libgcov does
+            try:
+                previous = read_counts(path)
+            except UnsupportedFormat:
+                pass
+        synthcov.write_counts(path, functions, active, previous)
+
+
+def compile_main(tool, model_path, args):
+    with open(model_path, 'r') as f:
+        model = json.load(f)
+    units = model['units']
+    index = dict((name, i) for i, name in enumerate(units))
+
+    level = '-O0'
+    flags = []
+    limit = None
+    query = False
+    output = 'a.out'
+    sources = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith('-O'):
+            level = LEVEL_ALIASES.get(arg, arg)
+        elif arg == '-mllvm' and i + 1 < len(args):
+            i += 1
+            if args[i].startswith('-opt-bisect-limit='):
+                limit = int(args[i].split('=', 1)[1])
+        elif arg.startswith('--help='):
+            query = True
+        elif arg == '-S':
+            output = 'fail.s'
+        elif arg == '-c':
+            output = 'fail.o'
+        elif arg.startswith('-f') and tool == 'gcc':
+            flags.append(arg)
+        elif not arg.startswith('-'):
+            sources.append(arg)
+        i += 1
+    if level not in model['levels']:
+        sys.stderr.write('%s: error: unrecognized command-line option %r\n' % (tool, level))
+        return 1
+
+    if tool == 'gcc':
+        active = set(model['levels'][level])
+        for flag in flags:
+            name = flag[len('-fno-'):] if flag.startswith('-fno-') else flag[len('-f'):]
+            if name not in index:
+                sys.stderr.write("gcc: error: unrecognized command-line option '%s'\n" % flag)
+                return 1
+            if flag.startswith('-fno-'):
+                active.discard(index[name])
+            else:
+                active.add(index[name])
+    else:
+        sequence = model['levels'][level]
+        if limit is not None:
+            lines = []
+            for n, unit in enumerate(sequence, 1):
+                lines.append('BISECT: %s pass (%d) %s\n' % ('running' if limit < 0 or n <= limit else 'NOT running', n, units[unit]))
+            sys.stderr.write(''.join(lines))
+        active = set(sequence if limit is None or limit < 0 else sequence[:limit])
+
+    if query:
+        # the driver runs cc1 for the option dump, which dumps counters as well
+        dump_counters(model_path, model, set())
+        lines = ['The following options control optimizations:\n']
+        for name in sorted(units):
+            lines.append('  %-50s[%s]\n' % ('-f' + name, 'enabled' if index[name] in active else 'disabled'))
+        sys.stdout.write(''.join(lines))
+        return 0
+    if not sources:
+        sys.stderr.write('%s: fatal error: no input files\n' % tool)
+        return 1
+
+    triggers, crash = hidden_spec(sources[0])
+    failing = bool(triggers) and all(name in index and index[name] in active for name in triggers)
+    dump_counters(model_path, model, active)
+    if failing and crash:
+        sys.stderr.write('%s: internal compiler error: Segmentation fault\n' % sources[0])
+        return 4
+
+    # the binary only depends on the units that change code generation
+    codegen = sorted(units[unit] for unit in active.intersection(model['codegen']))
+    digest = hashlib.sha1(('\0'.join(codegen) + '\0' + str(failing)).encode()).hexdigest()
+    with open(output, 'w') as f:
+        f.write('#!/bin/sh\n# %s\necho %d\n' % (digest, 1 if failing else 0))
+    os.chmod(output, 0o755)
+    return 0
+
+
+def gcov_main(fmt, args):
+    from gcov_reader import read_notes, read_counts, solve_blocks
+    if '--help' in args:
+        usage = ['Usage: gcov [OPTION...] SOURCE|OBJ...\n', '  -h, --help\n']
+        if fmt != 'text':
+            usage += ['  -j, --json-format\n', '  -t, --stdout\n']
+        sys.stdout.write(''.join(usage))
+        return 0
+    json_format = fmt != 'text' and ('--json-format' in args or '-j' in args)
+    stdout = json_format and ('--stdout' in args or '-t' in args)
+    for gcda in [arg for arg in args if not arg.startswith('-')]:
+        counts = read_counts(gcda)
+        files = {}
+        for fn in read_notes(gcda[:-len('.gcda')] + '.gcno'):
+            block_count = solve_blocks(fn, counts.get(fn.ident, []))
+            for block, filename, linenos in fn.lines:
+                lines = files.setdefault(filename, {})
+                for lineno in linenos:
+                    lines[lineno] = max(lines.get(lineno, 0), block_count[block] if block < len(block_count) else 0)
+        if json_format:
+            doc = {'format_version': '1', 'gcc_version': '12.1.0', 'current_working_directory': os.getcwd(),
+                   'data_file': gcda,
+                   'files': [{'file': filename, 'functions': [],
+                              'lines': [{'line_number': lineno, 'count': count, 'unexecuted_block': count == 0,
+                                         'branches': []} for lineno, count in sorted(lines.items())]}
+                             for filename, lines in sorted(files.items())]}
+            if stdout:
+                sys.stdout.write(json.dumps(doc) + '\n')
+            else:
+                import gzip
+                with gzip.open(os.path.basename(gcda)[:-len('.gcda')] + '.gcov.json.gz', 'wt') as f:
+                    json.dump(doc, f)
+            continue
+        for filename, lines in files.items():
+            with open(os.path.basename(filename) + '.gcov', 'w') as f:
+                f.write('        -:    0:Source:%s\n' % filename)
+                for lineno, count in sorted(lines.items()):
+                    f.write('%9s:%5d:\n' % (count if count else '#####', lineno))
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == 'gcov':
+        sys.exit(gcov_main(sys.argv[2], sys.argv[3:]))
+    sys.exit(compile_main(sys.argv[1], sys.argv[2], sys.argv[3:]))
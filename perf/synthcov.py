@@ -0,0 +1,193 @@
+"""Synthetic .gcno/.gcda files of a fake instrumented compiler.
+
+The benchmark's stub compiler has no real flow graphs, so every function of
+its build tree gets the same small one, sized by its number of lines:
+
+    0 entry -> 2 -> 3 (then) -> 4 -> 5 -> ... -> 1 exit
+                \______________/
+
+Block 2 runs whenever the function runs, block 3 only when its guard is
+active as well. The arcs 0->2, 2->3, 2->4 and every other arc of the chain
+carry counters; the rest are on the spanning tree, so readers have to
+propagate the counts over the graph like gcov does. Files are written in the
+GCC 12 format (record and string lengths in bytes), which gcov_reader and
+gcov 12 read.
+
+A function is an (owner, guard, inheader) triple: the units (options or
+passes) that make it and its then-block run, -1 for none, and whether it lives
+in the header instead of the source of its object. write_notes and
+write_counts take the functions of one object in order; idents start at 1.
+"""
+import struct
+
+GCNO_MAGIC = 0x67636e6f
+GCDA_MAGIC = 0x67636461
+VERSION = 0x4232312a  # 'B21*', GCC 12.1
+STAMP = 0x0d1f0e5a
+CHECKSUM = 0
+
+TAG_FUNCTION = 0x01000000
+TAG_BLOCKS = 0x01410000
+TAG_ARCS = 0x01430000
+TAG_LINES = 0x01450000
+TAG_COUNTER_ARCS = 0x01a10000
+TAG_OBJECT_SUMMARY = 0xa1000000
+
+ARC_ON_TREE = 1
+
+
+def function_lines(ident):
+    return 8 + ident % 5
+
+
+def function_arcs(nlines):
+    """[(src, dst, flags)] of a function with nlines lines, and its number of blocks."""
+    last = 1 + max(3, nlines // 2)  # body blocks are 2..last
+    arcs = [(0, 2, 0), (2, 3, 0), (2, 4, 0), (3, 4, ARC_ON_TREE)]
+    for k in range(4, last + 1):
+        arcs.append((k, k + 1 if k < last else 1, ARC_ON_TREE if (k - 4) % 2 == 0 else 0))
+    return arcs, last + 1
+
+
+def checksums(ident):
+    # ident, line number checksum, flow graph checksum
+    return ident, (ident * 2654435761) & 0xffffffff, (ident * 40503) & 0xffffffff
+
+
+def function_counters(ident, runs, guarded):
+    # counters of the arcs off the spanning tree, in notes order
+    arcs, _ = function_arcs(function_lines(ident))
+    count = 1 + ident % 3 if runs else 0
+    then = count if guarded else 0
+    values = [count, then, count - then]
+    values += [count for src, _, flags in arcs[4:] if not flags & ARC_ON_TREE]
+    return values
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.chunks = []
+
+    def word(self, value):
+        self.chunks.append(struct.pack('<I', value & 0xffffffff))
+
+    def string(self, value):
+        # length in bytes including the terminating NUL, padded to whole words
+        raw = value.encode('utf-8') + b'\0'
+        raw += b'\0' * (-len(raw) % 4)
+        self.word(len(raw))
+        self.chunks.append(raw)
+
+    def record(self, tag, body):
+        self.word(tag)
+        self.word(sum(len(chunk) for chunk in body.chunks))
+        self.chunks.extend(body.chunks)
+
+    def data(self):
+        return b''.join(self.chunks)
+
+
+def notes_data(functions, source, header, cwd='/'):
+    w = _Writer()
+    w.word(GCNO_MAGIC)
+    w.word(VERSION)
+    w.word(STAMP)
+    w.word(CHECKSUM)
+    w.string(cwd)
+    w.word(0)  # no unexecuted blocks
+    nextline = {source: 1, header: 1}
+    for ident, (_, _, inheader) in enumerate(functions, 1):
+        filename = header if inheader else source
+        nlines = function_lines(ident)
+        first = nextline[filename]
+        nextline[filename] = first + nlines + 1
+        arcs, nblocks = function_arcs(nlines)
+
+        body = _Writer()
+        for value in checksums(ident):
+            body.word(value)
+        body.string('fn%d' % ident)
+        body.word(0)  # not artificial
+        body.string(filename)
+        for value in (first, 1, first + nlines - 1, 1):
+            body.word(value)
+        w.record(TAG_FUNCTION, body)
+
+        body = _Writer()
+        body.word(nblocks)
+        w.record(TAG_BLOCKS, body)
+
+        bysrc = {}
+        for src, dst, flags in arcs:
+            bysrc.setdefault(src, []).append((dst, flags))
+        for src in sorted(bysrc):
+            body = _Writer()
+            body.word(src)
+            for dst, flags in bysrc[src]:
+                body.word(dst)
+                body.word(flags)
+            w.record(TAG_ARCS, body)
+
+        # the lines of the function over its body blocks, in order
+        nbody = nblocks - 2
+        blocklines = {}
+        for i in range(nlines):
+            blocklines.setdefault(2 + i * nbody // nlines, []).append(first + i)
+        for block in sorted(blocklines):
+            body = _Writer()
+            body.word(block)
+            body.word(0)
+            body.string(filename)
+            for line in blocklines[block]:
+                body.word(line)
+            body.word(0)
+            body.word(0)  # empty string ends the list
+            w.record(TAG_LINES, body)
+    return w.data()
+
+
+def counts_data(functions, active, previous=None):
+    """The .gcda contents after one run; active is the set of active unit indices.
+
+    previous ({ident: counters}, see gcov_reader.read_counts) are the counters of
+    earlier runs, which are added like libgcov merges them.
+    """
+    w = _Writer()
+    w.word(GCDA_MAGIC)
+    w.word(VERSION)
+    w.word(STAMP)
+    w.word(CHECKSUM)
+    body = _Writer()
+    body.word(1)  # runs
+    body.word(0)  # sum_max
+    w.record(TAG_OBJECT_SUMMARY, body)
+    for ident, (owner, guard, _) in enumerate(functions, 1):
+        body = _Writer()
+        for value in checksums(ident):
+            body.word(value)
+        w.record(TAG_FUNCTION, body)
+        values = function_counters(ident, owner < 0 or owner in active, guard < 0 or guard in active)
+        if previous and len(previous.get(ident, ())) == len(values):
+            values = [a + b for a, b in zip(values, previous[ident])]
+        if any(values):
+            body = _Writer()
+            for value in values:
+                body.word(value)
+                body.word(value >> 32)
+            w.record(TAG_COUNTER_ARCS, body)
+        else:
+            # GCC 12 writes all-zero counters as a negative length without payload
+            w.word(TAG_COUNTER_ARCS)
+            w.word(-8 * len(values))
+    return w.data()
+
+
+def write_notes(path, functions, source, header, cwd='/'):
+    with open(path, 'wb') as f:
+        f.write(notes_data(functions, source, header, cwd))
+
+
+def write_counts(path, functions, active, previous=None):
+    with open(path, 'wb') as f:
+        f.write(counts_data(functions, active, previous))
@@ -0,0 +1,88 @@
+"""Admission of processes: slots, back-off on a busy machine, and no stall on load of others."""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from admission import Admission
+
+
+class AdmissionTest(unittest.TestCase):
+
+    def busy(self, admission, busy=True):
+        # the state of the machine, as machine_busy reads it from /proc
+        calls = []
+
+        def machine_busy():
+            calls.append(time.time())
+            return busy() if callable(busy) else busy
+        admission.machine_busy = machine_busy
+        return calls
+
+    def acquire_in_thread(self, admission):
+        admitted = threading.Event()
+
+        def run():
+            admission.acquire()
+            admitted.set()
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return admitted
+
+    def test_nothing_of_ours_running(self):
+        # a busy machine never stalls a run that has no process of its own running
+        admission = Admission(4, backoff=5.0)
+        calls = self.busy(admission)
+        start = time.time()
+        with admission.slot():
+            pass
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(calls, [])
+        self.assertEqual(admission.stats()['backoffs'], 0)
+
+    def test_backoff_while_busy(self):
+        admission = Admission(4, backoff=0.01, max_backoff=0.05)
+        busy = [True]
+        calls = self.busy(admission, lambda: busy[0])
+        admission.acquire()
+        admitted = self.acquire_in_thread(admission)
+        self.assertFalse(admitted.wait(0.3))
+        # asked again after every delay, the delays growing up to max_backoff
+        self.assertGreaterEqual(len(calls), 3)
+        gaps = [b - a for a, b in zip(calls, calls[1:])]
+        self.assertLess(max(gaps), 0.5)
+        busy[0] = False
+        self.assertTrue(admitted.wait(5))
+        self.assertEqual(admission.stats()['running'], 2)
+        self.assertGreaterEqual(admission.stats()['backoffs'], 3)
+
+    def test_admitted_when_ours_finish(self):
+        # the machine stays busy, but once our own process is done the next one starts
+        admission = Admission(4, backoff=0.05, max_backoff=0.2)
+        self.busy(admission)
+        admission.acquire()
+        admitted = self.acquire_in_thread(admission)
+        self.assertFalse(admitted.wait(0.2))
+        admission.release()
+        self.assertTrue(admitted.wait(5))
+
+    def test_slots(self):
+        admission = Admission(2)
+        self.busy(admission, False)
+        admission.acquire()
+        admission.acquire()
+        admitted = self.acquire_in_thread(admission)
+        self.assertFalse(admitted.wait(0.2))
+        self.assertEqual(admission.stats()['queued'], 1)
+        admission.release()
+        self.assertTrue(admitted.wait(5))
+        stats = admission.stats()
+        self.assertEqual((stats['running'], stats['admitted'], stats['max_queued']), (2, 3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
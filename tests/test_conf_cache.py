@@ -0,0 +1,91 @@
+"""The outcome cache: configuration normalization, key versions and LRU eviction."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import conf_cache
+from conf_cache import OutcomeCache, normalize_conf
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_fflags_order(self):
+        self.assertEqual(normalize_conf('-O2 -fno-b -fa'), normalize_conf('-O2  -fa -fno-b'))
+
+    def test_last_flip_wins(self):
+        self.assertEqual(normalize_conf('-O2 -fa -fno-a'), '-O2 -fno-a')
+        self.assertEqual(normalize_conf('-O2 -fno-a -fa'), '-O2 -fa')
+        self.assertNotEqual(normalize_conf('-O2 -fa'), normalize_conf('-O2 -fno-a'))
+
+    def test_positional_options(self):
+        # everything but -f switches keeps its order, and -mllvm keeps its argument
+        self.assertEqual(normalize_conf('-O3 -mllvm -opt-bisect-limit=5 -fb -fa'),
+                         '-O3 -mllvm -opt-bisect-limit=5 -fa -fb')
+        self.assertNotEqual(normalize_conf('-O2 -O3'), normalize_conf('-O3 -O2'))
+        self.assertEqual(normalize_conf('-O2 -fpack-struct=4 -fa'), '-O2 -fpack-struct=4 -fa')
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='cachetest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_round_trip(self):
+        cache = OutcomeCache(self.dir)
+        key = cache.key('gcc', 'r1', '-O2 -fa -fno-b', 'src', 'run')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, '0:out:')
+        # a new instance, as another process would open it
+        self.assertEqual(OutcomeCache(self.dir).get(cache.key('gcc', 'r1', '-O2 -fno-b -fa', 'src', 'run')), '0:out:')
+        self.assertEqual((cache.hits, cache.misses, cache.puts), (0, 1, 1))
+
+    def test_key_parts(self):
+        cache = OutcomeCache(self.dir)
+        key = cache.key('gcc', 'r1', '-O2', 'src', 'run')
+        for other in [('clang', 'r1', '-O2', 'src', 'run'), ('gcc', 'r2', '-O2', 'src', 'run'),
+                      ('gcc', 'r1', '-O3', 'src', 'run'), ('gcc', 'r1', '-O2', 'src2', 'run'),
+                      ('gcc', 'r1', '-O2', 'src', 'crash-S')]:
+            self.assertNotEqual(cache.key(*other), key)
+
+    def test_version(self):
+        cache = OutcomeCache(self.dir)
+        old = cache.key('gcc', 'r1', '-O2', 'src', 'run')
+        cache.put(old, '137')
+        version = conf_cache.CACHE_VERSION
+        conf_cache.CACHE_VERSION = version + 1
+        try:
+            key = cache.key('gcc', 'r1', '-O2', 'src', 'run')
+        finally:
+            conf_cache.CACHE_VERSION = version
+        self.assertNotEqual(key, old)
+        self.assertIsNone(cache.get(key))
+
+    def test_volatile_results(self):
+        cache = OutcomeCache(self.dir)
+        key = cache.key('gcc', 'r1', '-O2', 'src', 'run')
+        for result in conf_cache.volatile_results:
+            cache.put(key, result)
+        self.assertIsNone(cache.get(key))
+
+    def test_lru_eviction(self):
+        cache = OutcomeCache(self.dir, max_bytes=1000, evict_interval=1000)
+        keys = [cache.key('gcc', 'r1', '-O%d' % i, 'src', 'run') for i in range(10)]
+        for i, key in enumerate(keys):
+            cache.put(key, 'x' * 200)
+            # distinct access times, oldest first
+            os.utime(cache._path(key), (1000000 + i, 1000000 + i))
+        # a hit makes the oldest entry the most recently used
+        self.assertIsNotNone(cache.get(keys[0]))
+        cache.evict()
+        kept = [key for key in keys if os.path.exists(cache._path(key))]
+        # trimmed to 90% of max_bytes: the four most recently used
+        self.assertEqual(kept, [keys[0], keys[7], keys[8], keys[9]])
+
+
+if __name__ == '__main__':
+    unittest.main()
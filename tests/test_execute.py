@@ -0,0 +1,66 @@
+"""Process execution: timeouts, process groups and streamed output."""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import execute
+
+PRINT3 = 'for i in 1 2 3; do echo line$i; done'
+
+
+class RunTest(unittest.TestCase):
+
+    def test_exit(self):
+        result = execute.run(['sh', '-c', 'echo out; echo err >&2; exit 3'])
+        self.assertEqual((result.returncode, result.stdout, result.stderr, result.timedout), (3, b'out\n', b'err\n', False))
+
+    def test_timeout_kills_the_group(self):
+        start = time.time()
+        # the grandchild keeps the pipe open; only a kill of the whole group ends the read
+        result = execute.run(['sh', '-c', 'sleep 30 & sleep 30'], timeout=0.5)
+        self.assertTrue(result.timedout)
+        self.assertEqual(result.returncode, -9)
+        self.assertLess(time.time() - start, 10)
+
+    def test_stats(self):
+        stats = execute.stats.summary().get('test-run', {}).get('calls', 0)
+        execute.run(['true'], kind='test-run')
+        self.assertEqual(execute.stats.summary()['test-run']['calls'], stats + 1)
+
+
+class StreamTest(unittest.TestCase):
+
+    def test_lines(self):
+        calls = execute.stats.summary().get('test-stream', {}).get('calls', 0)
+        with execute.Stream(['sh', '-c', PRINT3], kind='test-stream') as proc:
+            lines = [line.strip() for line in proc.stdout]
+        self.assertEqual(lines, [b'line1', b'line2', b'line3'])
+        self.assertEqual(proc.result.returncode, 0)
+        self.assertFalse(proc.result.timedout)
+        self.assertEqual(execute.stats.summary()['test-stream']['calls'], calls + 1)
+
+    def test_timeout(self):
+        start = time.time()
+        with execute.Stream(['sh', '-c', 'echo first; sleep 30 & sleep 30'], timeout=0.5) as proc:
+            lines = list(proc.stdout)
+        self.assertEqual(lines, [b'first\n'])
+        self.assertTrue(proc.result.timedout)
+        self.assertLess(time.time() - start, 10)
+
+    def test_abandoned_reader(self):
+        def first_line():
+            with execute.Stream(['sh', '-c', 'echo first; sleep 30']) as proc:
+                for line in proc.stdout:
+                    yield line
+        start = time.time()
+        lines = first_line()
+        self.assertEqual(next(lines), b'first\n')
+        lines.close()  # the process group is killed, not waited for
+        self.assertLess(time.time() - start, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+"""The native .gcno/.gcda reader against gcov's JSON and text output, on a real build."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import gcov_reader
+from gcov_reader import executed_lines, gcov_format, gcov_json_lines, gcov_text_lines
+
+C_SOURCE = r'''
+#include <stdlib.h>
+#include "util.h"
+
+struct node { int value; struct node *next; };
+
+static int never_called(int x)
+{
+    return x * 3;
+}
+
+static int classify(int x)
+{
+    if (x < 0)
+        return -1;
+    else if (x == 0)
+        return 0;
+    switch (x % 3) {
+    case 0: return 3;
+    case 1: return 1;
+    default: break;
+    }
+    return 2;
+}
+
+int main(int argc, char **argv)
+{
+    struct node *head = NULL;
+    int i, total = 0;
+    for (i = -2; i < argc + 4; i++) {
+        struct node *n = malloc(sizeof *n);
+        n->value = classify(i); n->next = head; head = n;
+    }
+    while (head) {
+        struct node *next = head->next;
+        total += twice(head->value);
+        free(head);
+        head = next;
+    }
+    if (total > 1000000)
+        total = never_called(total);
+    return total == 12345;
+}
+'''
+
+C_HEADER = r'''
+static inline int twice(int x)
+{
+    if (x > 2)
+        return x + x;
+    return 2 * x;
+}
+'''
+
+CXX_SOURCE = r'''
+#include <stdexcept>
+#include <vector>
+
+template <typename T> T clamp(T v, T lo, T hi)
+{
+    if (v < lo) return lo;
+    if (v > hi) return hi;
+    return v;
+}
+
+struct Shape {
+    virtual ~Shape() {}
+    virtual int area() const = 0;
+};
+
+struct Square : Shape {
+    int side;
+    explicit Square(int s) : side(s) {}
+    int area() const { return side * side; }
+};
+
+static int check(int v)
+{
+    if (v > 50)
+        throw std::runtime_error("too big");
+    return v;
+}
+
+int main()
+{
+    std::vector<Shape *> shapes;
+    for (int i = 0; i < 10; i++)
+        shapes.push_back(new Square(clamp(i, 2, 7)));
+    int total = 0;
+    for (Shape *s : shapes) {
+        try {
+            total += check(s->area());
+        } catch (const std::exception &) {
+            total -= 1;
+        }
+        delete s;
+    }
+    return clamp(total, 0, 1) - 1;
+}
+'''
+
+
+def tool(name):
+    return shutil.which(name)
+
+
+def has_json():
+    return gcov_format(tool('gcov')) != 'text'
+
+
+@unittest.skipUnless(tool('gcc') and tool('gcov'), 'gcc and gcov are not installed')
+class NativeReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='gcovtest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def build(self, compiler, name, files, args=()):
+        for filename, text in files.items():
+            with open(os.path.join(self.dir, filename), 'w') as f:
+                f.write(text)
+        source = [filename for filename in files if not filename.endswith('.h')][0]
+        subprocess.check_call([compiler, '--coverage', '-O0', '-c', source, '-o', name + '.o'], cwd=self.dir)
+        subprocess.check_call([compiler, '--coverage', name + '.o', '-o', name], cwd=self.dir)
+        subprocess.call([os.path.join(self.dir, name)] + list(args), cwd=self.dir)
+        return os.path.join(self.dir, name + '.gcda')
+
+    def native(self, gcda):
+        native = {}
+        for filename, lines in executed_lines(gcda[:-len('.gcda')] + '.gcno', gcda).items():
+            native.setdefault(os.path.basename(filename), set()).update(lines)
+        return native
+
+    def text(self, gcda):
+        # the .gcov files of the text backend, read as the run scripts read them
+        outdir = tempfile.mkdtemp(dir=self.dir)
+        subprocess.check_call([tool('gcov'), gcda], cwd=self.dir, stdout=subprocess.DEVNULL)
+        for name in os.listdir(self.dir):
+            if name.endswith('.gcov'):
+                os.rename(os.path.join(self.dir, name), os.path.join(outdir, name))
+        expected = {}
+        for name in os.listdir(outdir):
+            lines = gcov_text_lines(os.path.join(outdir, name))
+            if lines:
+                expected[name[:-len('.gcov')]] = lines
+        return expected
+
+    def json(self, gcda):
+        expected = {}
+        for _, filename, lines in gcov_json_lines(tool('gcov'), [gcda], self.dir):
+            if lines:
+                expected.setdefault(os.path.basename(filename), set()).update(lines)
+        return expected
+
+    def compare(self, gcda):
+        native = self.native(gcda)
+        text = self.text(gcda)
+        self.assertTrue(text)
+        self.assertEqual(native, text)
+        if has_json():
+            self.assertEqual(native, self.json(gcda))
+
+    def test_c(self):
+        self.compare(self.build('gcc', 'prog', {'prog.c': C_SOURCE, 'util.h': C_HEADER}, ['a', 'b']))
+
+    @unittest.skipUnless(tool('g++'), 'g++ is not installed')
+    def test_cxx(self):
+        self.compare(self.build('g++', 'shapes', {'shapes.cpp': CXX_SOURCE}))
+
+    def test_merged_runs(self):
+        # counters of several runs are summed by libgcov; the reader must follow
+        gcda = self.build('gcc', 'prog', {'prog.c': C_SOURCE, 'util.h': C_HEADER})
+        subprocess.call([os.path.join(self.dir, 'prog'), 'x', 'y', 'z'], cwd=self.dir)
+        self.compare(gcda)
+
+    def test_notes_cache_is_bounded(self):
+        gcda = self.build('gcc', 'prog', {'prog.c': C_SOURCE, 'util.h': C_HEADER}, ['a'])
+        gcno = gcda[:-len('.gcda')] + '.gcno'
+        copies = []
+        for k in range(4):
+            copies.append(os.path.join(self.dir, 'copy%d.gcno' % k))
+            shutil.copy(gcno, copies[-1])
+        size = gcov_reader.NOTES_CACHE_SIZE
+        gcov_reader.NOTES_CACHE_SIZE = 2
+        self.addCleanup(setattr, gcov_reader, 'NOTES_CACHE_SIZE', size)
+        for copy in copies:
+            gcov_reader.cached_notes(copy)
+        cached = set(memo[0] for memo in gcov_reader._notes_cache)
+        self.assertEqual(cached & set(copies), set(copies[2:]))
+        self.assertLessEqual(len(gcov_reader._notes_cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
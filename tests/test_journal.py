@@ -0,0 +1,132 @@
+"""The per-bug journal: resuming finished phases and recomputing stale or corrupt ones."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import journal
+from journal import Journal, fingerprint
+from pipeline import Pipeline
+from spectra import lines_to_bits
+from tracing import Tracer
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='journaltest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_resume(self):
+        key = fingerprint('gcc', 'r1', ['-O2'])
+        Journal(self.dir).put('fineopts', key, {'opts': ['-fa', '-fb']})
+        # a restarted run reads what the killed one recorded
+        restarted = Journal(self.dir)
+        self.assertEqual(restarted.get('fineopts', key), {'opts': ['-fa', '-fb']})
+        self.assertIsNone(restarted.get('fineopts', fingerprint('gcc', 'r1', ['-O3'])))
+        self.assertIsNone(restarted.get('configs', key))
+        self.assertEqual([name for name in os.listdir(self.dir) if name.startswith('.tmp')], [])
+
+    def test_unreadable(self):
+        key = fingerprint('phase')
+        Journal(self.dir).put('phase', key, 1)
+        path = os.path.join(self.dir, 'journal.json')
+        with open(path) as f:
+            data = f.read()
+        # cut short, or written by another version of the journal: nothing is resumed
+        for text in (data[:len(data) // 2], data.replace('"version": %d' % journal.JOURNAL_VERSION, '"version": 0'), '[]'):
+            with open(path, 'w') as f:
+                f.write(text)
+            self.assertIsNone(Journal(self.dir).get('phase', key))
+
+    def test_spectrum(self):
+        store = Journal(self.dir)
+        spectrum = {'gcc/a.c': lines_to_bits([1, 2, 300]), 'gcc/b.c': lines_to_bits([7])}
+        key = fingerprint('pass1', '-O2')
+        store.put_spectrum('coverage/pass1', key, spectrum)
+        store.put_spectrum('coverage/fail1', fingerprint('fail1'), {'gcc/a.c': 1})
+        self.assertEqual(Journal(self.dir).get_spectrum('coverage/pass1', key), spectrum)
+        self.assertIsNone(Journal(self.dir).get_spectrum('coverage/pass1', fingerprint('pass1', '-O3')))
+        # another configuration for the test replaces its coverage file
+        before = set(os.listdir(self.dir))
+        newKey = fingerprint('pass1', '-O3')
+        store.put_spectrum('coverage/pass1', newKey, {'gcc/b.c': 2})
+        after = set(os.listdir(self.dir))
+        self.assertEqual(len(before - after), 1)
+        self.assertEqual(len(after - before), 1)
+        self.assertEqual(Journal(self.dir).get_spectrum('coverage/pass1', newKey), {'gcc/b.c': 2})
+
+    def test_corrupt_spectrum(self):
+        store = Journal(self.dir)
+        key = fingerprint('pass1')
+        spectrum = {'gcc/a.c': lines_to_bits(range(0, 500, 7))}
+        store.put_spectrum('coverage/pass1', key, spectrum)
+        path = os.path.join(self.dir, store.get('coverage/pass1', key))
+        with open(path, 'rb') as f:
+            data = f.read()
+        for size in (0, 10, len(data) - 4):
+            with open(path, 'wb') as f:
+                f.write(data[:size])
+            self.assertIsNone(Journal(self.dir).get_spectrum('coverage/pass1', key))
+        os.unlink(path)
+        self.assertIsNone(Journal(self.dir).get_spectrum('coverage/pass1', key))
+        # recomputed and recorded again
+        store.put_spectrum('coverage/pass1', key, spectrum)
+        self.assertEqual(Journal(self.dir).get_spectrum('coverage/pass1', key), spectrum)
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='checkpointtest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        os.makedirs(os.path.join(self.dir, 'tests', 'b1'))
+        self.source = os.path.join(self.dir, 'tests', 'b1', 'fail.c')
+        with open(self.source, 'w') as f:
+            f.write('int main(void) { return 0; }\n')
+        self.settings = {'testDir': os.path.join(self.dir, 'tests'), 'collectDir': os.path.join(self.dir, 'cov'),
+                         'crash_bugId_lst': [], 'useJournal': True, 'tracer': Tracer()}
+        self.computed = []
+
+    def run_phase(self, inputs=('-O2',), rev='r1', value='result'):
+        # every run of the script has a pipeline, and journals, of its own
+        def compute():
+            self.computed.append(inputs)
+            return value
+        return Pipeline('gcc', 'gcc', self.settings).checkpoint('b1', rev, 'fineopts', list(inputs), compute)
+
+    def test_resume(self):
+        self.assertEqual(self.run_phase(), 'result')
+        self.assertEqual(self.run_phase(value='other'), 'result')
+        self.assertEqual(len(self.computed), 1)
+
+    def test_changed_inputs(self):
+        self.run_phase()
+        self.run_phase(inputs=('-O3',))
+        self.run_phase(rev='r2')
+        self.settings['crash_bugId_lst'] = ['b1']
+        self.run_phase()
+        self.settings['crash_bugId_lst'] = []
+        with open(self.source, 'a') as f:
+            f.write('/* changed */\n')
+        self.run_phase()
+        self.assertEqual(len(self.computed), 5)
+
+    def test_empty_not_recorded(self):
+        self.run_phase(value={})
+        self.run_phase(value={})
+        self.assertEqual(len(self.computed), 2)
+
+    def test_disabled(self):
+        self.settings['useJournal'] = False
+        self.run_phase()
+        self.run_phase()
+        self.assertEqual(len(self.computed), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'cov', 'b1', 'journal.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
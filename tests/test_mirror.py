@@ -0,0 +1,120 @@
+"""The git mirror of the install scripts, on a throwaway repository with svn trailers."""
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'common'))
+
+import mirror
+
+
+def load_install():
+    # gcc-install.py is a script, its name is no module name
+    spec = importlib.util.spec_from_file_location('gcc_install', os.path.join(ROOT_DIR, 'gcc', 'gcc-install.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipUnless(shutil.which('git') and shutil.which('tar'), 'git or tar is not installed')
+class MirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='mirrortest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.upstream = os.path.join(self.dir, 'upstream')
+        self.run_git(None, 'init', '--quiet', self.upstream)
+        self.run_git(self.upstream, 'symbolic-ref', 'HEAD', 'refs/heads/master')
+        # svn revisions r100, r105 and r110, then a commit made in git
+        self.commits = {}
+        for name in ('r100', 'r105', 'r110', None):
+            self.commits[name or 'git'] = self.commit(name)
+        self.bare = os.path.join(self.dir, 'gcc.git')
+        self.assertTrue(mirror.ensure_mirror(self.upstream, self.bare))
+        self.install = load_install()
+        self.install.compilersDir = os.path.join(self.dir, 'compilers')
+        self.install.mirrorDir = self.bare
+
+    def run_git(self, repo, *args):
+        cmd = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+        if repo is not None:
+            cmd += ['-C', repo]
+        return subprocess.check_output(cmd + list(args), universal_newlines=True).strip()
+
+    def commit(self, svn):
+        with open(os.path.join(self.upstream, 'version.txt'), 'w') as f:
+            f.write('%s\n' % svn)
+        self.run_git(self.upstream, 'add', 'version.txt')
+        message = 'change %s' % svn
+        if svn is not None:
+            message += '\n\nFrom-SVN: %s' % svn
+        self.run_git(self.upstream, 'commit', '--quiet', '-m', message)
+        return self.run_git(self.upstream, 'rev-parse', 'HEAD')
+
+    def test_svn_commits(self):
+        commits = self.install.svnCommits(self.bare, ['r100', 'r107', 'r110', 'r99', 'r111', self.commits['git'][:10], 'nosuchrev'])
+        self.assertEqual(commits['r100'], self.commits['r100'])
+        # a revision of another branch between two converted ones: trunk as of r105
+        self.assertEqual(commits['r107'], self.commits['r105'])
+        self.assertEqual(commits['r110'], self.commits['r110'])
+        self.assertIsNone(commits['r99'])
+        self.assertIsNone(commits['r111'])
+        self.assertEqual(commits[self.commits['git'][:10]], self.commits['git'])
+        self.assertIsNone(commits['nosuchrev'])
+
+    def test_fetch_missing(self):
+        self.commits['r120'] = self.commit('r120')
+        commits = mirror.resolve_revisions(self.bare, ['r105', 'r120'], self.install.svnCommits)
+        self.assertEqual(commits, {'r105': self.commits['r105'], 'r120': self.commits['r120']})
+        # the mirror exists already, it is not cloned again
+        self.assertFalse(mirror.ensure_mirror(self.upstream, self.bare))
+
+    def check_tree(self, path, svn):
+        with open(os.path.join(path, 'version.txt')) as f:
+            self.assertEqual(f.read(), '%s\n' % svn)
+        self.assertEqual(mirror.head_of(path), self.commits[svn])
+
+    def test_worktree(self):
+        path = os.path.join(self.install.compilersDir, 'r105', 'trunk')
+        self.install.checkoutRev('r105', self.commits['r105'])
+        self.check_tree(path, 'r105')
+        self.assertTrue(os.path.exists(os.path.join(path, '.git')))
+        # the commit marker does not show as a change of the tree
+        self.assertEqual(self.run_git(path, 'status', '--porcelain'), '')
+        self.assertFalse(mirror.checkout(self.bare, self.commits['r105'], path))
+        # another commit replaces the tree
+        self.assertTrue(mirror.checkout(self.bare, self.commits['r110'], path))
+        self.check_tree(path, 'r110')
+        self.assertEqual(len(self.run_git(None, '--git-dir=' + self.bare, 'worktree', 'list').splitlines()), 2)
+
+    def test_export(self):
+        self.install.checkoutMode = 'export'
+        path = os.path.join(self.install.compilersDir, 'r100', 'trunk')
+        self.install.checkoutRev('r100', self.commits['r100'])
+        self.check_tree(path, 'r100')
+        self.assertFalse(os.path.exists(os.path.join(path, '.git')))
+        with open(os.path.join(path, 'build.log'), 'w') as f:
+            f.write('kept\n')
+        self.assertFalse(mirror.checkout(self.bare, self.commits['r100'], path, 'export'))
+        self.assertTrue(os.path.exists(os.path.join(path, 'build.log')))
+
+    def test_interrupted_checkout(self):
+        path = os.path.join(self.dir, 'partial')
+        os.makedirs(path)
+        with open(os.path.join(path, 'version.txt'), 'w') as f:
+            f.write('half written\n')
+        self.assertTrue(mirror.checkout(self.bare, self.commits['r110'], path, 'export'))
+        self.check_tree(path, 'r110')
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            mirror.checkout(self.bare, self.commits['r100'], os.path.join(self.dir, 'x'), 'svn')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""The shared half of the run scripts: live settings, gcov batches and kept counters."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import pipeline
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_same_basename_apart(self):
+        files = ['a/x.gcda', 'b/x.gcda', 'a/y.gcda', 'c/x.gcda', 'b/z.gcda']
+        batches = pipeline.gcov_batches(files, 2)
+        self.assertEqual(sorted(f for batch in batches for f in batch), sorted(files))
+        for batch in batches:
+            self.assertLessEqual(len(batch), 2)
+            names = [os.path.basename(f) for f in batch]
+            self.assertEqual(len(names), len(set(names)))
+
+    def test_exit_status(self):
+        class Result(object):
+            def __init__(self, returncode):
+                self.returncode = returncode
+        self.assertEqual(pipeline.exit_status(Result(3)), 3)
+        self.assertEqual(pipeline.exit_status(Result(-11)), 139)
+
+
+class KeptGcdaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='pipelinetest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        os.makedirs(os.path.join(self.dir, 'tests', 'b1'))
+        with open(os.path.join(self.dir, 'tests', 'b1', 'fail.c'), 'w') as f:
+            f.write('int main(void) { return 0; }\n')
+        # the globals of a run script
+        self.settings = {'testDir': os.path.join(self.dir, 'tests'), 'scratchDir': os.path.join(self.dir, 'scratch'),
+                         'keepGcdaBytes': 100}
+        self.pipeline = pipeline.Pipeline('gcc', 'gcc', self.settings)
+
+    def counters(self, name, size):
+        path = os.path.join(self.dir, name)
+        os.makedirs(path)
+        with open(os.path.join(path, 'x.gcda'), 'wb') as f:
+            f.write(b'\0' * size)
+        return path
+
+    def test_settings_are_live(self):
+        self.assertEqual(self.pipeline.keepDir('b1'), os.path.join(self.dir, 'scratch', 'gcda-b1'))
+        self.settings['scratchDir'] = os.path.join(self.dir, 'other')
+        self.assertEqual(self.pipeline.keepDir('b1'), os.path.join(self.dir, 'other', 'gcda-b1'))
+        with self.assertRaises(AttributeError):
+            self.pipeline.cfg.noSuchSetting
+
+    def test_keep_and_take(self):
+        self.pipeline.keepGcda('b1', 'r1', '-O2  -fno-foo', self.counters('c1', 10))
+        # the same configuration, written differently
+        target = os.path.join(self.dir, 'taken')
+        self.assertTrue(self.pipeline.takeGcda('b1', 'r1', '-fno-foo -O2', target))
+        self.assertTrue(os.path.exists(os.path.join(target, 'x.gcda')))
+        self.assertFalse(self.pipeline.takeGcda('b1', 'r1', '-O2 -fno-foo', os.path.join(self.dir, 'again')))
+        self.assertFalse(self.pipeline.takeGcda('b1', 'r2', '-O2 -fno-foo', os.path.join(self.dir, 'again')))
+
+    def test_budget_and_prune(self):
+        self.pipeline.keepGcda('b1', 'r1', '-O1', self.counters('c1', 60))
+        # over keepGcdaBytes: not kept, the counters stay where they are
+        self.pipeline.keepGcda('b1', 'r1', '-O2', self.counters('c2', 60))
+        self.assertTrue(os.path.isdir(os.path.join(self.dir, 'c2')))
+        self.pipeline.pruneGcda('b1', lambda conf: conf != '-O1')
+        self.assertFalse(self.pipeline.takeGcda('b1', 'r1', '-O1', os.path.join(self.dir, 't1')))
+        self.pipeline.keepGcda('b1', 'r1', '-O2', os.path.join(self.dir, 'c2'))
+        self.pipeline.dropGcda('b1')
+        self.assertFalse(os.path.exists(self.pipeline.keepDir('b1')))
+        self.assertFalse(self.pipeline.takeGcda('b1', 'r1', '-O2', os.path.join(self.dir, 't2')))
+
+
+if __name__ == '__main__':
+    unittest.main()
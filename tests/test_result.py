@@ -0,0 +1,125 @@
+"""Ranks of the buggy files in gcc-result.py and llvm-result.py: tie policies and the incremental cache."""
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_result(compiler):
+    # the scripts read their formulas and tie policy from the command line when loaded
+    argv = sys.argv
+    sys.argv = [compiler + '-result.py']
+    try:
+        spec = importlib.util.spec_from_file_location(compiler + '_result', os.path.join(ROOT_DIR, compiler, compiler + '-result.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.argv = argv
+    return module
+
+
+class ResultTest(object):
+    compiler = None
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='resulttest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.result = load_result(self.compiler)
+        self.result.collectDir = os.path.join(self.dir, 'cov')
+        self.result.cacheDir = os.path.join(self.dir, 'cache')
+        self.result.workers = 1
+        self.evaluated = []
+        bugRanks = self.result.bugRanks
+
+        def counted(job):
+            self.evaluated.append(os.path.basename(os.path.dirname(job[0])))
+            return bugRanks(job)
+        self.result.bugRanks = counted
+        self.bugs = ['b1,r1,-O0,-O2,a.c', 'b2,r1,-O0,-O2,c.c+d.c', 'b3,r1,-O0,-O2,x.c']
+        self.write('b1', {'a.c': 0.5, 'b.c': 0.9, 'c.c': 0.5})
+        self.write('b2', {'a.c': 0.1, 'c.c': 0.7, 'd.c': 0.3})
+        # b3 is not ranked yet
+
+    def write(self, bugId, scoredict, name='Ochiai_scoredict.json'):
+        os.makedirs(os.path.join(self.dir, 'cov', bugId), exist_ok=True)
+        with open(os.path.join(self.dir, 'cov', bugId, name), 'w') as f:
+            if name.endswith('.json'):
+                json.dump(scoredict, f)
+            else:
+                f.write(str(scoredict))
+
+    def evaluate(self, policy='best'):
+        del self.evaluated[:]
+        return dict(self.result.evaluateFormula(self.bugs, 'Ochiai', policy))
+
+    def test_tie_policies(self):
+        values = [0.1, 0.5, 0.5, 0.5, 0.9]
+        fileRank = self.result.fileRank
+        self.assertEqual([fileRank(values, 0.5, policy) for policy in ('best', 'worst', 'average')], [2, 4, 3])
+        self.assertEqual([fileRank(values, 0.9, policy) for policy in ('best', 'worst', 'average')], [1, 1, 1])
+        self.assertEqual([fileRank(values, 0.1, policy) for policy in ('best', 'worst', 'average')], [5, 5, 5])
+        self.assertEqual(self.evaluate('best'), {'b1': [2], 'b2': [1, 2]})
+        self.assertEqual(self.evaluate('worst'), {'b1': [3], 'b2': [1, 2]})
+        self.assertEqual(self.evaluate('average'), {'b1': [2.5], 'b2': [1, 2]})
+
+    def test_incremental(self):
+        self.assertEqual(self.evaluate(), {'b1': [2], 'b2': [1, 2]})
+        self.assertEqual(sorted(self.evaluated), ['b1', 'b2'])
+        # nothing changed: every rank comes from the cache
+        self.assertEqual(self.evaluate(), {'b1': [2], 'b2': [1, 2]})
+        self.assertEqual(self.evaluated, [])
+        # a new ranking of one bug
+        self.write('b1', {'a.c': 0.95, 'b.c': 0.9, 'c.c': 0.5, 'e.c': 0.2})
+        self.assertEqual(self.evaluate(), {'b1': [1], 'b2': [1, 2]})
+        self.assertEqual(self.evaluated, ['b1'])
+        # other buggy files in the summary
+        self.bugs[1] = 'b2,r1,-O0,-O2,d.c'
+        self.assertEqual(self.evaluate(), {'b1': [1], 'b2': [2]})
+        self.assertEqual(self.evaluated, ['b2'])
+        # a bug that got ranked, and one whose ranking is gone
+        self.write('b3', {'x.c': 0.4, 'y.c': 0.6})
+        os.unlink(os.path.join(self.dir, 'cov', 'b1', 'Ochiai_scoredict.json'))
+        self.assertEqual(self.evaluate(), {'b2': [2], 'b3': [2]})
+        self.assertEqual(self.evaluated, ['b3'])
+
+    def test_policies_cached_apart(self):
+        self.evaluate('best')
+        self.assertEqual(self.evaluate('worst'), {'b1': [3], 'b2': [1, 2]})
+        self.assertEqual(sorted(self.evaluated), ['b1', 'b2'])
+
+    def test_corrupt_cache(self):
+        self.evaluate()
+        cacheFile = os.path.join(self.dir, 'cache', 'Ochiai-best.json')
+        with open(cacheFile, 'w') as f:
+            f.write('{"b1": {"stamp"')
+        self.assertEqual(self.evaluate(), {'b1': [2], 'b2': [1, 2]})
+        self.assertEqual(sorted(self.evaluated), ['b1', 'b2'])
+        with open(cacheFile) as f:
+            self.assertEqual(sorted(json.load(f)), ['b1', 'b2'])
+
+    def test_literal_scoredict(self):
+        # older runs wrote the Python literal only; no buggy file scored: the bug is left out
+        self.write('b3', {'y.c': 0.6}, 'Ochiai_scoredict.txt')
+        os.unlink(os.path.join(self.dir, 'cov', 'b1', 'Ochiai_scoredict.json'))
+        self.write('b1', {'b.c': 0.9, 'c.c': 0.95, 'a.c': 0.1}, 'Ochiai_scoredict.txt')
+        self.assertEqual(self.evaluate(), {'b1': [3], 'b2': [1, 2]})
+        # the JSON file is preferred where both exist
+        self.write('b1', {'a.c': 1.0})
+        self.assertEqual(self.evaluate(), {'b1': [1], 'b2': [1, 2]})
+
+
+class GccResultTest(ResultTest, unittest.TestCase):
+    compiler = 'gcc'
+
+
+class LlvmResultTest(ResultTest, unittest.TestCase):
+    compiler = 'llvm'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""SBFL scores, per group of counts, against the per-statement formulas rank() used to apply."""
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import sbfl
+from pipeline import Pipeline
+from spectra import FileTable, lines_to_bits
+
+
+def old_score(formula, ef, nf, ep, np):
+    # the formulas of the original rank(), for one statement executed by a failing test program
+    if formula == 'Ochiai':
+        return ef / math.sqrt((ef + nf) * (ef + ep))
+    elif formula == 'Tarantula':
+        return (ef / (ef + nf)) / ((ef / (ef + nf)) + (ep / (np + ep)))
+    elif formula == 'DStar':
+        return ef * ef / (ep + nf) if ep + nf != 0 else 1
+    elif formula == 'Dice':
+        return 2 * ef / (ef + nf + ep)
+    elif formula == 'Barinel':
+        return 1 - ep / (ep + ef)
+    elif formula == 'Op2':
+        return ef - ep / (1 + np + ep)
+
+
+def old_rank(failSets, passSets, formula):
+    # rank() before the spectra: "file,line" string sets and per-statement counts
+    failstmtset = set().union(*failSets)
+    score = {}
+    filescore = {}
+    for key in failstmtset:
+        ef = sum(1 for s in failSets if key in s)
+        ep = sum(1 for s in passSets if key in s)
+        score[key] = old_score(formula, ef, len(failSets) - ef, ep, len(passSets) - ep)
+        filescore.setdefault(key.rsplit(',', 1)[0], []).append(score[key])
+    scoredict = dict((key, sum(values) / len(values)) for key, values in filescore.items())
+    return scoredict, score
+
+
+class FormulaTest(unittest.TestCase):
+
+    def counts(self):
+        nfail, npass = 3, 5
+        ef = [ef for ef in range(1, nfail + 1) for _ in range(npass + 1)]
+        ep = [ep for _ in range(1, nfail + 1) for ep in range(npass + 1)]
+        return ef, ep, nfail, npass
+
+    def check(self):
+        ef, ep, nfail, npass = self.counts()
+        scores = sbfl.evaluate(ef, ep, nfail, npass)
+        self.assertEqual(list(scores), list(sbfl.formulas))
+        for formula, values in scores.items():
+            expected = [old_score(formula, a, nfail - a, b, npass - b) for a, b in zip(ef, ep)]
+            for value, old in zip(values, expected):
+                self.assertAlmostEqual(value, old, places=12, msg=formula)
+
+    def test_formulas(self):
+        self.check()
+
+    @unittest.skipIf(sbfl.numpy is None, 'numpy is not installed')
+    def test_formulas_without_numpy(self):
+        numpy, sbfl.numpy = sbfl.numpy, None
+        try:
+            self.check()
+        finally:
+            sbfl.numpy = numpy
+
+    def test_zero_denominators(self):
+        # no passing test programs: Tarantula's passed ratio is 0/0, scored 0 instead of failing
+        scores = sbfl.evaluate([2], [0], 2, 0, ['Tarantula', 'DStar'])
+        self.assertEqual(scores, {'Tarantula': [1.0], 'DStar': [1.0]})
+
+    def test_register(self):
+        sbfl.register('EfOnly', lambda ef, nf, ep, np: ef + 0 * ep)
+        self.addCleanup(sbfl.formulas.pop, 'EfOnly')
+        self.assertEqual(sbfl.evaluate([1, 3], [2, 0], 3, 2, ['EfOnly']), {'EfOnly': [1.0, 3.0]})
+
+
+class RankTest(unittest.TestCase):
+
+    def test_against_old_rank(self):
+        rng = random.Random(7)
+        names = ['gcc/a.c', 'gcc/b.c', 'gcc/c.c']
+
+        def random_set():
+            return set('%s,%d' % (name, line) for name in names for line in rng.sample(range(1, 60), rng.randint(0, 15)))
+
+        failSets = [random_set() for _ in range(3)]
+        passSets = [random_set() for _ in range(4)]
+        files = FileTable()
+
+        def spectrum(stmts):
+            lines = {}
+            for stmt in stmts:
+                name, line = stmt.rsplit(',', 1)
+                lines.setdefault(files.intern(name), []).append(int(line))
+            return dict((fid, lines_to_bits(values)) for fid, values in lines.items())
+
+        results = Pipeline.rankAll(files, [spectrum(s) for s in failSets], [spectrum(s) for s in passSets])
+        self.assertEqual(sorted(results), sorted(sbfl.formulas))
+        for formula, (scoredict, score) in results.items():
+            oldScoredict, oldScore = old_rank(failSets, passSets, formula)
+            self.assertEqual(sorted(score), sorted(oldScore))
+            for key in oldScore:
+                self.assertAlmostEqual(score[key], oldScore[key], places=12, msg=formula)
+            self.assertEqual(sorted(scoredict), sorted(oldScoredict))
+            for key in oldScoredict:
+                self.assertAlmostEqual(scoredict[key], oldScoredict[key], places=12, msg=formula)
+
+
+if __name__ == '__main__':
+    unittest.main()
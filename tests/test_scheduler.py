@@ -0,0 +1,73 @@
+"""The shared worker pool: results in order, errors, and maps nested in workers."""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from scheduler import Scheduler
+
+
+def finishes(func, timeout=20):
+    # func() in a thread; its result, or None if it is still waiting after timeout (a deadlock)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    return result[0] if result else None
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_map(self):
+        scheduler = Scheduler(4)
+        self.assertEqual(scheduler.map(lambda x: x * x, range(20)), [x * x for x in range(20)])
+        self.assertEqual(scheduler.map(lambda x: x, []), [])
+
+    def test_error(self):
+        def fail(x):
+            if x == 3:
+                raise ValueError('item %d' % x)
+            return x
+        with self.assertRaises(ValueError):
+            Scheduler(2).map(fail, range(6))
+
+    def test_sequential(self):
+        # one worker: everything runs in the calling thread
+        threads = Scheduler(1).map(lambda _: threading.current_thread(), range(3))
+        self.assertEqual(set(threads), {threading.current_thread()})
+
+    def nested(self, workers, outer, inner, priority):
+        scheduler = Scheduler(workers)
+
+        def collect(i):
+            # every worker waits on a map of its own, like a coverage collection on its gcov batches
+            time.sleep(0.01)
+            return sum(scheduler.map(lambda j: i * 10 + j, range(inner), priority))
+
+        return finishes(lambda: scheduler.map(collect, range(outer), 1))
+
+    def test_nested_higher_priority(self):
+        expected = [sum(i * 10 + j for j in range(5)) for i in range(8)]
+        self.assertEqual(self.nested(2, 8, 5, 2), expected)
+
+    def test_nested_same_priority(self):
+        expected = [sum(i * 10 + j for j in range(3)) for i in range(6)]
+        self.assertEqual(self.nested(3, 6, 3, 1), expected)
+
+    def test_two_levels(self):
+        scheduler = Scheduler(2)
+
+        def level(depth):
+            if depth == 0:
+                return 1
+            return sum(scheduler.map(lambda _: level(depth - 1), range(3), depth))
+
+        self.assertEqual(finishes(lambda: scheduler.map(lambda _: level(2), range(4), 3)), [9] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Run directories below a scratch base."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import scratch
+
+
+def dead_pid():
+    proc = subprocess.Popen(['true'])
+    proc.wait()
+    return proc.pid
+
+
+class RunDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='scratchtest')
+        self.addCleanup(shutil.rmtree, self.base, True)
+
+    def leftover(self, host, pid):
+        path = os.path.join(self.base, 'run-%s-%d-abc123' % (host, pid))
+        os.makedirs(os.path.join(path, 'stage'))
+        return path
+
+    def test_private_dirs(self):
+        first = scratch.make_run_dir(self.base)
+        second = scratch.make_run_dir(self.base)
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.basename(first).startswith('run-%s-%d-' % (scratch._host(), os.getpid())))
+        # the directories of this (live) process are kept
+        self.assertTrue(os.path.isdir(first))
+
+    def test_cleanup_of_this_host_only(self):
+        pid = dead_pid()
+        dead = self.leftover(scratch._host(), pid)
+        live = self.leftover(scratch._host(), os.getpid())
+        other = self.leftover('otherhost', pid)
+        unrelated = os.path.join(self.base, 'gcda-12345')
+        os.makedirs(unrelated)
+        scratch.make_run_dir(self.base)
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.isdir(live))
+        self.assertTrue(os.path.isdir(other))
+        self.assertTrue(os.path.isdir(unrelated))
+
+    def test_base_override(self):
+        old = os.environ.get('ODFL_SCRATCH')
+        os.environ['ODFL_SCRATCH'] = self.base
+        try:
+            self.assertEqual(scratch.scratch_base('gcc', '/nonexistent', 0), os.path.join(self.base, 'gcc'))
+        finally:
+            if old is None:
+                del os.environ['ODFL_SCRATCH']
+            else:
+                os.environ['ODFL_SCRATCH'] = old
+        # more free space than any file system has: the fallback
+        if 'ODFL_SCRATCH' not in os.environ:
+            self.assertEqual(scratch.scratch_base('gcc', '/fallback', 1 << 62), '/fallback')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Bitset spectra, the bit-sliced line counters and the binary spectrum store."""
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+from spectra import FileTable, SpectrumCounter, SpectrumStore, lines_to_bits, bits_to_lines, popcount, union, \
+    restrict, read_spectrum, format_spectrum, write_store
+
+
+def random_spectra(rng, count, nfiles=4, maxline=300):
+    return [dict((fid, lines_to_bits(rng.sample(range(1, maxline), rng.randint(0, 40))))
+                 for fid in range(nfiles) if rng.random() < 0.8) for _ in range(count)]
+
+
+class BitsTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        lines = [0, 1, 7, 8, 9, 63, 64, 1000]
+        bits = lines_to_bits(reversed(lines))
+        self.assertEqual(bits_to_lines(bits), lines)
+        self.assertEqual(popcount(bits), len(lines))
+        self.assertEqual(lines_to_bits([]), 0)
+        self.assertEqual(bits_to_lines(0), [])
+
+    def test_set_operations(self):
+        a = {0: lines_to_bits([1, 2, 3]), 1: lines_to_bits([5])}
+        b = {0: lines_to_bits([3, 4]), 2: lines_to_bits([9])}
+        self.assertEqual(union([a, b]), {0: lines_to_bits([1, 2, 3, 4]), 1: lines_to_bits([5]), 2: lines_to_bits([9])})
+        # files or lines outside the domain are left out, and so are files left empty
+        self.assertEqual(restrict(a, b), {0: lines_to_bits([3])})
+
+    def test_stmt_info(self):
+        fd, path = tempfile.mkstemp(prefix='stmt_info')
+        self.addCleanup(os.unlink, path)
+        with os.fdopen(fd, 'w') as f:
+            f.write('b.c$3,1\na.c$2\n\nb.c$7\n')
+        files = FileTable()
+        spectrum = read_spectrum(path, files)
+        self.assertEqual(files.names, ['b.c', 'a.c'])
+        self.assertEqual(spectrum, {0: lines_to_bits([1, 3, 7]), 1: lines_to_bits([2])})
+        self.assertEqual(format_spectrum(spectrum, files), ['a.c$2', 'b.c$1,3,7'])
+
+
+class CounterTest(unittest.TestCase):
+
+    def test_counts(self):
+        rng = random.Random(1)
+        spectra = random_spectra(rng, 13)
+        counter = SpectrumCounter()
+        for spectrum in spectra:
+            counter.add(spectrum)
+        self.assertEqual(counter.total, 13)
+        for fid in range(4):
+            domain = union(spectra).get(fid, 0)
+            expected = {}
+            for line in bits_to_lines(domain):
+                count = sum(1 for spectrum in spectra if spectrum.get(fid, 0) >> line & 1)
+                expected.setdefault(count, []).append(line)
+            classes = dict((count, bits_to_lines(mask)) for count, mask in counter.classes(fid, domain))
+            self.assertEqual(classes, expected)
+            for count, lines in expected.items():
+                self.assertEqual(bits_to_lines(counter.mask(fid, count, domain)), lines)
+
+    def test_outside_domain(self):
+        counter = SpectrumCounter()
+        counter.add({0: lines_to_bits([1, 2])})
+        counter.add({0: lines_to_bits([2])})
+        # lines no spectrum executed have count 0, unknown files too
+        self.assertEqual(list(counter.classes(0, lines_to_bits([2, 5]))), [(0, lines_to_bits([5])), (2, lines_to_bits([2]))])
+        self.assertEqual(list(counter.classes(7, lines_to_bits([1]))), [(0, lines_to_bits([1]))])
+        self.assertEqual(counter.mask(0, 4, lines_to_bits([1, 2])), 0)
+
+
+class StoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='storetest')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, 'spectra.bin')
+        self.files = FileTable()
+        for name in ('gcc/tree.c', 'gcc/\u00e9t\u00e9.c', 'gcc/empty.c'):
+            self.files.intern(name)
+        self.spectra = [('pass1', {0: lines_to_bits([1, 5, 4000]), 1: lines_to_bits([2])}),
+                        ('fail1', {1: lines_to_bits(range(0, 700, 3)), 2: 0}),
+                        ('fail2', {})]
+
+    def test_round_trip(self):
+        write_store(self.path, self.files, self.spectra)
+        with SpectrumStore(self.path) as store:
+            self.assertEqual(store.tests, ['pass1', 'fail1', 'fail2'])
+            self.assertEqual(store.files.names, self.files.names)
+            for name, spectrum in self.spectra:
+                # files with no executed line are not stored
+                self.assertEqual(store.spectrum(name), dict((fid, bits) for fid, bits in spectrum.items() if bits))
+        # written again atomically, nothing else is left in the directory
+        write_store(self.path, self.files, self.spectra[:1])
+        with SpectrumStore(self.path) as store:
+            self.assertEqual(store.tests, ['pass1'])
+        self.assertEqual(os.listdir(self.dir), ['spectra.bin'])
+
+    def test_not_a_store(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'pass1$1,2\n' * 4)
+        with self.assertRaises(ValueError):
+            SpectrumStore(self.path)
+
+    def test_truncated(self):
+        write_store(self.path, self.files, self.spectra)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # empty, cut in the header, in the index and in the last block; each read fails
+        # with one of the errors the journal treats as a missing spectrum
+        for size in (0, 4, 20, len(data) - 3):
+            with open(self.path, 'wb') as f:
+                f.write(data[:size])
+            with self.assertRaises((ValueError, struct.error, zlib.error)):
+                with SpectrumStore(self.path) as store:
+                    for name in store.tests:
+                        store.spectrum(name)
+
+
+if __name__ == '__main__':
+    unittest.main()